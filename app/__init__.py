@@ -24,14 +24,30 @@ def create_app(config_class=Config):
     # Initialize Celery
     celery.conf.update(app.config)
     
+    # Write the task events of each request in one batch
+    from app.utils import task_logger
+    task_logger.init_app(app)
+    
+    # Response cache used by the dashboard
+    from app.utils import cache
+    cache.init_app(app)
+    
     # Register blueprints
     from app.routes import main_bp
     from app.auth import auth_bp
     from app.routes.api import api_bp
+    from app.routes.export import export_bp
+    from app.routes.dashboard import dashboard_bp
+    from app.routes.webhook import webhook_bp
+    from app.routes.notification import notification_bp
     
     app.register_blueprint(main_bp)
     app.register_blueprint(auth_bp, url_prefix='/auth')
     app.register_blueprint(api_bp, url_prefix='/api')
+    app.register_blueprint(export_bp)
+    app.register_blueprint(dashboard_bp)
+    app.register_blueprint(webhook_bp)
+    app.register_blueprint(notification_bp)
     
     # Ensure the instance folder exists
     try:
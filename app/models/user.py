@@ -1,3 +1,4 @@
+import json
 from datetime import datetime
 from app import db, login
 from flask_login import UserMixin
@@ -32,6 +33,16 @@ def load_user(id):
 
 class Task(db.Model):
     __tablename__ = 'tasks'
+    __table_args__ = (
+        # Task lists, filters and dashboard counts are always scoped to a user
+        db.Index('ix_tasks_user_id_status', 'user_id', 'status'),
+        db.Index('ix_tasks_user_id_completed_at', 'user_id', 'completed_at'),
+        db.Index('ix_tasks_user_id_created_at', 'user_id', 'created_at', 'id'),
+        # Scheduler sweeps and cleanup across all users
+        db.Index('ix_tasks_status_created_at', 'status', 'created_at'),
+        # Client-supplied deduplication key (tasks without one are never duplicates)
+        db.Index('uq_tasks_user_id_external_id', 'user_id', 'external_id', unique=True),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String(140), nullable=False)
@@ -42,7 +53,13 @@ class Task(db.Model):
     completed_at = db.Column(db.DateTime, nullable=True)
     priority = db.Column(db.Integer, default=1)  # 1=low, 2=medium, 3=high
     task_type = db.Column(db.String(50), default='general')  # general, email, file, api, etc.
-    
+    external_id = db.Column(db.String(100), nullable=True)  # idempotency key, unique per user
+
+    # Dispatch and claim bookkeeping (see app.tasks.task_claims)
+    queued_at = db.Column(db.DateTime, nullable=True)
+    claimed_by = db.Column(db.String(155), nullable=True)
+    lease_expires_at = db.Column(db.DateTime, nullable=True)
+
     # Foreign keys
     user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
     
@@ -63,11 +80,15 @@ class Task(db.Model):
             'completed_at': self.completed_at.isoformat() if self.completed_at else None,
             'priority': self.priority,
             'task_type': self.task_type,
+            'external_id': self.external_id,
             'user_id': self.user_id
         }
 
 class TaskLog(db.Model):
     __tablename__ = 'task_logs'
+    __table_args__ = (
+        db.Index('ix_task_logs_task_id_timestamp', 'task_id', 'timestamp'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     task_id = db.Column(db.Integer, db.ForeignKey('tasks.id'), nullable=False)
@@ -77,3 +98,182 @@ class TaskLog(db.Model):
     
     def __repr__(self):
         return f'<TaskLog {self.id} for Task {self.task_id}>'
+
+class TaskDailyStats(db.Model):
+    # Rollup of task counts, maintained by app.utils.task_stats
+    __tablename__ = 'task_daily_stats'
+    
+    # Completed tasks are bucketed by completion day, all others by creation day
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), primary_key=True)
+    day = db.Column(db.Date, primary_key=True)
+    status = db.Column(db.String(20), primary_key=True)
+    task_type = db.Column(db.String(50), primary_key=True)
+    priority = db.Column(db.Integer, primary_key=True)
+    
+    task_count = db.Column(db.Integer, nullable=False, default=0)
+    latency_seconds = db.Column(db.Float, nullable=False, default=0.0)  # sum of completed_at - created_at
+    
+    def __repr__(self):
+        return f'<TaskDailyStats {self.user_id} {self.day} {self.status}>'
+
+class ExportJob(db.Model):
+    __tablename__ = 'export_jobs'
+    
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False, index=True)
+    format = db.Column(db.String(10), nullable=False, default='csv')  # csv, ndjson
+    compressed = db.Column(db.Boolean, default=False)
+    status = db.Column(db.String(20), default='pending')  # pending, running, completed, failed, expired
+    
+    # Progress
+    total_rows = db.Column(db.Integer, nullable=True)
+    rows_written = db.Column(db.Integer, default=0)
+    
+    # Artifact in the spool directory (see app.tasks.export_jobs)
+    file_path = db.Column(db.String(255), nullable=True)
+    file_size = db.Column(db.Integer, nullable=True)
+    error = db.Column(db.Text, nullable=True)
+    
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    started_at = db.Column(db.DateTime, nullable=True)
+    completed_at = db.Column(db.DateTime, nullable=True)
+    expires_at = db.Column(db.DateTime, nullable=True, index=True)
+    
+    def __repr__(self):
+        return f'<ExportJob {self.id} {self.status}>'
+    
+    @property
+    def filename(self):
+        extension = 'csv' if self.format == 'csv' else 'ndjson'
+        return f'tasks_export_{self.id}.{extension}' + ('.gz' if self.compressed else '')
+    
+    def to_dict(self):
+        if self.total_rows:
+            progress = round(100.0 * (self.rows_written or 0) / self.total_rows, 1)
+        else:
+            progress = 100.0 if self.status == 'completed' else 0.0
+        return {
+            'id': self.id,
+            'format': self.format,
+            'compressed': self.compressed,
+            'status': self.status,
+            'total_rows': self.total_rows,
+            'rows_written': self.rows_written,
+            'progress': progress,
+            'file_size': self.file_size,
+            'error': self.error,
+            'created_at': self.created_at.isoformat() if self.created_at else None,
+            'started_at': self.started_at.isoformat() if self.started_at else None,
+            'completed_at': self.completed_at.isoformat() if self.completed_at else None,
+            'expires_at': self.expires_at.isoformat() if self.expires_at else None
+        }
+
+class WebhookDeadLetter(db.Model):
+    __tablename__ = 'webhook_dead_letters'
+    
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=True, index=True)
+    url = db.Column(db.String(500), nullable=False)
+    events = db.Column(db.Text, nullable=False)  # JSON array of the undelivered event payloads
+    
+    # Outcome of the last attempt
+    attempts = db.Column(db.Integer, nullable=False)
+    status_code = db.Column(db.Integer, nullable=True)
+    error = db.Column(db.Text, nullable=True)
+    
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    
+    def __repr__(self):
+        return f'<WebhookDeadLetter {self.id} {self.url}>'
+    
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'url': self.url,
+            'events': json.loads(self.events),
+            'attempts': self.attempts,
+            'status_code': self.status_code,
+            'error': self.error,
+            'created_at': self.created_at.isoformat() if self.created_at else None
+        }
+
+class WebhookSubscription(db.Model):
+    __tablename__ = 'webhook_subscriptions'
+    __table_args__ = (
+        # A user's active subscriptions for an event type
+        db.Index('ix_webhook_subscriptions_user_id_event_type_active', 'user_id', 'event_type', 'active'),
+    )
+    
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
+    url = db.Column(db.String(500), nullable=False)
+    event_type = db.Column(db.String(50), nullable=False)  # task.created, task.completed, task.failed, task.all
+    active = db.Column(db.Boolean, nullable=False, default=True)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    
+    def __repr__(self):
+        return f'<WebhookSubscription {self.id} {self.event_type}>'
+    
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'url': self.url,
+            'event_type': self.event_type,
+            'created_at': self.created_at.isoformat() if self.created_at else None,
+            'active': self.active
+        }
+
+class NotificationSettings(db.Model):
+    # Read through the cache in app.utils.notifications
+    __tablename__ = 'notification_settings'
+    
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), primary_key=True)
+    email_notifications = db.Column(db.Boolean, nullable=False, default=True)
+    task_completed = db.Column(db.Boolean, nullable=False, default=True)
+    task_failed = db.Column(db.Boolean, nullable=False, default=True)
+    daily_summary = db.Column(db.Boolean, nullable=False, default=False)
+    email = db.Column(db.String(120), nullable=True)  # defaults to the user's address
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    
+    def __repr__(self):
+        return f'<NotificationSettings {self.user_id}>'
+    
+    def to_dict(self):
+        return {
+            'email_notifications': self.email_notifications,
+            'task_completed': self.task_completed,
+            'task_failed': self.task_failed,
+            'daily_summary': self.daily_summary,
+            'email': self.email
+        }
+
+class OutboxMessage(db.Model):
+    # Notification emails waiting to be sent, see app.tasks.notifications
+    __tablename__ = 'notification_outbox'
+    __table_args__ = (
+        # Messages the drain task picks up next
+        db.Index('ix_notification_outbox_status_available_at', 'status', 'available_at'),
+        # At most one daily digest per user and day
+        db.Index('uq_notification_outbox_user_id_digest_date', 'user_id', 'digest_date', unique=True),
+    )
+    
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
+    event_type = db.Column(db.String(50), nullable=True)  # task_completed, task_failed, daily_summary, ...
+    digest_date = db.Column(db.Date, nullable=True)  # day summarised by a daily_summary digest
+    recipient = db.Column(db.String(120), nullable=False)
+    subject = db.Column(db.String(200), nullable=False)
+    body = db.Column(db.Text, nullable=False)
+    
+    # Delivery state: pending, sending, sent, failed. Pending messages are not
+    # picked up before available_at; sending ones are reclaimed after it.
+    status = db.Column(db.String(20), nullable=False, default='pending')
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    error = db.Column(db.Text, nullable=True)
+    available_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    sent_at = db.Column(db.DateTime, nullable=True)
+    
+    def __repr__(self):
+        return f'<OutboxMessage {self.id} {self.status}>'
@@ -2,9 +2,10 @@ from flask import Blueprint, render_template, redirect, url_for, flash, request
 from flask_login import login_required, current_user
 from app.models.user import Task
 from app import db
-from app.tasks.automation_processor import process_automation_task
+from app.tasks.dispatch import enqueue_task
 from app.routes.forms import TaskForm
 from app.utils.task_logger import log_task_event
+from app.utils.task_stats import record_status_change
 
 main_bp = Blueprint('main', __name__)
 
@@ -37,13 +38,15 @@ def new_task():
             user_id=current_user.id
         )
         db.session.add(task)
+        db.session.flush()
+        record_status_change(task, None, 'pending')
         db.session.commit()
         
         # Log task creation
         log_task_event(task.id, 'created', f"Task created by user {current_user.username}")
         
         # Schedule the task for automation
-        process_automation_task.delay(task.id)
+        enqueue_task(task)
         
         flash('Task created successfully!')
         return redirect(url_for('main.dashboard'))
@@ -76,6 +79,7 @@ def run_task(task_id):
         return redirect(url_for('main.task_detail', task_id=task.id))
     
     # Reset status to pending
+    record_status_change(task, task.status, 'pending')
     task.status = 'pending'
     db.session.commit()
     
@@ -83,7 +87,7 @@ def run_task(task_id):
     log_task_event(task.id, 'manual_run', f"Task manually run by user {current_user.username}")
     
     # Schedule the task for processing
-    process_automation_task.delay(task.id)
+    enqueue_task(task)
     
     flash('Task scheduled for processing')
     return redirect(url_for('main.task_detail', task_id=task.id))
@@ -1,13 +1,23 @@
-from flask import Blueprint, jsonify, request, abort
+from flask import Blueprint, jsonify, request, abort, current_app
 from flask_login import login_required, current_user
 from app.models.user import User, Task
 from app import db
-from app.tasks.automation_processor import process_automation_task
+from app.tasks.dispatch import enqueue_task
+from app.tasks.routing import queue_depths, pending_latency_by_priority
 from app.utils.task_logger import log_task_event
+from app.utils.task_stats import record_status_change
+from app.utils.task_validation import validate_task_data, TaskValidationError
+from app.utils.task_insert import create_tasks, insert_tasks
+from app.utils.webhooks import task_payload, trigger_webhook
+from app.utils.task_query import build_task_query, order_tasks, paginate_tasks, TaskQueryError
+from app.utils.streaming import ndjson_response, wants_ndjson
 from datetime import datetime
 
 api_bp = Blueprint('api', __name__, url_prefix='/api')
 
+# Leaves room for the ':<index>' suffix of bulk items within external_id
+IDEMPOTENCY_KEY_MAX_LENGTH = 80
+
 # API Authentication decorator
 def admin_required(f):
     @login_required
@@ -21,10 +31,30 @@ def admin_required(f):
 @api_bp.route('/tasks', methods=['GET'])
 @login_required
 def get_tasks():
-    """Get all tasks for the current user"""
-    tasks = Task.query.filter_by(user_id=current_user.id).all()
+    """Get a page of tasks for the current user"""
+    try:
+        query = build_task_query(current_user.id, request.args)
+        if wants_ndjson():
+            # Stream every matching task instead of a single page
+            query = order_tasks(
+                query,
+                order=request.args.get('order', 'desc'),
+                cursor=request.args.get('cursor')
+            )
+            return ndjson_response(query, Task.to_dict)
+
+        tasks, next_cursor = paginate_tasks(
+            query,
+            cursor=request.args.get('cursor'),
+            limit=request.args.get('limit'),
+            order=request.args.get('order', 'desc')
+        )
+    except TaskQueryError as e:
+        return jsonify({'error': str(e)}), 400
+
     return jsonify({
-        'tasks': [task.to_dict() for task in tasks]
+        'tasks': [task.to_dict() for task in tasks],
+        'next_cursor': next_cursor
     })
 
 @api_bp.route('/tasks/<int:task_id>', methods=['GET'])
@@ -40,35 +70,116 @@ def get_task(task_id):
 @api_bp.route('/tasks', methods=['POST'])
 @login_required
 def create_task():
-    """Create a new task"""
-    data = request.get_json()
-    
-    if not data or not data.get('name') or not data.get('description'):
-        return jsonify({'error': 'Name and description are required'}), 400
-    
-    task = Task(
-        name=data['name'],
-        description=data['description'],
-        status='pending',
-        priority=data.get('priority', 1),
-        task_type=data.get('task_type', 'general'),
-        user_id=current_user.id
-    )
-    
-    db.session.add(task)
+    """Create a new task; retries with the same Idempotency-Key or external_id create nothing"""
+    data = request.get_json(silent=True)
+    
+    try:
+        key = idempotency_key()
+        if key and isinstance(data, dict) and not data.get('external_id'):
+            data = dict(data, external_id=key)
+        values = validate_task_data(data)
+    except TaskValidationError as e:
+        return jsonify({'error': str(e)}), 400
+    values['user_id'] = current_user.id
+    
+    (row, created), = insert_tasks([values])
+    if created:
+        record_status_change(row, None, 'pending')
     db.session.commit()
+    task = db.session.get(Task, row.id)
+    
+    if not created:
+        # A replay: return the original task without doing any work
+        return jsonify({
+            'message': 'Task already exists',
+            'task': task.to_dict()
+        }), 200
     
     # Log task creation
     log_task_event(task.id, 'created', f"Task created via API by user {current_user.username}")
+    trigger_webhook(current_user.id, 'task.created', task_payload(task))
     
     # Schedule the task for processing
-    process_automation_task.delay(task.id)
+    enqueue_task(task)
     
     return jsonify({
         'message': 'Task created successfully and scheduled for processing',
         'task': task.to_dict()
     }), 201
 
+@api_bp.route('/tasks/bulk', methods=['POST'])
+@login_required
+def create_tasks_bulk():
+    """Create many tasks in a single transaction"""
+    data = request.get_json(silent=True)
+    items = data.get('tasks') if isinstance(data, dict) else data
+
+    if not isinstance(items, list) or not items:
+        return jsonify({'error': 'A non-empty array of tasks is required'}), 400
+
+    limit = current_app.config['BULK_TASK_LIMIT']
+    if len(items) > limit:
+        return jsonify({'error': f'At most {limit} tasks can be created per request'}), 413
+
+    try:
+        key = idempotency_key()
+    except TaskValidationError as e:
+        return jsonify({'error': str(e)}), 400
+
+    # Validate every item up front so one bad item does not block the rest
+    results = []
+    rows = []
+    for index, item in enumerate(items):
+        try:
+            if key and isinstance(item, dict) and not item.get('external_id'):
+                # A replayed request maps every item to the same key as before
+                item = dict(item, external_id=f'{key}:{index}')
+            values = validate_task_data(item)
+        except TaskValidationError as e:
+            results.append({'index': index, 'error': str(e)})
+            continue
+        values['user_id'] = current_user.id
+        rows.append(values)
+        results.append({'index': index, 'id': None})
+
+    created_count = 0
+    if rows:
+        # One transaction for all tasks; known external IDs are skipped by
+        # the database, not checked one by one
+        inserted = create_tasks(rows, f"Task created via bulk API by user {current_user.username}")
+        created_count = sum(1 for _, created in inserted if created)
+
+        outcomes = iter(inserted)
+        for result in results:
+            if 'error' not in result:
+                task, created = next(outcomes)
+                result['id'] = task.id
+                if not created:
+                    result['duplicate'] = True
+
+    if created_count:
+        status = 201
+    else:
+        status = 200 if rows else 400
+    return jsonify({
+        'created': created_count,
+        'duplicates': len(rows) - created_count,
+        'failed': len(items) - len(rows),
+        'results': results
+    }), status
+
+def idempotency_key():
+    """
+    Read the optional Idempotency-Key request header.
+
+    Raises:
+        TaskValidationError: If the key is too long to be stored
+    """
+    key = request.headers.get('Idempotency-Key', '').strip()
+    if len(key) > IDEMPOTENCY_KEY_MAX_LENGTH:
+        raise TaskValidationError(f'Idempotency-Key must be at most {IDEMPOTENCY_KEY_MAX_LENGTH} characters')
+    return key or None
+
 @api_bp.route('/tasks/<int:task_id>/run', methods=['POST'])
 @login_required
 def run_task(task_id):
@@ -82,6 +193,7 @@ def run_task(task_id):
         return jsonify({'error': f'Task is already {task.status}'}), 400
     
     # Reset status to pending
+    record_status_change(task, task.status, 'pending')
     task.status = 'pending'
     db.session.commit()
     
@@ -89,7 +201,7 @@ def run_task(task_id):
     log_task_event(task.id, 'manual_run', f"Task manually run via API by user {current_user.username}")
     
     # Schedule the task for processing
-    process_automation_task.delay(task.id)
+    enqueue_task(task)
     
     return jsonify({
         'message': f'Task {task_id} scheduled for processing',
@@ -104,9 +216,10 @@ def delete_task(task_id):
     if task.user_id != current_user.id and not current_user.is_admin:
         return jsonify({'error': 'Unauthorized'}), 403
     
-    # Log task deletion
-    log_task_event(task.id, 'deleted', f"Task deleted by user {current_user.username}")
+    # Log task deletion (written now, before the task and its logs are removed)
+    log_task_event(task.id, 'deleted', f"Task deleted by user {current_user.username}", immediate=True)
     
+    record_status_change(task, task.status, None)
     db.session.delete(task)
     db.session.commit()
     
@@ -137,6 +250,11 @@ def get_users():
 def get_user(user_id):
     """Get a specific user (admin only)"""
     user = User.query.get_or_404(user_id)
+    if wants_ndjson():
+        # Stream the user's tasks one per line
+        query = Task.query.filter_by(user_id=user.id).order_by(Task.id)
+        return ndjson_response(query, Task.to_dict)
+
     return jsonify({
         'id': user.id,
         'username': user.username,
@@ -147,6 +265,15 @@ def get_user(user_id):
         'tasks': [task.to_dict() for task in user.tasks]
     })
 
+@api_bp.route('/admin/queues', methods=['GET'])
+@admin_required
+def get_queue_stats():
+    """Get queue depths and pending-task latency per priority (admin only)"""
+    return jsonify({
+        'queues': queue_depths(),
+        'pending_by_priority': pending_latency_by_priority()
+    })
+
 @api_bp.route('/admin/users/<int:user_id>/toggle_admin', methods=['POST'])
 @admin_required
 def toggle_admin(user_id):
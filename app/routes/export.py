@@ -1,10 +1,12 @@
-from flask import Blueprint, render_template, request, jsonify, send_file
+from flask import Blueprint, render_template, request, jsonify, send_file, url_for, current_app, abort
 from flask_login import login_required, current_user
-from app.models.user import Task
+from app.models.user import Task, ExportJob
 from app import db
-import csv
-import io
-import json
+from app.utils.streaming import csv_response, ndjson_response, wants_gzip, wants_ndjson
+from app.utils.task_import import detect_format, iter_records, import_records
+from app.utils.task_export import CSV_HEADER, EXPORT_FORMATS, task_csv_row
+from app.tasks.export_jobs import run_export_job
+from app.tasks.dispatch import enqueue_tasks
 from datetime import datetime
 import os
 
@@ -19,45 +21,28 @@ def index():
 @export_bp.route('/tasks/csv')
 @login_required
 def export_tasks_csv():
-    """Export tasks as CSV"""
-    # Get tasks for current user
-    tasks = Task.query.filter_by(user_id=current_user.id).all()
-    
-    # Create in-memory file
-    output = io.StringIO()
-    writer = csv.writer(output)
-    
-    # Write header
-    writer.writerow(['ID', 'Name', 'Description', 'Status', 'Type', 'Priority', 
-                    'Created', 'Updated', 'Completed'])
-    
-    # Write data
-    for task in tasks:
-        writer.writerow([
-            task.id,
-            task.name,
-            task.description,
-            task.status,
-            task.task_type,
-            task.priority,
-            task.created_at.strftime('%Y-%m-%d %H:%M:%S') if task.created_at else '',
-            task.updated_at.strftime('%Y-%m-%d %H:%M:%S') if task.updated_at else '',
-            task.completed_at.strftime('%Y-%m-%d %H:%M:%S') if task.completed_at else ''
-        ])
+    """Export tasks as CSV (gzip-compressed with ?gzip=1)"""
+    # Rows are streamed in batches, so memory use does not grow with the export
+    query = Task.query.filter_by(user_id=current_user.id).order_by(Task.id)
     
-    # Prepare response
-    output.seek(0)
-    return send_file(
-        io.BytesIO(output.getvalue().encode('utf-8')),
-        mimetype='text/csv',
-        as_attachment=True,
-        download_name=f'tasks_{datetime.now().strftime("%Y%m%d_%H%M%S")}.csv'
+    return csv_response(
+        query,
+        CSV_HEADER,
+        task_csv_row,
+        f'tasks_{datetime.now().strftime("%Y%m%d_%H%M%S")}',
+        gzip=wants_gzip()
     )
 
 @export_bp.route('/tasks/json')
 @login_required
 def export_tasks_json():
     """Export tasks as JSON"""
+    if wants_ndjson():
+        query = Task.query.filter_by(user_id=current_user.id).order_by(Task.id)
+        return ndjson_response(query, Task.to_dict, headers={
+            'Content-Disposition': f'attachment; filename=tasks_{datetime.now().strftime("%Y%m%d_%H%M%S")}.ndjson'
+        })
+
     # Get tasks for current user
     tasks = Task.query.filter_by(user_id=current_user.id).all()
     
@@ -71,10 +56,78 @@ def export_tasks_json():
         'user': current_user.username
     })
 
+@export_bp.route('/jobs', methods=['POST'])
+@login_required
+def create_export_job():
+    """Start a background export of the current user's tasks"""
+    data = request.get_json(silent=True) or {}
+    export_format = data.get('format', 'csv')
+    if export_format not in EXPORT_FORMATS:
+        return jsonify({'error': f'format must be one of: {", ".join(EXPORT_FORMATS)}'}), 400
+    
+    job = ExportJob(
+        user_id=current_user.id,
+        format=export_format,
+        compressed=bool(data.get('gzip', False))
+    )
+    db.session.add(job)
+    db.session.commit()
+    
+    try:
+        run_export_job.delay(job.id)
+    except Exception as e:
+        current_app.logger.error(f"Failed to start export job {job.id}: {str(e)}")
+        job.status = 'failed'
+        job.error = 'Export could not be started'
+        db.session.commit()
+        return jsonify({'error': job.error, 'job': job.to_dict()}), 503
+    
+    status_url = url_for('export.export_job_status', job_id=job.id)
+    return jsonify({'job': _job_payload(job)}), 202, {'Location': status_url}
+
+@export_bp.route('/jobs/<int:job_id>')
+@login_required
+def export_job_status(job_id):
+    """Get the status and progress of an export job"""
+    job = _get_own_job(job_id)
+    return jsonify({'job': _job_payload(job)})
+
+@export_bp.route('/jobs/<int:job_id>/download')
+@login_required
+def download_export_job(job_id):
+    """Download a finished export; supports Range and conditional requests"""
+    job = _get_own_job(job_id)
+    if job.status in ('pending', 'running'):
+        return jsonify({'error': f'Export is still {job.status}'}), 409
+    if job.status != 'completed' or not job.file_path or not os.path.exists(job.file_path):
+        return jsonify({'error': 'Export is no longer available'}), 410
+    
+    mimetype = 'text/csv' if job.format == 'csv' else 'application/x-ndjson'
+    return send_file(
+        job.file_path,
+        mimetype='application/gzip' if job.compressed else mimetype,
+        as_attachment=True,
+        download_name=job.filename,
+        conditional=True,
+        last_modified=job.completed_at
+    )
+
+def _get_own_job(job_id):
+    job = ExportJob.query.get_or_404(job_id)
+    if job.user_id != current_user.id:
+        abort(404)
+    return job
+
+def _job_payload(job):
+    payload = job.to_dict()
+    if job.status == 'completed':
+        payload['download_url'] = url_for('export.download_export_job', job_id=job.id)
+    return payload
+
 @export_bp.route('/import', methods=['POST'])
 @login_required
 def import_tasks():
-    """Import tasks from JSON"""
+    """Import tasks from a JSON, NDJSON or CSV file"""
     if 'file' not in request.files:
         return jsonify({'error': 'No file part'}), 400
     
@@ -82,39 +135,39 @@ def import_tasks():
     if file.filename == '':
         return jsonify({'error': 'No selected file'}), 400
     
-    if not file.filename.endswith('.json'):
-        return jsonify({'error': 'Only JSON files are supported'}), 400
+    import_format = detect_format(file.filename, request.form.get('format'))
+    if not import_format:
+        return jsonify({'error': 'Only JSON, NDJSON and CSV files are supported'}), 400
     
-    try:
-        # Read and parse JSON
-        content = file.read().decode('utf-8')
-        data = json.loads(content)
-        
-        if 'tasks' not in data:
-            return jsonify({'error': 'Invalid JSON format: missing tasks array'}), 400
-        
-        # Import tasks
-        imported_count = 0
-        for task_data in data['tasks']:
-            # Create new task
-            task = Task(
-                name=task_data.get('name', 'Imported Task'),
-                description=task_data.get('description', ''),
-                status='pending',  # Always start as pending
-                priority=task_data.get('priority', 1),
-                task_type=task_data.get('task_type', 'general'),
-                user_id=current_user.id
-            )
-            db.session.add(task)
-            imported_count += 1
-        
-        db.session.commit()
-        
-        return jsonify({
-            'success': True,
-            'message': f'Successfully imported {imported_count} tasks',
-            'imported_count': imported_count
-        })
-        
-    except Exception as e:
-        return jsonify({'error': f'Error importing tasks: {str(e)}'}), 400
+    on_chunk = None
+    if request.form.get('enqueue') in ('1', 'true', 'yes'):
+        def on_chunk(created_tasks):
+            # Publish each committed chunk to the broker in one round trip
+            try:
+                enqueue_tasks(created_tasks)
+            except Exception as e:
+                # Tasks stay pending and are picked up by the periodic scheduler
+                current_app.logger.error(f"Failed to dispatch imported tasks: {str(e)}")
+    
+    # The upload is parsed as it is read and stored in chunks
+    report = import_records(
+        iter_records(file.stream, import_format),
+        current_user.id,
+        chunk_size=current_app.config['IMPORT_CHUNK_SIZE'],
+        max_errors=current_app.config['IMPORT_MAX_ERRORS'],
+        on_chunk=on_chunk
+    )
+    
+    imported_count = report['imported_count']
+    message = f'Successfully imported {imported_count} tasks'
+    if report['duplicate_count']:
+        message += f", skipped {report['duplicate_count']} already imported"
+    if report['failed_count']:
+        message += f" ({report['failed_count']} rows failed)"
+    
+    success = imported_count > 0 or report['failed_count'] == 0
+    return jsonify({
+        'success': success,
+        'message': message,
+        **report
+    }), 200 if success else 400
@@ -1,10 +1,7 @@
-from flask import Blueprint, render_template, request, jsonify, current_app
+from flask import Blueprint, render_template, request, jsonify
 from flask_login import login_required, current_user
-from app.models.user import Task
-from app import db
-from app.utils.task_logger import log_task_event
-import json
-from datetime import datetime, timedelta
+from app.utils import notifications
+from datetime import datetime
 
 notification_bp = Blueprint('notification', __name__, url_prefix='/notification')
 
@@ -18,22 +15,11 @@ def index():
 @login_required
 def get_settings():
     """Get notification settings for the current user"""
-    # In a real application, this would be stored in the database
-    # For this demo, we'll store it in the app config
-    if 'notifications' not in current_app.config:
-        current_app.config['notifications'] = {}
+    settings = notifications.get_settings(current_user.id)
+    if settings is None:
+        settings = notifications.update_settings(current_user.id, notifications.default_settings(current_user.email))
     
-    if current_user.id not in current_app.config['notifications']:
-        # Default settings
-        current_app.config['notifications'][current_user.id] = {
-            'email_notifications': True,
-            'task_completed': True,
-            'task_failed': True,
-            'daily_summary': False,
-            'email': current_user.email
-        }
-    
-    return jsonify(current_app.config['notifications'][current_user.id])
+    return jsonify(settings)
 
 @notification_bp.route('/settings', methods=['POST'])
 @login_required
@@ -41,84 +27,36 @@ def update_settings():
     """Update notification settings for the current user"""
     data = request.get_json()
     
-    if not data:
+    if not data or not isinstance(data, dict):
         return jsonify({'error': 'No data provided'}), 400
     
-    if 'notifications' not in current_app.config:
-        current_app.config['notifications'] = {}
+    try:
+        settings = notifications.validate_settings(data, current_user.email)
+    except notifications.SettingsValidationError as e:
+        return jsonify({'error': str(e), 'errors': e.errors}), 400
     
-    # Update settings
-    current_app.config['notifications'][current_user.id] = {
-        'email_notifications': data.get('email_notifications', True),
-        'task_completed': data.get('task_completed', True),
-        'task_failed': data.get('task_failed', True),
-        'daily_summary': data.get('daily_summary', False),
-        'email': data.get('email', current_user.email)
-    }
+    settings = notifications.update_settings(current_user.id, settings)
     
     return jsonify({
         'message': 'Notification settings updated successfully',
-        'settings': current_app.config['notifications'][current_user.id]
+        'settings': settings
     })
 
 @notification_bp.route('/test', methods=['POST'])
 @login_required
 def test_notification():
     """Send a test notification"""
-    # In a real application, this would send an actual email
-    # For this demo, we'll just return a success message
+    # Goes through the outbox like any other notification
+    queued = notifications.send_notification(
+        current_user.id,
+        'Test notification',
+        '<p>This is a test notification from the Automation Web Application.</p>'
+    )
+    if not queued:
+        return jsonify({'error': 'No email address to send the notification to'}), 400
     
     return jsonify({
-        'message': 'Test notification sent successfully',
-        'email': current_user.email,
+        'message': 'Test notification queued',
+        'email': (notifications.get_settings(current_user.id) or {}).get('email') or current_user.email,
         'timestamp': datetime.utcnow().isoformat()
     })
-
-# Function to check if notifications should be sent (would be called from other parts of the application)
-def should_notify(user_id, event_type):
-    """
-    Check if a notification should be sent for a specific user and event type
-    
-    Args:
-        user_id (int): User ID
-        event_type (str): Event type (e.g., 'task_completed', 'task_failed')
-        
-    Returns:
-        bool: True if notification should be sent, False otherwise
-    """
-    if 'notifications' not in current_app.config or user_id not in current_app.config['notifications']:
-        return False
-    
-    settings = current_app.config['notifications'][user_id]
-    
-    # Check if email notifications are enabled
-    if not settings.get('email_notifications', True):
-        return False
-    
-    # Check if this specific event type is enabled
-    return settings.get(event_type, False)
-
-# Function to send notification (would be called from other parts of the application)
-def send_notification(user_id, subject, message, event_type=None):
-    """
-    Send a notification to a user
-    
-    Args:
-        user_id (int): User ID
-        subject (str): Notification subject
-        message (str): Notification message
-        event_type (str, optional): Event type for filtering
-        
-    Returns:
-        bool: True if notification was sent, False otherwise
-    """
-    # Check if notification should be sent
-    if event_type and not should_notify(user_id, event_type):
-        return False
-    
-    # In a real application, this would send an actual email
-    # For this demo, we'll just log it
-    current_app.logger.info(f"Notification to user {user_id}: {subject} - {message}")
-    
-    # Return success
-    return True
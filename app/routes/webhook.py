@@ -1,15 +1,21 @@
 from flask import Blueprint, render_template, request, jsonify, current_app
 from flask_login import login_required, current_user
-from app.models.user import Task
+from app.models.user import User, WebhookSubscription
 from app import db
-from app.utils.task_logger import log_task_event
-from app.tasks.automation_processor import process_automation_task
+from app.utils.task_insert import create_tasks
+from app.utils.task_validation import validate_task_data, TaskValidationError
+from app.tasks.webhook_delivery import http_session
+from app.utils.webhook_health import delivery_stats
+# trigger_webhook is re-exported for callers that trigger webhooks
+from app.utils.webhooks import trigger_webhook, signature_valid, EVENT_TYPES, ALL_EVENTS, SIGNATURE_HEADER
 import json
 from datetime import datetime, timedelta
-import requests
 
 webhook_bp = Blueprint('webhook', __name__, url_prefix='/webhook')
 
+# Values for fields a create_task event leaves out
+WEBHOOK_TASK_DEFAULTS = {'name': 'Webhook Task', 'description': 'Created via webhook', 'task_type': 'general'}
+
 @webhook_bp.route('/')
 @login_required
 def index():
@@ -25,76 +31,59 @@ def register_webhook():
     if not data or not data.get('url') or not data.get('event_type'):
         return jsonify({'error': 'URL and event type are required'}), 400
     
-    # In a real application, this would be stored in the database
-    # For this demo, we'll store it in the app config
-    if 'webhooks' not in current_app.config:
-        current_app.config['webhooks'] = {}
-    
-    if current_user.id not in current_app.config['webhooks']:
-        current_app.config['webhooks'][current_user.id] = []
+    if data['event_type'] not in EVENT_TYPES + (ALL_EVENTS,):
+        return jsonify({'error': f"Event type must be one of {list(EVENT_TYPES + (ALL_EVENTS,))}"}), 400
     
-    webhook_id = len(current_app.config['webhooks'][current_user.id]) + 1
+    if not data['url'].startswith(('http://', 'https://')) or len(data['url']) > 500:
+        return jsonify({'error': 'URL must be an http(s) URL of at most 500 characters'}), 400
     
-    webhook = {
-        'id': webhook_id,
-        'url': data['url'],
-        'event_type': data['event_type'],
-        'created_at': datetime.utcnow().isoformat(),
-        'active': True
-    }
-    
-    current_app.config['webhooks'][current_user.id].append(webhook)
+    webhook = WebhookSubscription(
+        user_id=current_user.id,
+        url=data['url'],
+        event_type=data['event_type']
+    )
+    db.session.add(webhook)
+    db.session.commit()
     
     return jsonify({
         'message': 'Webhook registered successfully',
-        'webhook': webhook
+        'webhook': webhook.to_dict()
     })
 
 @webhook_bp.route('/list', methods=['GET'])
 @login_required
 def list_webhooks():
     """List all webhooks for the current user"""
-    if 'webhooks' not in current_app.config or current_user.id not in current_app.config['webhooks']:
-        return jsonify({'webhooks': []})
+    webhooks = WebhookSubscription.query.filter_by(user_id=current_user.id).order_by(WebhookSubscription.id).all()
     
+    # Delivery health comes from the cache backend, not the database
     return jsonify({
-        'webhooks': current_app.config['webhooks'][current_user.id]
+        'webhooks': [dict(webhook.to_dict(), delivery=delivery_stats(webhook.url)) for webhook in webhooks]
     })
 
 @webhook_bp.route('/delete/<int:webhook_id>', methods=['DELETE'])
 @login_required
 def delete_webhook(webhook_id):
     """Delete a webhook"""
-    if 'webhooks' not in current_app.config or current_user.id not in current_app.config['webhooks']:
+    webhook = WebhookSubscription.query.filter_by(id=webhook_id, user_id=current_user.id).first()
+    if not webhook:
         return jsonify({'error': 'Webhook not found'}), 404
     
-    webhooks = current_app.config['webhooks'][current_user.id]
-    for i, webhook in enumerate(webhooks):
-        if webhook['id'] == webhook_id:
-            del webhooks[i]
-            return jsonify({'message': 'Webhook deleted successfully'})
-    
-    return jsonify({'error': 'Webhook not found'}), 404
+    db.session.delete(webhook)
+    db.session.commit()
+    return jsonify({'message': 'Webhook deleted successfully'})
 
 @webhook_bp.route('/test/<int:webhook_id>', methods=['POST'])
 @login_required
 def test_webhook(webhook_id):
     """Test a webhook by sending a test event"""
-    if 'webhooks' not in current_app.config or current_user.id not in current_app.config['webhooks']:
-        return jsonify({'error': 'Webhook not found'}), 404
-    
-    webhook = None
-    for w in current_app.config['webhooks'][current_user.id]:
-        if w['id'] == webhook_id:
-            webhook = w
-            break
-    
+    webhook = WebhookSubscription.query.filter_by(id=webhook_id, user_id=current_user.id).first()
     if not webhook:
         return jsonify({'error': 'Webhook not found'}), 404
     
     # Prepare test payload
     payload = {
-        'event_type': webhook['event_type'],
+        'event_type': webhook.event_type,
         'test': True,
         'timestamp': datetime.utcnow().isoformat(),
         'user_id': current_user.id,
@@ -103,11 +92,10 @@ def test_webhook(webhook_id):
     
     # Send webhook
     try:
-        response = requests.post(
-            webhook['url'],
+        response = http_session().post(
+            webhook.url,
             json=payload,
-            headers={'Content-Type': 'application/json'},
-            timeout=5
+            timeout=current_app.config['WEBHOOK_TIMEOUT']
         )
         
         return jsonify({
@@ -120,91 +108,106 @@ def test_webhook(webhook_id):
             'error': f'Failed to send test webhook: {str(e)}'
         }), 500
 
-# Function to trigger webhooks (would be called from other parts of the application)
-def trigger_webhook(user_id, event_type, payload):
-    """
-    Trigger webhooks for a specific user and event type
-    
-    Args:
-        user_id (int): User ID
-        event_type (str): Event type (e.g., 'task.created', 'task.completed')
-        payload (dict): Event payload
-    """
-    if 'webhooks' not in current_app.config or user_id not in current_app.config['webhooks']:
-        return
-    
-    for webhook in current_app.config['webhooks'][user_id]:
-        if webhook['event_type'] == event_type and webhook['active']:
-            try:
-                # Add timestamp and event type to payload
-                full_payload = {
-                    'event_type': event_type,
-                    'timestamp': datetime.utcnow().isoformat(),
-                    **payload
-                }
-                
-                # Send webhook asynchronously (in a real app, this would be a Celery task)
-                requests.post(
-                    webhook['url'],
-                    json=full_payload,
-                    headers={'Content-Type': 'application/json'},
-                    timeout=5
-                )
-            except Exception as e:
-                current_app.logger.error(f"Failed to send webhook: {str(e)}")
-
 # Webhook endpoint for receiving external events
 @webhook_bp.route('/receive', methods=['POST'])
 def receive_webhook():
-    """Receive webhook from external service"""
-    data = request.get_json()
+    """
+    Receive a batch of events from an external service.
+
+    The body is one event, an array of events or ``{"events": [...]}``.
+    All create_task events are stored in one transaction and processed by
+    the workers; a redelivered event id creates nothing.
+    """
+    secret = current_app.config['WEBHOOK_SIGNING_SECRET']
+    if not secret:
+        return jsonify({'error': 'Inbound webhooks are not configured'}), 503
+    
+    # Verify the signature before parsing anything
+    if not signature_valid(request.get_data(), request.headers.get(SIGNATURE_HEADER), secret):
+        return jsonify({'error': 'Invalid signature'}), 401
     
-    if not data:
+    data = request.get_json(silent=True)
+    events = data.get('events', [data]) if isinstance(data, dict) else data
+    if not isinstance(events, list) or not events:
         return jsonify({'error': 'No data provided'}), 400
     
-    # Validate webhook signature (in a real app)
-    # This is a simplified example
+    limit = current_app.config['WEBHOOK_RECEIVE_LIMIT']
+    if len(events) > limit:
+        return jsonify({'error': f'At most {limit} events can be sent per request'}), 413
+    
+    results = []
+    pending = []
+    for index, item in enumerate(events):
+        result = {'index': index, 'id': item.get('id') if isinstance(item, dict) else None}
+        results.append(result)
+        try:
+            values = _task_from_event(item)
+        except TaskValidationError as e:
+            result['error'] = str(e)
+            continue
+        if values is None:
+            # Acknowledge unhandled event types
+            result['status'] = 'ignored'
+            continue
+        pending.append((result, values))
+    
+    # Events for unknown users fail on their own rather than the whole batch
+    user_ids = {values['user_id'] for _, values in pending}
+    known_users = set(db.session.scalars(db.select(User.id).where(User.id.in_(user_ids)))) if user_ids else set()
+    rows = []
+    for result, values in pending:
+        if values['user_id'] in known_users:
+            rows.append((result, values))
+        else:
+            result['error'] = 'Unknown user'
+    
+    if rows:
+        inserted = create_tasks([values for _, values in rows], "Task created via webhook")
+        for (result, _), (task, created) in zip(rows, inserted):
+            result['task_id'] = task.id
+            result['status'] = 'accepted' if created else 'duplicate'
+    
+    counts = {'accepted': 0, 'duplicate': 0, 'ignored': 0}
+    for result in results:
+        if 'status' in result:
+            counts[result['status']] += 1
+    failed = len(events) - sum(counts.values())
     
-    # Process the webhook data
-    event_type = data.get('event_type')
+    return jsonify({
+        'accepted': counts['accepted'],
+        'duplicates': counts['duplicate'],
+        'ignored': counts['ignored'],
+        'failed': failed,
+        'results': results
+    }), 202 if failed < len(events) else 400
+
+def _task_from_event(event):
+    """
+    Validate a create_task event.
     
-    if event_type == 'create_task':
-        # Create a task from the webhook
-        if 'task' not in data:
-            return jsonify({'error': 'Task data not provided'}), 400
-        
-        task_data = data['task']
-        user_id = task_data.get('user_id')
-        
-        if not user_id:
-            return jsonify({'error': 'User ID not provided'}), 400
-        
-        # Create the task
-        task = Task(
-            name=task_data.get('name', 'Webhook Task'),
-            description=task_data.get('description', 'Created via webhook'),
-            status='pending',
-            priority=task_data.get('priority', 1),
-            task_type=task_data.get('task_type', 'api'),
-            user_id=user_id
-        )
-        
-        db.session.add(task)
-        db.session.commit()
-        
-        # Log task creation
-        log_task_event(task.id, 'created', f"Task created via webhook")
-        
-        # Schedule the task for processing
-        process_automation_task.delay(task.id)
-        
-        return jsonify({
-            'message': 'Task created successfully',
-            'task_id': task.id
-        })
+    Returns:
+        dict: Task column values with ``user_id``, or None for other event types
     
-    # Default response for unhandled event types
-    return jsonify({
-        'message': f'Webhook received: {event_type}',
-        'status': 'acknowledged'
-    })
+    Raises:
+        TaskValidationError: If the event is invalid
+    """
+    if not isinstance(event, dict):
+        raise TaskValidationError('Event must be an object')
+    if event.get('event_type') != 'create_task':
+        return None
+    
+    task_data = event.get('task')
+    if not isinstance(task_data, dict):
+        raise TaskValidationError('Task data not provided')
+    try:
+        user_id = int(task_data['user_id'])
+    except (KeyError, TypeError, ValueError):
+        raise TaskValidationError('User ID not provided')
+    
+    task_data = dict(WEBHOOK_TASK_DEFAULTS, **task_data)
+    if event.get('id') is not None and not task_data.get('external_id'):
+        # A redelivered event maps to the task it created the first time
+        task_data['external_id'] = f"event:{event['id']}"
+    values = validate_task_data(task_data)
+    values['user_id'] = user_id
+    return values
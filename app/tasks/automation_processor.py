@@ -1,72 +1,85 @@
-from app.tasks.task_scheduler import schedule_task
-from app.utils.task_logger import log_task_event
+from app.tasks.task_claims import claim_task, release_task, worker_id
+from app.tasks.handlers import get_handler
+from app.utils.task_logger import log_task_event, task_log_batch
+from app.utils.task_stats import record_status_change, task_key
+from app.utils.webhooks import trigger_task_event
+from app.utils.notifications import notify_task_event
 from app import celery, db
 from app.models.user import Task
 from datetime import datetime
-import time
 import logging
 
 logger = logging.getLogger(__name__)
 
-@celery.task
+# Acknowledged only once the handler finished, so a worker that dies mid-task
+# leaves the message to be delivered again (the lease keeps it exclusive)
+@celery.task(acks_late=True, reject_on_worker_lost=True)
+@task_log_batch()
 def process_automation_task(task_id):
     """
     Process an automation task based on its type.
-    This function handles different types of automation tasks.
+    The handler registered for the task type runs in this task; its
+    execution model decides which queue, and so which kind of worker,
+    the task is routed to.
     """
     logger.info(f"Processing automation task {task_id}")
-    
+
     task = Task.query.get(task_id)
     if not task:
         logger.error(f"Task {task_id} not found")
         return f"Error: Task {task_id} not found"
-    
-    # Update task status to processing
-    task.status = 'processing'
+
+    # Claim the task so that no other worker processes it concurrently
+    owner = worker_id()
+    key, old_status = task_key(task), task.status
+    if not claim_task(task_id, owner):
+        logger.info(f"Task {task_id} already claimed or not pending, skipping")
+        return f"Task {task_id} skipped: already claimed or not pending"
+
+    record_status_change(key, old_status, 'processing')
     db.session.commit()
-    
+
     # Log the start of processing
     log_task_event(task_id, 'processing', f"Started processing task: {task.name}")
-    
+
+    handler = get_handler(task.task_type)
     try:
-        # Simulate processing time
-        time.sleep(3)
-        
-        # In a real application, we would determine the task type and process accordingly
-        if "email" in task.name.lower():
-            # This would call the actual email sending function
-            result = f"Email task would be processed: {task.name}"
-            logger.info(result)
-            log_task_event(task_id, 'info', "Email processing simulation completed")
-        elif "file" in task.name.lower():
-            # This would call the actual file processing function
-            result = f"File task would be processed: {task.name}"
-            logger.info(result)
-            log_task_event(task_id, 'info', "File processing simulation completed")
-        else:
-            # Generic processing
-            result = f"Generic task processed: {task.name}"
-            logger.info(result)
-            log_task_event(task_id, 'info', "Generic processing simulation completed")
-        
-        # Update task status to completed
-        task.status = 'completed'
-        task.completed_at = datetime.utcnow()
-        db.session.commit()
-        
-        # Log the completion
-        log_task_event(task_id, 'completed', f"Task completed successfully: {result}")
-        
-        return f"Task {task_id} processed successfully: {result}"
-    
+        result = handler.func(task.to_dict())
     except Exception as e:
-        # Update task status to failed
-        task.status = 'failed'
+        return _fail_task(task_id, owner, key, e)
+    return _complete_task(task_id, owner, key, handler, result)
+
+def _complete_task(task_id, owner, key, handler, result):
+    logger.info(result)
+    log_task_event(task_id, 'info', f"{handler.task_type.capitalize()} processing completed")
+
+    # Update task status to completed
+    completed_at = datetime.utcnow()
+    if not release_task(task_id, owner, 'completed', completed_at=completed_at):
+        return f"Task {task_id} lease lost before completion"
+
+    record_status_change(key, 'processing', 'completed', completed_at=completed_at)
+    db.session.commit()
+
+    # Log the completion
+    log_task_event(task_id, 'completed', f"Task completed successfully: {result}")
+    trigger_task_event(key.user_id, task_id, 'task.completed')
+    notify_task_event(key.user_id, task_id, 'task_completed')
+
+    return f"Task {task_id} processed successfully: {result}"
+
+def _fail_task(task_id, owner, key, error):
+    # Update task status to failed
+    db.session.rollback()
+    if release_task(task_id, owner, 'failed'):
+        record_status_change(key, 'processing', 'failed')
         db.session.commit()
-        
-        # Log the error
-        error_message = f"Error processing task: {str(e)}"
-        log_task_event(task_id, 'failed', error_message)
-        
-        logger.error(f"Error processing task {task_id}: {str(e)}")
-        return f"Error processing task {task_id}: {str(e)}"
+        trigger_task_event(key.user_id, task_id, 'task.failed')
+        notify_task_event(key.user_id, task_id, 'task_failed')
+
+    # Log the error
+    error_message = f"Error processing task: {str(error)}"
+    log_task_event(task_id, 'failed', error_message)
+
+    logger.error(f"Error processing task {task_id}: {str(error)}")
+    return f"Error processing task {task_id}: {str(error)}"
@@ -0,0 +1,51 @@
+from app.tasks.automation_processor import process_automation_task
+from app.tasks.task_claims import mark_tasks_queued
+from app.tasks.routing import queue_for_task
+from celery import group
+import logging
+
+logger = logging.getLogger(__name__)
+
+def enqueue_task(task, celery_task=None):
+    """
+    Send a single task to the automation workers.
+
+    Args:
+        task: Task (or row) with ``id``, ``priority`` and ``task_type``
+        celery_task (optional): Celery task to run, defaults to process_automation_task
+
+    Returns:
+        AsyncResult: Celery result handle
+    """
+    celery_task = celery_task or process_automation_task
+    result = celery_task.apply_async(
+        (task.id,), queue=queue_for_task(task.priority, task.task_type)
+    )
+    mark_tasks_queued([task.id])
+    return result
+
+def enqueue_tasks(tasks, celery_task=None):
+    """
+    Send many tasks to the automation workers in one broker round trip.
+
+    Each task is routed to the queue matching its priority and type. Tasks
+    are marked queued once the broker has them; if sending fails they stay
+    unmarked and the next scheduler sweep dispatches them.
+
+    Args:
+        tasks (list): Tasks (or rows) with ``id``, ``priority`` and ``task_type``
+        celery_task (optional): Celery task to run, defaults to process_automation_task
+
+    Returns:
+        GroupResult: Celery group result handle, or None if there was nothing to send
+    """
+    if not tasks:
+        return None
+    celery_task = celery_task or process_automation_task
+    logger.info(f"Dispatching {len(tasks)} tasks")
+    result = group(
+        celery_task.si(task.id).set(queue=queue_for_task(task.priority, task.task_type))
+        for task in tasks
+    ).apply_async()
+    mark_tasks_queued([task.id for task in tasks])
+    return result
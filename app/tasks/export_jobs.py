@@ -0,0 +1,115 @@
+from app import celery, db
+from app.models.user import ExportJob, Task
+from app.utils.task_export import format_header, format_tasks, iter_task_batches
+from app.utils.streaming import GZIP_LEVEL
+from flask import current_app
+from datetime import datetime, timedelta
+import glob
+import logging
+import os
+import secrets
+import zlib
+
+logger = logging.getLogger(__name__)
+
+def spool_dir():
+    """Directory holding export artifacts, created on first use."""
+    path = current_app.config['EXPORT_SPOOL_DIR']
+    os.makedirs(path, exist_ok=True)
+    return path
+
+@celery.task
+def run_export_job(job_id):
+    """
+    Write a user's tasks to a file in the spool directory.
+    Tasks are read in batches and the job's progress is committed after
+    each batch, so the status endpoint can report it while the job runs.
+    """
+    job = db.session.get(ExportJob, job_id)
+    if not job or job.status != 'pending':
+        return f"Export job {job_id} not found or already started"
+
+    job.status = 'running'
+    job.started_at = datetime.utcnow()
+    job.total_rows = Task.query.filter_by(user_id=job.user_id).count()
+    db.session.commit()
+
+    export_format, compressed, user_id = job.format, job.compressed, job.user_id
+    path = os.path.join(spool_dir(), f'export_{job_id}_{secrets.token_hex(8)}')
+    partial_path = path + '.part'
+    try:
+        compressor = zlib.compressobj(GZIP_LEVEL, zlib.DEFLATED, 31) if compressed else None
+        with open(partial_path, 'wb') as output:
+            def write(text):
+                data = text.encode('utf-8')
+                output.write(compressor.compress(data) if compressor else data)
+
+            write(format_header(export_format))
+            for tasks in iter_task_batches(user_id, current_app.config['EXPORT_BATCH_SIZE']):
+                write(format_tasks(tasks, export_format))
+                job.rows_written = (job.rows_written or 0) + len(tasks)
+                db.session.commit()
+            if compressor:
+                output.write(compressor.flush())
+
+        # Only complete files ever appear under the final name
+        os.replace(partial_path, path)
+    except Exception as e:
+        db.session.rollback()
+        if os.path.exists(partial_path):
+            os.remove(partial_path)
+        job.status = 'failed'
+        job.error = str(e)
+        job.completed_at = datetime.utcnow()
+        job.expires_at = job.completed_at + timedelta(seconds=current_app.config['EXPORT_RETENTION_SECONDS'])
+        db.session.commit()
+        logger.error(f"Export job {job_id} failed: {str(e)}")
+        return f"Export job {job_id} failed: {str(e)}"
+
+    job.status = 'completed'
+    job.file_path = path
+    job.file_size = os.path.getsize(path)
+    job.completed_at = datetime.utcnow()
+    job.expires_at = job.completed_at + timedelta(seconds=current_app.config['EXPORT_RETENTION_SECONDS'])
+    db.session.commit()
+
+    logger.info(f"Export job {job_id} wrote {job.rows_written} tasks")
+    return f"Export job {job_id} completed: {job.rows_written} tasks"
+
+@celery.task
+def cleanup_export_jobs():
+    """
+    Delete the artifacts of expired export jobs.
+    Jobs still running after EXPORT_STALE_SECONDS lost their worker; they
+    are marked failed and their partial files deleted.
+    This is a maintenance task that runs every hour.
+    """
+    now = datetime.utcnow()
+    config = current_app.config
+    stale_jobs = ExportJob.query.filter(
+        ExportJob.status == 'running',
+        ExportJob.started_at <= now - timedelta(seconds=config['EXPORT_STALE_SECONDS'])
+    ).all()
+    for job in stale_jobs:
+        for partial_path in glob.glob(os.path.join(config['EXPORT_SPOOL_DIR'], f'export_{job.id}_*.part')):
+            os.remove(partial_path)
+        job.status = 'failed'
+        job.error = 'Export worker stopped before finishing'
+        job.completed_at = now
+        job.expires_at = now + timedelta(seconds=config['EXPORT_RETENTION_SECONDS'])
+        logger.warning(f"Export job {job.id} was abandoned by its worker")
+
+    jobs = ExportJob.query.filter(
+        ExportJob.expires_at <= now,
+        ExportJob.status.in_(['completed', 'failed'])
+    ).all()
+
+    for job in jobs:
+        if job.file_path and os.path.exists(job.file_path):
+            os.remove(job.file_path)
+        job.status = 'expired'
+        job.file_path = None
+    db.session.commit()
+
+    logger.info(f"Expired {len(jobs)} export jobs, failed {len(stale_jobs)} stale ones")
+    return f"Expired {len(jobs)} export jobs, failed {len(stale_jobs)} stale ones"
@@ -0,0 +1,187 @@
+from app.models.user import User
+from app.utils.api_client import APIClient
+from app.utils.email_sender import send_email
+from app.utils.file_processor import process_file
+from app.utils.notifications import get_settings
+from app import db
+from flask import current_app
+from sqlalchemy import select
+from urllib.parse import urlsplit
+import json
+import logging
+import os
+
+logger = logging.getLogger(__name__)
+
+# The kind of worker a handler needs; task routing sends it to the queue
+# configured for its model in TASK_EXECUTION_QUEUES:
+#   inline  - short, trivial work; the priority queues
+#   thread  - I/O-bound work such as API calls or SMTP; a queue served by a
+#             worker started with --pool=threads, so one process waits on
+#             many requests at once
+#   process - CPU-bound work; a queue served by a prefork worker, one task
+#             per process
+# Handlers always run in the Celery task itself, which is acknowledged once
+# the handler has finished.
+EXECUTION_MODELS = ('inline', 'thread', 'process')
+
+_handlers = {}
+
+class TaskHandler:
+    """A task-type handler and the execution model it runs under."""
+
+    def __init__(self, task_type, func, execution='inline'):
+        if execution not in EXECUTION_MODELS:
+            raise ValueError(f"Unknown execution model: {execution}")
+        self.task_type = task_type
+        self.func = func
+        self.execution = execution
+
+    def __repr__(self):
+        return f'<TaskHandler {self.task_type} ({self.execution})>'
+
+def register_handler(task_type, execution='inline'):
+    """
+    Register a handler for a task type.
+
+    Handlers receive the task as a dict (``Task.to_dict()``) and return a
+    short result description. Raising an exception marks the task as failed.
+
+    Args:
+        task_type (str): Value of ``Task.task_type`` handled by the function
+        execution (str, optional): One of EXECUTION_MODELS
+    """
+    def decorator(func):
+        _handlers[task_type] = TaskHandler(task_type, func, execution)
+        return func
+    return decorator
+
+def get_handler(task_type):
+    """Get the handler for a task type, falling back to the general handler."""
+    return _handlers.get(task_type) or _handlers['general']
+
+@register_handler('general')
+def handle_general(task):
+    """Generic processing"""
+    return f"Generic task processed: {task['name']}"
+
+@register_handler('email', execution='thread')
+def handle_email(task):
+    """
+    Send an email. The description is a JSON object with ``to``,
+    ``subject`` and ``body``; tasks with a plain description are
+    processed like general tasks. Only the task owner's own addresses (their
+    account or notification address) are accepted as recipients.
+    """
+    parameters = task_parameters(task, 'to')
+    if parameters is None:
+        return handle_general(task)
+    if parameters['to'].lower() not in _owner_addresses(task['user_id']):
+        raise ValueError(f"Email tasks can only be sent to the task owner's addresses, not {parameters['to']}")
+    if not send_email(parameters['to'], parameters.get('subject') or task['name'], parameters.get('body', '')):
+        raise RuntimeError(f"Email to {parameters['to']} was not sent")
+    return f"Email sent to {parameters['to']}"
+
+@register_handler('api', execution='thread')
+def handle_api(task):
+    """
+    Call an external API. The description is a JSON object with ``url``
+    and optionally ``method``, ``params``, ``json`` and ``timeout``; tasks
+    with a plain description are processed like general tasks. The URL must
+    be under one of TASK_API_ALLOWED_URLS, and redirects are not followed.
+    """
+    parameters = task_parameters(task, 'url')
+    if parameters is None:
+        return handle_general(task)
+    if not api_url_allowed(parameters['url']):
+        raise ValueError(f"URL not in TASK_API_ALLOWED_URLS: {parameters['url']}")
+    method = parameters.get('method', 'GET').upper()
+    client = APIClient()
+    # A redirect could lead anywhere, so it is reported as an error
+    client.session.max_redirects = 0
+    result = client.request(
+        method, parameters['url'], params=parameters.get('params'),
+        json=parameters.get('json'), timeout=parameters.get('timeout')
+    )
+    if 'error' in result:
+        raise RuntimeError(f"{method} {parameters['url']} failed: {result['error']}")
+    return f"{method} {parameters['url']} succeeded"
+
+@register_handler('file', execution='process')
+def handle_file(task):
+    """
+    Process a file. The description is a JSON object with ``path`` and
+    optionally ``output_dir`` and ``file_type``, both relative to
+    TASK_FILE_ROOT; tasks with a plain description are processed like
+    general tasks.
+    """
+    parameters = task_parameters(task, 'path')
+    if parameters is None:
+        return handle_general(task)
+    path = task_file_path(parameters['path'])
+    output_dir = task_file_path(parameters['output_dir']) if parameters.get('output_dir') else None
+    result = process_file(path, output_dir, parameters.get('file_type'))
+    if not result.get('success'):
+        raise RuntimeError(f"Processing {parameters['path']} failed: {result.get('error')}")
+    return f"File processed: {parameters['path']}"
+
+def task_parameters(task, *required):
+    """
+    Read a task's parameters, stored as a JSON object in its description.
+
+    Returns:
+        dict: The parameters, or None if the description is free text
+            rather than a JSON object
+
+    Raises:
+        ValueError: If a required parameter is missing
+    """
+    try:
+        parameters = json.loads(task['description'] or '')
+    except ValueError:
+        parameters = None
+    if not isinstance(parameters, dict):
+        return None
+    missing = [name for name in required if not parameters.get(name)]
+    if missing:
+        raise ValueError(f"Missing task parameters: {', '.join(missing)}")
+    return parameters
+
+def api_url_allowed(url):
+    """
+    Check that a URL is under one of the base URLs in TASK_API_ALLOWED_URLS.
+
+    Scheme, host and port must match and the path must start with the base
+    URL's path, segment by segment.
+    """
+    parts = urlsplit(url)
+    if parts.scheme not in ('http', 'https') or not parts.hostname or parts.username or parts.password:
+        return False
+    for base_url in current_app.config['TASK_API_ALLOWED_URLS']:
+        base = urlsplit(base_url)
+        if (parts.scheme, parts.hostname, parts.port) != (base.scheme, base.hostname, base.port):
+            continue
+        prefix = base.path.rstrip('/')
+        if parts.path == prefix or parts.path.startswith(prefix + '/'):
+            return True
+    return False
+
+def task_file_path(path):
+    """
+    Resolve a file task path inside TASK_FILE_ROOT.
+
+    Raises:
+        ValueError: If the path (after following symlinks) is outside the root
+    """
+    root = os.path.realpath(current_app.config['TASK_FILE_ROOT'])
+    resolved = os.path.realpath(os.path.join(root, path))
+    if os.path.commonpath([root, resolved]) != root:
+        raise ValueError(f"Path is outside TASK_FILE_ROOT: {path}")
+    return resolved
+
+def _owner_addresses(user_id):
+    settings = get_settings(user_id) or {}
+    addresses = [settings.get('email'), db.session.execute(
+        select(User.email).where(User.id == user_id)
+    ).scalar()]
+    return {address.lower() for address in addresses if address}
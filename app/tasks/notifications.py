@@ -0,0 +1,146 @@
+from app import celery, db
+from app.models.user import OutboxMessage
+from app.utils.email_sender import get_mailer
+from app.utils.notifications import queue_daily_digests
+from flask import current_app
+from sqlalchemy import select, update
+from datetime import datetime, timedelta
+import logging
+
+logger = logging.getLogger(__name__)
+
+@celery.task
+def drain_outbox(batch_size=None):
+    """
+    Send queued notification emails.
+    Messages are claimed in batches of NOTIFICATION_BATCH_SIZE and each batch
+    is sent over one SMTP connection. Failed messages are retried with
+    backoff until NOTIFICATION_MAX_ATTEMPTS, then marked failed.
+    """
+    batch_size = batch_size or current_app.config['NOTIFICATION_BATCH_SIZE']
+    sent = failed = 0
+    while True:
+        messages = claim_outbox_batch(batch_size)
+        if not messages:
+            break
+
+        mailer = get_mailer()
+        results = mailer.send_batch([
+            mailer.message(message.recipient, message.subject, message.body) for message in messages
+        ])
+        sent_count, failed_count = record_outbox_results(messages, results)
+        sent += sent_count
+        failed += failed_count
+        if len(messages) < batch_size:
+            break
+
+    return f"Sent {sent} notifications, {failed} failed"
+
+@celery.task
+def send_daily_digests(day=None):
+    """
+    Queue the daily_summary digests for a day (by default yesterday, UTC)
+    and start sending them.
+    """
+    day = datetime.strptime(day, '%Y-%m-%d').date() if day else (datetime.utcnow() - timedelta(days=1)).date()
+    queued = queue_daily_digests(day)
+    if queued:
+        drain_outbox.delay()
+    return f"Queued {queued} digests for {day.isoformat()}"
+
+def claim_outbox_batch(limit):
+    """
+    Claim messages that are due for sending.
+
+    Claimed messages stay 'sending' for NOTIFICATION_LEASE_SECONDS; if the
+    worker dies before recording the outcome they are claimed again after
+    that, unless they already used up NOTIFICATION_MAX_ATTEMPTS, in which
+    case they are marked failed. Rows are locked with SKIP LOCKED where the
+    database supports it, so concurrent drain tasks split the outbox between
+    them.
+
+    Args:
+        limit (int): Maximum number of messages
+
+    Returns:
+        list: Rows (id, recipient, subject, body, attempts) of the claimed
+        messages, with ``attempts`` counting this one
+    """
+    now = datetime.utcnow()
+    max_attempts = current_app.config['NOTIFICATION_MAX_ATTEMPTS']
+    # A message whose send keeps killing the worker must not be retried forever
+    abandoned = db.session.execute(
+        update(OutboxMessage)
+        .where(OutboxMessage.status == 'sending', OutboxMessage.available_at <= now,
+               OutboxMessage.attempts >= max_attempts)
+        .values(status='failed', error='Sending did not complete', available_at=now)
+        .execution_options(synchronize_session=False)
+    ).rowcount
+    if abandoned:
+        logger.error(f"Giving up on {abandoned} notifications whose sending never completed")
+
+    messages = db.session.execute(
+        select(OutboxMessage.id, OutboxMessage.recipient, OutboxMessage.subject,
+               OutboxMessage.body, (OutboxMessage.attempts + 1).label('attempts'))
+        .where(OutboxMessage.status.in_(('pending', 'sending')), OutboxMessage.available_at <= now,
+               OutboxMessage.attempts < max_attempts)
+        .order_by(OutboxMessage.id)
+        .limit(limit)
+        .with_for_update(skip_locked=True)
+    ).all()
+    if messages:
+        db.session.execute(
+            update(OutboxMessage)
+            .where(OutboxMessage.id.in_([message.id for message in messages]))
+            .values(
+                status='sending',
+                attempts=OutboxMessage.attempts + 1,
+                available_at=now + timedelta(seconds=current_app.config['NOTIFICATION_LEASE_SECONDS'])
+            )
+            .execution_options(synchronize_session=False)
+        )
+    db.session.commit()
+    return messages
+
+def record_outbox_results(messages, results):
+    """
+    Store the outcome of a sent batch.
+
+    Args:
+        messages (list): Rows returned by ``claim_outbox_batch``
+        results (list): One bool per message, True if it was accepted
+
+    Returns:
+        tuple: (sent, failed) counts; failed includes messages to be retried
+    """
+    config = current_app.config
+    now = datetime.utcnow()
+    sent_ids = [message.id for message, accepted in zip(messages, results) if accepted]
+    if sent_ids:
+        db.session.execute(
+            update(OutboxMessage)
+            .where(OutboxMessage.id.in_(sent_ids))
+            .values(status='sent', sent_at=now, error=None)
+            .execution_options(synchronize_session=False)
+        )
+
+    retries = []
+    for message, accepted in zip(messages, results):
+        if accepted:
+            continue
+        if message.attempts >= config['NOTIFICATION_MAX_ATTEMPTS']:
+            retries.append({'id': message.id, 'status': 'failed', 'error': 'Not accepted by the mail server', 'available_at': now})
+            logger.error(f"Giving up on notification {message.id} to {message.recipient} after {message.attempts} attempts")
+        else:
+            delay = config['NOTIFICATION_RETRY_SECONDS'] * 2 ** (message.attempts - 1)
+            retries.append({
+                'id': message.id,
+                'status': 'pending',
+                'error': 'Not accepted by the mail server',
+                'available_at': now + timedelta(seconds=delay)
+            })
+    if retries:
+        # Bulk UPDATE by primary key
+        db.session.execute(update(OutboxMessage), retries)
+    db.session.commit()
+    return len(sent_ids), len(retries)
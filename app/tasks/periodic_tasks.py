@@ -1,5 +1,9 @@
-from app.tasks.task_scheduler import run_scheduled_tasks
-from app.utils.task_logger import log_task_event
+from app.tasks.task_scheduler import queue_pending_tasks
+from app.tasks.task_claims import reclaim_expired_leases
+from app.utils.task_logger import log_task_event, task_log_batch
+from app.utils.task_stats import rebuild_daily_stats
+from app.tasks.export_jobs import cleanup_export_jobs
+from app.tasks.notifications import drain_outbox, send_daily_digests
 from app import celery
 from celery.schedules import crontab
 from app.models.user import Task
@@ -20,27 +24,55 @@ def setup_periodic_tasks(sender, **kwargs):
         cleanup_completed_tasks.s(),
         name='cleanup completed tasks'
     )
+    
+    # Repair any drift in the analytics rollup once a day
+    sender.add_periodic_task(
+        crontab(hour=1, minute=0),
+        rebuild_task_stats.s(),
+        name='rebuild task stats'
+    )
+    
+    # Delete expired export artifacts every hour
+    sender.add_periodic_task(3600.0, cleanup_export_jobs.s(), name='cleanup export jobs')
+    
+    # Send queued notifications, and yesterday's digests shortly after midnight
+    sender.add_periodic_task(
+        float(sender.conf.get('NOTIFICATION_DRAIN_INTERVAL') or 60),
+        drain_outbox.s(),
+        name='drain notification outbox'
+    )
+    sender.add_periodic_task(
+        crontab(hour=0, minute=30),
+        send_daily_digests.s(),
+        name='send daily digests'
+    )
 
 @celery.task
+@task_log_batch()
 def check_pending_tasks():
     """
     Periodic task to check for pending tasks and process them.
     This is a scheduled task that runs automatically.
     """
     logger.info("Checking for pending tasks")
-    pending_tasks = Task.query.filter_by(status='pending').all()
     
-    for task in pending_tasks:
+    # Tasks whose worker died mid-run go back to pending
+    reclaim_expired_leases()
+    
+    # Only dispatch tasks that are not already waiting in the broker
+    task_ids = queue_pending_tasks()
+    
+    for task_id in task_ids:
         # Log that we're scheduling this task
-        log_task_event(task.id, 'scheduled', f"Task scheduled for processing: {task.name}")
+        log_task_event(task_id, 'scheduled', "Task scheduled for processing")
     
-    # Call the actual task scheduler
-    result = run_scheduled_tasks()
+    result = f"Scheduled {len(task_ids)} tasks"
     logger.info(f"Task scheduling result: {result}")
     
     return result
 
 @celery.task
+@task_log_batch()
 def cleanup_completed_tasks():
     """
     Archive or clean up tasks that have been completed for more than 30 days.
@@ -64,3 +96,16 @@ def cleanup_completed_tasks():
         logger.info(f"Would archive task: {task.id} - {task.name}")
     
     return f"Processed {len(old_tasks)} old completed tasks"
+
+@celery.task
+def rebuild_task_stats():
+    """
+    Recompute the task_daily_stats rollup from the tasks table.
+    Status changes are applied to the rollup as they happen; this daily
+    rebuild corrects anything that was missed.
+    """
+    logger.info("Rebuilding task stats")
+    
+    rows = rebuild_daily_stats()
+    
+    return f"Rebuilt {rows} task stats rows"
@@ -0,0 +1,113 @@
+from app import celery, db
+from app.models.user import Task
+from app.tasks.handlers import get_handler
+from celery.signals import celeryd_init
+from flask import current_app
+from sqlalchemy import func
+from datetime import datetime
+import logging
+
+logger = logging.getLogger(__name__)
+
+def queue_for_task(priority, task_type):
+    """
+    Pick the Celery queue for a task.
+
+    A queue configured for the task type in TASK_TYPE_QUEUES wins, then the
+    queue of its handler's execution model in TASK_EXECUTION_QUEUES (so
+    I/O-bound handlers reach thread-pool workers); otherwise the task goes
+    to the queue of its priority in TASK_PRIORITY_QUEUES.
+
+    Args:
+        priority (int): Task priority (1=low, 2=medium, 3=high)
+        task_type (str): Task type
+
+    Returns:
+        str: Queue name
+    """
+    config = current_app.config
+    queue = (config['TASK_TYPE_QUEUES'].get(task_type)
+             or config['TASK_EXECUTION_QUEUES'].get(get_handler(task_type).execution))
+    if queue:
+        return queue
+    return config['TASK_PRIORITY_QUEUES'].get(priority) or config['TASK_PRIORITY_QUEUES'][1]
+
+def task_queues(config):
+    """All queue names task routing can send work to."""
+    return list(dict.fromkeys(
+        list(config['TASK_PRIORITY_QUEUES'].values())
+        + list(config['TASK_EXECUTION_QUEUES'].values())
+        + list(config['TASK_TYPE_QUEUES'].values())
+    ))
+
+def queue_depths():
+    """
+    Count the messages waiting in every task queue.
+
+    Returns:
+        dict: Queue name to message count, or None if the broker is unreachable
+    """
+    depths = {name: None for name in task_queues(current_app.config)}
+    try:
+        with celery.connection_for_read() as connection:
+            connection.ensure_connection(max_retries=1)
+            channel = connection.default_channel
+            for name in depths:
+                depths[name] = channel.queue_declare(queue=name, passive=True).message_count
+    except Exception as e:
+        logger.warning(f"Could not read queue depths from the broker: {str(e)}")
+    return depths
+
+def pending_latency_by_priority():
+    """
+    Measure how long pending tasks have been waiting, per priority.
+
+    Returns:
+        dict: Priority to pending count, oldest wait in seconds and whether
+              the configured TASK_LATENCY_SLO_SECONDS is met
+    """
+    now = datetime.utcnow()
+    rows = db.session.query(
+        Task.priority, func.count(Task.id), func.min(Task.created_at)
+    ).filter(Task.status == 'pending').group_by(Task.priority).all()
+    waiting = {priority: (count, oldest) for priority, count, oldest in rows}
+
+    slos = current_app.config['TASK_LATENCY_SLO_SECONDS']
+    stats = {}
+    for priority in sorted(set(slos) | set(waiting)):
+        count, oldest = waiting.get(priority, (0, None))
+        oldest_wait = (now - oldest).total_seconds() if oldest else 0
+        slo = slos.get(priority)
+        stats[priority] = {
+            'pending': count,
+            'oldest_wait_seconds': round(oldest_wait, 1),
+            'slo_seconds': slo,
+            'slo_met': slo is None or oldest_wait <= slo
+        }
+    return stats
+
+@celeryd_init.connect
+def configure_worker_concurrency(sender=None, conf=None, options=None, **kwargs):
+    """
+    Apply TASK_QUEUE_CONCURRENCY to a worker started with -Q.
+
+    ``celery -A celery_worker.celery worker -Q tasks.high`` picks up the
+    concurrency configured for ``tasks.high`` unless --concurrency is given
+    explicitly. The default ``celery`` queue is ignored, and a worker for
+    several queues gets the largest of their concurrencies.
+    """
+    options = options or {}
+    queues = options.get('queues')
+    if not queues or options.get('concurrency'):
+        return
+    if isinstance(queues, str):
+        queues = queues.split(',')
+
+    configured = conf.get('TASK_QUEUE_CONCURRENCY') or {}
+    concurrencies = [
+        configured[queue] for queue in (q.strip() for q in queues)
+        if queue != 'celery' and configured.get(queue)
+    ]
+    if concurrencies:
+        conf.worker_concurrency = max(concurrencies)
+        logger.info(f"Using concurrency {conf.worker_concurrency} for queues {', '.join(queues)}")
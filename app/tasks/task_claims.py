@@ -0,0 +1,166 @@
+from app import db
+from app.models.user import Task
+from app.utils.task_stats import record_status_changes
+from flask import current_app
+from sqlalchemy import and_, or_, select, update
+from datetime import datetime, timedelta
+import os
+import socket
+import logging
+
+logger = logging.getLogger(__name__)
+
+def worker_id():
+    """Identify the current worker process as a lease owner."""
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+def claim_task(task_id, owner, lease_seconds=None):
+    """
+    Atomically claim a task for processing.
+
+    The claim is a single conditional UPDATE, so when several workers race
+    for the same task exactly one of them wins. Tasks stuck in 'processing'
+    whose lease has expired (e.g. after a worker crash) can be claimed again.
+
+    Args:
+        task_id (int): ID of the task
+        owner (str): Identifier of the claiming worker
+        lease_seconds (int, optional): Lease duration, defaults to TASK_LEASE_SECONDS
+
+    Returns:
+        bool: True if this worker now owns the task, False otherwise
+    """
+    now = datetime.utcnow()
+    lease_seconds = lease_seconds or current_app.config['TASK_LEASE_SECONDS']
+
+    result = db.session.execute(
+        update(Task)
+        .where(Task.id == task_id)
+        .where(or_(
+            Task.status == 'pending',
+            and_(Task.status == 'processing', Task.lease_expires_at < now)
+        ))
+        .values(
+            status='processing',
+            claimed_by=owner,
+            lease_expires_at=now + timedelta(seconds=lease_seconds),
+            updated_at=now
+        )
+        .execution_options(synchronize_session=False)
+    )
+    db.session.commit()
+
+    claimed = result.rowcount == 1
+    if not claimed:
+        logger.info(f"Task {task_id} is not claimable by {owner}")
+    return claimed
+
+def release_task(task_id, owner, status, completed_at=None):
+    """
+    Store the final status of a claimed task and drop its lease.
+
+    Args:
+        task_id (int): ID of the task
+        owner (str): Identifier of the worker holding the lease
+        status (str): Final status ('completed' or 'failed')
+        completed_at (datetime, optional): Completion time
+
+    Returns:
+        bool: False if the lease was lost to another worker in the meantime
+    """
+    result = db.session.execute(
+        update(Task)
+        .where(Task.id == task_id, Task.claimed_by == owner, Task.status == 'processing')
+        .values(
+            status=status,
+            completed_at=completed_at,
+            claimed_by=None,
+            lease_expires_at=None,
+            queued_at=None,
+            updated_at=datetime.utcnow()
+        )
+        .execution_options(synchronize_session=False)
+    )
+    db.session.commit()
+
+    released = result.rowcount == 1
+    if not released:
+        logger.warning(f"Task {task_id} lease was lost by {owner}")
+    return released
+
+def mark_tasks_queued(task_ids):
+    """
+    Record that tasks have been handed to the broker.
+
+    Args:
+        task_ids (list): IDs of the tasks being dispatched
+    """
+    if not task_ids:
+        return
+    db.session.execute(
+        update(Task)
+        .where(Task.id.in_(task_ids))
+        .values(queued_at=datetime.utcnow())
+        .execution_options(synchronize_session=False)
+    )
+    db.session.commit()
+
+def claim_pending_for_dispatch(limit=None):
+    """
+    Select pending tasks that are not already waiting in the broker.
+
+    A task counts as queued once ``queued_at`` is set; it becomes eligible
+    again only after TASK_REQUEUE_SECONDS, in case the message was lost.
+    Rows are locked with SKIP LOCKED where the database supports it so that
+    concurrent schedulers split the work instead of duplicating it. The
+    locks are held until ``enqueue_tasks`` marks the tasks queued and
+    commits, so the caller must dispatch them before committing.
+
+    Args:
+        limit (int, optional): Maximum number of tasks to return
+
+    Returns:
+        list: Rows (id, priority, task_type) of the tasks to dispatch now
+    """
+    now = datetime.utcnow()
+    stale = now - timedelta(seconds=current_app.config['TASK_REQUEUE_SECONDS'])
+
+    query = (
+        select(Task.id, Task.priority, Task.task_type)
+        .where(Task.status == 'pending')
+        .where(or_(Task.queued_at.is_(None), Task.queued_at < stale))
+        .order_by(Task.priority.desc(), Task.created_at)
+        .with_for_update(skip_locked=True)
+    )
+    if limit:
+        query = query.limit(limit)
+
+    return db.session.execute(query).all()
+
+def reclaim_expired_leases():
+    """
+    Return tasks whose worker lease has expired to the pending state.
+
+    Returns:
+        int: Number of tasks reclaimed
+    """
+    expired = db.session.execute(
+        select(Task.id, Task.user_id, Task.created_at, Task.task_type, Task.priority)
+        .where(Task.status == 'processing', Task.lease_expires_at < datetime.utcnow())
+        .with_for_update(skip_locked=True)
+    ).all()
+    if not expired:
+        db.session.commit()
+        return 0
+
+    db.session.execute(
+        update(Task)
+        .where(Task.id.in_([task.id for task in expired]), Task.status == 'processing')
+        .values(status='pending', claimed_by=None, lease_expires_at=None, queued_at=None)
+        .execution_options(synchronize_session=False)
+    )
+    record_status_changes([(task, 'processing', 'pending', None) for task in expired])
+    db.session.commit()
+
+    logger.warning(f"Reclaimed {len(expired)} tasks with expired leases")
+    return len(expired)
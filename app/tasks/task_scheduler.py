@@ -1,32 +1,21 @@
 from app import celery
-from app.models.user import Task
-from app import db
-from datetime import datetime
-import time
+from app.tasks.dispatch import enqueue_tasks
+from app.tasks.task_claims import claim_pending_for_dispatch
 
-@celery.task
-def schedule_task(task_id):
-    """
-    Process a task asynchronously.
-    This is a placeholder for actual automation logic.
-    In a real application, this could:
-    - Send emails
-    - Process files
-    - Call external APIs
-    - Run data analysis
-    - Generate reports
+def queue_pending_tasks():
     """
-    # Simulate task processing
-    time.sleep(5)  # Simulate work being done
+    Dispatch pending tasks that are not already waiting in the broker.
     
-    # Update task status
-    task = Task.query.get(task_id)
-    if task:
-        task.status = 'completed'
-        task.completed_at = datetime.utcnow()
-        db.session.commit()
-        return f"Task {task_id} completed successfully"
-    return f"Task {task_id} not found"
+    This covers tasks whose lease was reclaimed, tasks whose dispatch failed
+    and imports queued without enqueueing. They go through
+    process_automation_task like any other task.
+    
+    Returns:
+        list: IDs of the tasks that were dispatched
+    """
+    tasks = claim_pending_for_dispatch()
+    enqueue_tasks(tasks)
+    return [task.id for task in tasks]
 
 @celery.task
 def run_scheduled_tasks():
@@ -34,7 +23,5 @@ def run_scheduled_tasks():
     Periodic task to check and run scheduled tasks.
     This would be registered to run at regular intervals.
     """
-    pending_tasks = Task.query.filter_by(status='pending').all()
-    for task in pending_tasks:
-        schedule_task.delay(task.id)
-    return f"Scheduled {len(pending_tasks)} tasks"
+    task_ids = queue_pending_tasks()
+    return f"Scheduled {len(task_ids)} tasks"
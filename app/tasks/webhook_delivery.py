@@ -0,0 +1,177 @@
+from app import celery, db
+from app.models.user import WebhookDeadLetter
+from app.utils.webhook_health import circuit_check, delivery_slot, endpoint_host, record_delivery
+from flask import current_app
+from requests.adapters import HTTPAdapter
+import json
+import logging
+import os
+import random
+import requests
+import time
+
+logger = logging.getLogger(__name__)
+
+# Responses worth another attempt; other errors will not go away on their own
+RETRY_STATUS_CODES = frozenset({408, 429})
+
+_session = None
+_session_pid = None
+
+def http_session():
+    """
+    Return this process's pooled HTTP session for webhook deliveries.
+
+    Connections to each receiver are kept alive and reused across deliveries.
+    A forked worker builds its own session rather than sharing the parent's sockets.
+    """
+    global _session, _session_pid
+    if _session is None or _session_pid != os.getpid():
+        size = current_app.config['WEBHOOK_POOL_SIZE']
+        session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=size, pool_maxsize=size)
+        session.mount('http://', adapter)
+        session.mount('https://', adapter)
+        session.headers.update({'Content-Type': 'application/json'})
+        _session, _session_pid = session, os.getpid()
+    return _session
+
+def backoff_delay(retries, base, cap):
+    """
+    Delay before the next attempt: exponential backoff with jitter.
+
+    Half of the delay is fixed and half random, so receivers recovering from
+    an outage are not hit by every queued delivery at the same moment.
+
+    Args:
+        retries (int): Number of attempts that already failed, minus one
+        base (int): Delay in seconds after the first failure
+        cap (int): Maximum delay in seconds
+
+    Returns:
+        float: Seconds to wait
+    """
+    delay = min(cap, base * 2 ** retries)
+    return delay / 2 + random.uniform(0, delay / 2)
+
+def delivery_body(events):
+    """A single event is posted as is; a batch as ``{"events": [...]}``."""
+    return events[0] if len(events) == 1 else {'events': events}
+
+def queue_delivery(user_id, url, events):
+    """
+    Send events to the webhook workers.
+
+    Args:
+        user_id (int): Owner of the webhook
+        url (str): Receiver URL
+        events (list): Event payloads posted together
+
+    Returns:
+        AsyncResult: Celery result handle
+    """
+    return deliver_webhook.apply_async(
+        (user_id, url, events), queue=current_app.config['WEBHOOK_QUEUE']
+    )
+
+@celery.task(bind=True, max_retries=None)
+def deliver_webhook(self, user_id, url, events, attempts=0):
+    """
+    POST events to a webhook receiver.
+    Failed attempts are retried with backoff; after WEBHOOK_MAX_ATTEMPTS the
+    events are stored in the dead-letter table. A receiver whose circuit is
+    open is not contacted (the attempt counts as failed), and at most
+    WEBHOOK_HOST_CONCURRENCY deliveries to one host are in flight at a time.
+    """
+    config = current_app.config
+    host = endpoint_host(url)
+    status_code = None
+    retry_after = circuit_check(host)
+    if retry_after:
+        error = f"Circuit open for {host}"
+        retryable = True
+    else:
+        with delivery_slot(host) as acquired:
+            if acquired:
+                status_code, error, retry_after = _post(url, events)
+        if not acquired:
+            # Wait for a free slot; this does not count as an attempt
+            raise self.retry(countdown=random.uniform(1, 5), kwargs={'attempts': attempts})
+        if error is None:
+            return f"Delivered {len(events)} events to {url}"
+        retryable = _is_receiver_failure(status_code)
+
+    attempts += 1
+    if retryable and attempts < config['WEBHOOK_MAX_ATTEMPTS']:
+        countdown = backoff_delay(attempts - 1, config['WEBHOOK_BACKOFF_BASE'], config['WEBHOOK_BACKOFF_MAX'])
+        # Honour the receiver's Retry-After (or the open circuit) within the configured maximum
+        countdown = min(max(countdown, retry_after), config['WEBHOOK_BACKOFF_MAX'])
+        logger.warning(f"Webhook delivery to {url} failed (attempt {attempts}), retrying in {countdown:.0f}s: {error}")
+        raise self.retry(countdown=countdown, kwargs={'attempts': attempts})
+
+    db.session.add(WebhookDeadLetter(
+        user_id=user_id,
+        url=url,
+        events=json.dumps(events),
+        attempts=attempts,
+        status_code=status_code,
+        error=error
+    ))
+    db.session.commit()
+    logger.error(f"Webhook delivery to {url} gave up after {attempts} attempts: {error}")
+    return f"Dead-lettered {len(events)} events for {url}"
+
+def replay_dead_letters(ids=None):
+    """
+    Queue dead-lettered deliveries again and remove them from the table.
+
+    Args:
+        ids (list, optional): Dead letters to replay, defaults to all of them
+
+    Returns:
+        int: Number of deliveries queued
+    """
+    query = WebhookDeadLetter.query.order_by(WebhookDeadLetter.id)
+    if ids is not None:
+        query = query.filter(WebhookDeadLetter.id.in_(ids))
+
+    replayed = 0
+    for letter in query.all():
+        queue_delivery(letter.user_id, letter.url, json.loads(letter.events))
+        db.session.delete(letter)
+        db.session.commit()
+        replayed += 1
+    return replayed
+
+def _post(url, events):
+    """
+    Make one delivery attempt and record its outcome.
+
+    Returns:
+        tuple: (status_code, error, retry_after); error is None on success
+    """
+    started = time.monotonic()
+    try:
+        response = http_session().post(url, json=delivery_body(events), timeout=current_app.config['WEBHOOK_TIMEOUT'])
+    except requests.RequestException as e:
+        record_delivery(url, time.monotonic() - started, str(e), healthy=False)
+        return None, str(e), 0
+
+    latency = time.monotonic() - started
+    if response.status_code < 300:
+        record_delivery(url, latency)
+        return response.status_code, None, 0
+    error = f"HTTP {response.status_code}: {response.text[:500]}"
+    record_delivery(url, latency, error, healthy=not _is_receiver_failure(response.status_code))
+    return response.status_code, error, _retry_after(response)
+
+def _is_receiver_failure(status_code):
+    """Network errors (no status), 408, 429 and 5xx may pass; other errors will not."""
+    return status_code is None or status_code in RETRY_STATUS_CODES or status_code >= 500
+
+def _retry_after(response):
+    try:
+        return max(0, int(response.headers.get('Retry-After', 0)))
+    except ValueError:
+        # HTTP dates are not worth parsing here; fall back to backoff
+        return 0
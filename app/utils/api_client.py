@@ -1,16 +1,95 @@
 import requests
+import copy
+import hashlib
 import logging
-from urllib.parse import urljoin
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from itertools import islice
+from requests.adapters import HTTPAdapter
+from urllib.parse import urljoin, urlsplit
+from urllib3.util.retry import Retry
+from app.utils.response_cache import new_entry
 
 logger = logging.getLogger(__name__)
 
+# Responses retried on idempotent methods
+RETRY_STATUS_CODES = (429, 500, 502, 503, 504)
+
+_buckets = {}
+_buckets_lock = threading.Lock()
+
+class TokenBucket:
+    """
+    Thread-safe token bucket allowing ``rate`` requests per second on
+    average and bursts of up to ``capacity`` requests.
+    """
+    
+    def __init__(self, rate, capacity=None):
+        self.rate = float(rate)
+        self.capacity = float(capacity or max(1, rate))
+        self._tokens = self.capacity
+        self._updated_at = time.monotonic()
+        self._lock = threading.Lock()
+    
+    def acquire(self):
+        """
+        Take one token, waiting until one is available.
+        
+        Returns:
+            float: Seconds spent waiting
+        """
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.capacity, self._tokens + (now - self._updated_at) * self.rate)
+            self._updated_at = now
+            # Reserve the token now; callers queue up behind each other
+            self._tokens -= 1
+            wait = -self._tokens / self.rate if self._tokens < 0 else 0.0
+        if wait:
+            time.sleep(wait)
+        return wait
+
+def rate_limiter(key, rate, capacity=None):
+    """
+    Return the process's token bucket for a key, creating it on first use.
+    
+    Every client of the same base URL shares one bucket, whichever thread
+    it runs on. The rate given when the bucket is created applies.
+    """
+    with _buckets_lock:
+        bucket = _buckets.get(key)
+        if bucket is None:
+            bucket = _buckets[key] = TokenBucket(rate, capacity)
+        return bucket
+
+class CappedRetry(Retry):
+    """Retry that waits no longer than ``backoff_max`` for a Retry-After."""
+    
+    def get_retry_after(self, response):
+        retry_after = super().get_retry_after(response)
+        return min(retry_after, self.backoff_max) if retry_after is not None else None
+
 class APIClient:
     """
     A client for making API requests to external services.
     This can be used for automation tasks that need to interact with external APIs.
+    
+    Connections are pooled per host and kept alive. Idempotent requests
+    (GET, PUT, DELETE, ...) that fail to connect or get a 429 or 5xx are
+    retried with exponential backoff, waiting at least as long as the
+    server's Retry-After asks (up to a minute). With ``rate_limit`` set,
+    requests to the base URL are spaced by a token bucket shared by every
+    client and thread in the process; retries are spaced by the backoff.
+    ``map`` and ``as_completed`` fan many requests out over a bounded
+    number of threads. With a ``cache``, GET responses are kept for
+    ``cache_ttl`` seconds and then revalidated with their ETag or
+    Last-Modified date, so unchanged data is not downloaded again.
     """
     
-    def __init__(self, base_url=None, api_key=None, timeout=30):
+    def __init__(self, base_url=None, api_key=None, timeout=30, pool_size=10,
+                 max_retries=3, backoff_factor=0.5, rate_limit=None, burst=None,
+                 cache=None, cache_ttl=300):
         """
         Initialize the API client.
         
@@ -18,12 +97,44 @@ class APIClient:
             base_url (str, optional): Base URL for the API
             api_key (str, optional): API key for authentication
             timeout (int, optional): Request timeout in seconds
+            pool_size (int, optional): Connections kept open per host; match
+                it to the number of threads sharing the client
+            max_retries (int, optional): Retries of a failed idempotent request
+            backoff_factor (float, optional): Backoff before the n-th retry is
+                about backoff_factor * 2 ** (n - 1) seconds
+            rate_limit (float, optional): Requests per second to the base URL
+            burst (int, optional): Requests allowed at once before the rate
+                limit applies, defaults to the rate
+            cache (ResponseCache, optional): Cache for GET responses, e.g.
+                MemoryResponseCache() or DiskResponseCache(directory)
+            cache_ttl (float, optional): Seconds a cached response is used
+                without asking the server
         """
         self.base_url = base_url
         self.api_key = api_key
         self.timeout = timeout
+        self.pool_size = pool_size
+        self.rate_limit = rate_limit
+        self.burst = burst
+        self.cache = cache
+        self.cache_ttl = cache_ttl
         self.session = requests.Session()
         
+        retry = CappedRetry(
+            total=max_retries,
+            backoff_factor=backoff_factor,
+            backoff_max=60,
+            backoff_jitter=backoff_factor,
+            status_forcelist=RETRY_STATUS_CODES,
+            allowed_methods=Retry.DEFAULT_ALLOWED_METHODS,
+            respect_retry_after_header=True,
+            # Hand the last response to _handle_response instead of raising
+            raise_on_status=False
+        )
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=retry)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+        
         # Set default headers
         if api_key:
             self.session.headers.update({"Authorization": f"Bearer {api_key}"})
@@ -44,13 +155,7 @@ class APIClient:
         Returns:
             dict: Response data
         """
-        url = self._build_url(endpoint)
-        try:
-            response = self.session.get(url, params=params, timeout=self.timeout)
-            return self._handle_response(response)
-        except Exception as e:
-            logger.error(f"Error making GET request to {url}: {str(e)}")
-            return {"error": str(e)}
+        return self.request('GET', endpoint, params=params)
     
     def post(self, endpoint, data=None, json=None):
         """
@@ -64,13 +169,7 @@ class APIClient:
         Returns:
             dict: Response data
         """
-        url = self._build_url(endpoint)
-        try:
-            response = self.session.post(url, data=data, json=json, timeout=self.timeout)
-            return self._handle_response(response)
-        except Exception as e:
-            logger.error(f"Error making POST request to {url}: {str(e)}")
-            return {"error": str(e)}
+        return self.request('POST', endpoint, data=data, json=json)
     
     def put(self, endpoint, data=None, json=None):
         """
@@ -84,13 +183,7 @@ class APIClient:
         Returns:
             dict: Response data
         """
-        url = self._build_url(endpoint)
-        try:
-            response = self.session.put(url, data=data, json=json, timeout=self.timeout)
-            return self._handle_response(response)
-        except Exception as e:
-            logger.error(f"Error making PUT request to {url}: {str(e)}")
-            return {"error": str(e)}
+        return self.request('PUT', endpoint, data=data, json=json)
     
     def delete(self, endpoint, params=None):
         """
@@ -100,16 +193,156 @@ class APIClient:
             endpoint (str): API endpoint
             params (dict, optional): Query parameters
             
+        Returns:
+            dict: Response data
+        """
+        return self.request('DELETE', endpoint, params=params)
+    
+    def request(self, method, endpoint, params=None, data=None, json=None, timeout=None):
+        """
+        Make a request to the API.
+        
+        Args:
+            method (str): HTTP method
+            endpoint (str): API endpoint
+            params (dict, optional): Query parameters
+            data (dict, optional): Form data
+            json (dict, optional): JSON data
+            timeout (float, optional): Timeout in seconds, defaults to the client's
+            
         Returns:
             dict: Response data
         """
         url = self._build_url(endpoint)
+        if method == 'GET' and self.cache is not None:
+            return self._cached_get(url, params, timeout)
         try:
-            response = self.session.delete(url, params=params, timeout=self.timeout)
+            response = self._request(method, url, params=params, data=data, json=json, timeout=timeout)
             return self._handle_response(response)
         except Exception as e:
-            logger.error(f"Error making DELETE request to {url}: {str(e)}")
+            logger.error(f"Error making {method} request to {url}: {str(e)}")
+            return {"error": str(e)}
+    
+    def map(self, calls, max_workers=None):
+        """
+        Make many requests concurrently.
+        
+        Each request is an endpoint (for a GET) or a dict with the arguments
+        of ``request``, e.g. ``{'method': 'POST', 'endpoint': '/items',
+        'json': {...}, 'timeout': 5}``. At most ``max_workers`` requests are
+        in flight at a time, all sharing the client's connection pool and
+        rate limit.
+        
+        Args:
+            calls (iterable): Requests to make
+            max_workers (int, optional): Concurrent requests, defaults to the pool size
+            
+        Returns:
+            list: Response data of each request, in input order
+        """
+        results = {}
+        for index, result in self.as_completed(calls, max_workers):
+            results[index] = result
+        return [results[index] for index in range(len(results))]
+    
+    def as_completed(self, calls, max_workers=None):
+        """
+        Make many requests concurrently and yield their results as they arrive.
+        
+        Takes the same requests as ``map``. Requests are read from the
+        iterable only as workers become free, so it may be a long generator.
+        
+        Args:
+            calls (iterable): Requests to make
+            max_workers (int, optional): Concurrent requests, defaults to the pool size
+            
+        Yields:
+            tuple: (index, response data), index being the request's input position
+        """
+        max_workers = max_workers or self.pool_size
+        pending = enumerate(calls)
+        with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='api-client') as executor:
+            in_flight = {}
+            for index, spec in islice(pending, max_workers):
+                in_flight[executor.submit(self._request_spec, spec)] = index
+            while in_flight:
+                done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+                for future in done:
+                    yield in_flight.pop(future), future.result()
+                for index, spec in islice(pending, len(done)):
+                    in_flight[executor.submit(self._request_spec, spec)] = index
+    
+    def cache_stats(self):
+        """
+        Return the response cache counters.
+        
+        Returns:
+            dict: hits, misses and revalidations, or None without a cache
+        """
+        return self.cache.stats() if self.cache is not None else None
+    
+    def _cached_get(self, url, params, timeout):
+        """GET through the response cache."""
+        key = self._cache_key(url, params)
+        entry = self.cache.get(key)
+        if entry and entry['fresh_until'] > time.time():
+            self.cache.record('hits')
+            return copy.deepcopy(entry['data'])
+        
+        # Stale: ask the server whether it changed
+        headers = {}
+        if entry and entry.get('etag'):
+            headers['If-None-Match'] = entry['etag']
+        if entry and entry.get('last_modified'):
+            headers['If-Modified-Since'] = entry['last_modified']
+        try:
+            response = self._request('GET', url, params=params, timeout=timeout, headers=headers)
+        except Exception as e:
+            if entry:
+                logger.warning(f"Serving stale response for {url}: {str(e)}")
+                return copy.deepcopy(entry['data'])
+            logger.error(f"Error making GET request to {url}: {str(e)}")
             return {"error": str(e)}
+        
+        if response.status_code == 304 and entry:
+            entry = dict(
+                entry,
+                etag=response.headers.get('ETag') or entry.get('etag'),
+                last_modified=response.headers.get('Last-Modified') or entry.get('last_modified'),
+                fresh_until=time.time() + self.cache_ttl
+            )
+            self.cache.set(key, entry)
+            self.cache.record('revalidations')
+            return copy.deepcopy(entry['data'])
+        
+        self.cache.record('misses')
+        data = self._handle_response(response)
+        if response.status_code == 200 and 'no-store' not in response.headers.get('Cache-Control', ''):
+            self.cache.set(key, new_entry(copy.deepcopy(data), response, self.cache_ttl))
+        return data
+    
+    def _cache_key(self, url, params):
+        # Clients with different credentials must not share responses
+        credentials = hashlib.sha256((self.api_key or '').encode()).hexdigest()[:16]
+        return f"{credentials}:{requests.Request('GET', url, params=params).prepare().url}"
+    
+    def _request_spec(self, spec):
+        if isinstance(spec, str):
+            return self.request('GET', spec)
+        return self.request(spec.get('method', 'GET'), spec['endpoint'], spec.get('params'),
+                            spec.get('data'), spec.get('json'), spec.get('timeout'))
+    
+    def _request(self, method, url, timeout=None, **kwargs):
+        """Send a request once the rate limiter allows it."""
+        if self.rate_limit:
+            rate_limiter(self._limiter_key(url), self.rate_limit, self.burst).acquire()
+        return self.session.request(method, url, timeout=timeout or self.timeout, **kwargs)
+    
+    def _limiter_key(self, url):
+        if self.base_url:
+            return self.base_url
+        parts = urlsplit(url)
+        return f"{parts.scheme}://{parts.netloc}"
     
     def _build_url(self, endpoint):
         """Build the full URL for the API request."""
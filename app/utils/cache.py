@@ -0,0 +1,326 @@
+import hashlib
+import json
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime
+from functools import wraps
+from flask import current_app, has_app_context, jsonify, request
+from flask_login import current_user
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+import logging
+
+logger = logging.getLogger(__name__)
+
+CACHE_BACKENDS = ('memory', 'redis')
+
+
+class LRUCache:
+    """
+    Thread-safe in-process cache with least-recently-used eviction.
+
+    Entries may carry a TTL. Namespace versions are kept apart from the
+    entries, bounded by the same ``max_entries``; a version dropped from
+    there restarts from the clock, so it never repeats an earlier value.
+    """
+
+    def __init__(self, max_entries=1024, default_ttl=None):
+        self.max_entries = max_entries
+        self.default_ttl = default_ttl
+        self._entries = OrderedDict()
+        self._versions = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            value, expires_at = entry
+            if expires_at is not None and expires_at <= time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key, value, ttl=None):
+        ttl = ttl if ttl is not None else self.default_ttl
+        expires_at = time.monotonic() + ttl if ttl else None
+        with self._lock:
+            self._store(key, value, expires_at)
+
+    def delete(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def add(self, key, value, ttl=None):
+        """Set an entry only if it is missing or expired; return True if it was set."""
+        ttl = ttl if ttl is not None else self.default_ttl
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry and (entry[1] is None or entry[1] > now):
+                return False
+            self._store(key, value, now + ttl if ttl else None)
+            return True
+
+    def incr(self, key, amount=1, ttl=None):
+        """
+        Add to an integer entry (missing or expired counts as 0) and return the new value.
+
+        The TTL applies from when the entry is created; increments do not extend it.
+        """
+        ttl = ttl if ttl is not None else self.default_ttl
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry and (entry[1] is None or entry[1] > now):
+                value, expires_at = entry[0] + amount, entry[1]
+            else:
+                value, expires_at = amount, now + ttl if ttl else None
+            self._store(key, value, expires_at)
+            return value
+
+    def push(self, key, value, max_length, ttl=None):
+        """Append to a list entry, keeping its last ``max_length`` items."""
+        ttl = ttl if ttl is not None else self.default_ttl
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            items = entry[0] if entry and (entry[1] is None or entry[1] > now) else []
+            items = (items + [value])[-max_length:]
+            self._store(key, items, now + ttl if ttl else None)
+
+    def get_list(self, key):
+        """Return the items of a list entry, empty if it is missing."""
+        return list(self.get(key) or [])
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._versions.clear()
+
+    def get_version(self, namespace):
+        with self._lock:
+            version = self._versions.setdefault(namespace, time.time_ns())
+            self._touch_version(namespace)
+            return version
+
+    def bump_version(self, namespace):
+        with self._lock:
+            self._versions[namespace] = self._versions.get(namespace, time.time_ns()) + 1
+            self._touch_version(namespace)
+
+    def _store(self, key, value, expires_at):
+        # Callers hold the lock
+        self._entries[key] = (value, expires_at)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def _touch_version(self, namespace):
+        self._versions.move_to_end(namespace)
+        while len(self._versions) > self.max_entries:
+            self._versions.popitem(last=False)
+
+
+class RedisCache:
+    """
+    Cache stored in Redis and shared by every web and worker process.
+
+    Values are stored as JSON. Redis errors are logged and treated as cache
+    misses, so an unavailable Redis only costs the cache, not the request.
+    """
+
+    def __init__(self, url, prefix='cache:', default_ttl=None):
+        import redis
+
+        self.client = redis.Redis.from_url(url, socket_timeout=1, socket_connect_timeout=1)
+        self.prefix = prefix
+        self.default_ttl = default_ttl
+
+    def get(self, key):
+        try:
+            value = self.client.get(self.prefix + key)
+        except Exception as e:
+            logger.warning(f"Cache read failed: {str(e)}")
+            return None
+        return json.loads(value) if value is not None else None
+
+    def set(self, key, value, ttl=None):
+        ttl = ttl if ttl is not None else self.default_ttl
+        try:
+            self.client.set(self.prefix + key, json.dumps(value), ex=ttl or None)
+        except Exception as e:
+            logger.warning(f"Cache write failed: {str(e)}")
+
+    def delete(self, key):
+        try:
+            self.client.delete(self.prefix + key)
+        except Exception as e:
+            logger.warning(f"Cache delete failed: {str(e)}")
+
+    def add(self, key, value, ttl=None):
+        ttl = ttl if ttl is not None else self.default_ttl
+        try:
+            return bool(self.client.set(self.prefix + key, json.dumps(value), ex=ttl or None, nx=True))
+        except Exception as e:
+            logger.warning(f"Cache write failed: {str(e)}")
+            return None
+
+    def incr(self, key, amount=1, ttl=None):
+        ttl = ttl if ttl is not None else self.default_ttl
+        try:
+            # MULTI/EXEC: the TTL is set when the counter is created, never extended
+            pipeline = self.client.pipeline()
+            if ttl:
+                pipeline.set(self.prefix + key, 0, ex=ttl, nx=True)
+            pipeline.incrby(self.prefix + key, amount)
+            return pipeline.execute()[-1]
+        except Exception as e:
+            logger.warning(f"Cache increment failed: {str(e)}")
+            return None
+
+    def push(self, key, value, max_length, ttl=None):
+        ttl = ttl if ttl is not None else self.default_ttl
+        try:
+            pipeline = self.client.pipeline()
+            pipeline.rpush(self.prefix + key, json.dumps(value))
+            pipeline.ltrim(self.prefix + key, -max_length, -1)
+            if ttl:
+                pipeline.expire(self.prefix + key, ttl)
+            pipeline.execute()
+        except Exception as e:
+            logger.warning(f"Cache write failed: {str(e)}")
+
+    def get_list(self, key):
+        try:
+            return [json.loads(item) for item in self.client.lrange(self.prefix + key, 0, -1)]
+        except Exception as e:
+            logger.warning(f"Cache read failed: {str(e)}")
+            return []
+
+    def clear(self):
+        try:
+            keys = list(self.client.scan_iter(match=self.prefix + '*'))
+            if keys:
+                self.client.delete(*keys)
+        except Exception as e:
+            logger.warning(f"Cache clear failed: {str(e)}")
+
+    def get_version(self, namespace):
+        key = f'{self.prefix}version:{namespace}'
+        try:
+            # Start from the clock so a lost counter never repeats an old version
+            self.client.set(key, time.time_ns(), nx=True)
+            return int(self.client.get(key))
+        except Exception as e:
+            logger.warning(f"Cache version read failed: {str(e)}")
+            return None
+
+    def bump_version(self, namespace):
+        try:
+            self.client.incr(f'{self.prefix}version:{namespace}')
+        except Exception as e:
+            logger.warning(f"Cache invalidation failed: {str(e)}")
+
+
+def init_app(app):
+    """Create the cache backend configured by CACHE_BACKEND."""
+    backend = app.config['CACHE_BACKEND']
+    if backend not in CACHE_BACKENDS:
+        raise ValueError(f"CACHE_BACKEND must be one of: {', '.join(CACHE_BACKENDS)}")
+
+    if backend == 'redis':
+        cache = RedisCache(app.config['REDIS_URL'], default_ttl=app.config['CACHE_DEFAULT_TTL'])
+    else:
+        cache = LRUCache(app.config['CACHE_MAX_ENTRIES'], default_ttl=app.config['CACHE_DEFAULT_TTL'])
+    app.extensions['cache'] = cache
+
+
+def get_cache():
+    """Return the cache backend of the current app."""
+    return current_app.extensions['cache']
+
+
+def invalidate_user(user_id):
+    """Drop every cached response of a user right away."""
+    get_cache().bump_version(f'user:{user_id}')
+
+
+def invalidate_user_on_commit(session, user_ids):
+    """
+    Invalidate users' cached responses once the session commits.
+
+    Invalidating after the commit (rather than before) keeps a concurrent
+    request from caching data that is about to change under the new version.
+
+    Args:
+        session (Session): Session holding the changes
+        user_ids (iterable): Owners of the changed tasks
+    """
+    session.info.setdefault('invalidate_users', set()).update(user_ids)
+
+
+@event.listens_for(Session, 'after_commit')
+def _invalidate_committed_users(session):
+    user_ids = session.info.pop('invalidate_users', None)
+    if user_ids and has_app_context():
+        for user_id in user_ids:
+            invalidate_user(user_id)
+
+
+@event.listens_for(Session, 'after_rollback')
+def _discard_invalidations(session):
+    session.info.pop('invalidate_users', None)
+
+
+def user_cached(name, ttl=None):
+    """
+    Cache a JSON view per user and answer conditional requests.
+
+    The response carries an ETag derived from the user's cache version, so a
+    client sending it back in ``If-None-Match`` gets a 304 without the view
+    (or its queries) running. Any change to the user's tasks bumps the
+    version, which changes the ETag and misses the cache. The ETag also
+    changes every ``ttl`` seconds: with the memory backend a bump made by
+    another process is never seen here, and a 304 must not outlive the
+    cache entry it stands for.
+
+    Args:
+        name (str): Cache name of the view
+        ttl (int, optional): Entry lifetime, defaults to CACHE_DEFAULT_TTL
+    """
+    def decorator(f):
+        @wraps(f)
+        def decorated_function(*args, **kwargs):
+            cache = get_cache()
+            lifetime = ttl or current_app.config['CACHE_DEFAULT_TTL']
+            version = cache.get_version(f'user:{current_user.id}')
+            if version is None:
+                # Cache unavailable: serve uncached
+                return f(*args, **kwargs)
+
+            # Views may depend on the date (e.g. trends), so include today
+            key = f'{name}:{current_user.id}:{request.query_string.decode()}:{datetime.utcnow().date()}'
+            window = int(time.time() // lifetime) if lifetime else 0
+            etag = hashlib.sha1(f'{key}:{version}:{window}'.encode()).hexdigest()
+
+            if etag in request.if_none_match:
+                response = current_app.response_class(status=304)
+            else:
+                payload = cache.get(f'{key}:{version}')
+                if payload is None:
+                    response = current_app.make_response(f(*args, **kwargs))
+                    if response.status_code != 200 or not response.is_json:
+                        return response
+                    cache.set(f'{key}:{version}', response.get_json(), ttl=ttl)
+                else:
+                    response = jsonify(payload)
+
+            response.set_etag(etag)
+            response.headers['Cache-Control'] = 'private, no-cache'
+            return response
+        return decorated_function
+    return decorator
@@ -0,0 +1,62 @@
+from sqlalchemy import insert, select, tuple_
+from sqlalchemy.dialects import postgresql, sqlite
+from app import db
+
+# Databases with INSERT ... ON CONFLICT DO NOTHING ... RETURNING
+CONFLICT_DIALECTS = {'postgresql': postgresql, 'sqlite': sqlite}
+
+
+def insert_new_rows(model, rows, index_elements, returning):
+    """
+    Insert rows, skipping those that collide on a unique index.
+
+    On PostgreSQL and SQLite this is one ``INSERT ... ON CONFLICT DO NOTHING
+    ... RETURNING`` statement. Other databases (e.g. MySQL) lack it, so the
+    keys that already exist are looked up first, the other rows inserted, and
+    the new rows read back; there a concurrent insert of the same key raises
+    IntegrityError instead of being skipped. Nothing is committed.
+
+    Args:
+        model (Model): Mapped class to insert into
+        rows (list): Column values, one dict per row
+        index_elements (list): Column names of the unique index
+        returning (list): Columns to return for the inserted rows
+
+    Returns:
+        list: Rows with the ``returning`` columns, one per inserted row, in
+        no particular order
+    """
+    if not rows:
+        return []
+
+    dialect = CONFLICT_DIALECTS.get(db.session.get_bind().dialect.name)
+    if dialect is not None:
+        statement = dialect.insert(model).on_conflict_do_nothing(
+            index_elements=index_elements
+        ).returning(*returning)
+        return db.session.execute(statement, rows).all()
+
+    columns = [getattr(model, name) for name in index_elements]
+    key_columns = tuple_(*columns)
+    seen = {
+        tuple(key) for key in db.session.execute(
+            select(*columns).where(key_columns.in_(list({_key(row, index_elements) for row in rows})))
+        )
+    }
+    new_rows = []
+    for row in rows:
+        key = _key(row, index_elements)
+        if key not in seen:
+            seen.add(key)
+            new_rows.append(row)
+    if not new_rows:
+        return []
+
+    db.session.execute(insert(model), new_rows)
+    return db.session.execute(
+        select(*returning).where(key_columns.in_([_key(row, index_elements) for row in new_rows]))
+    ).all()
+
+
+def _key(row, index_elements):
+    return tuple(row[name] for name in index_elements)
@@ -1,14 +1,245 @@
 import smtplib
+import os
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
 from email.mime.text import MIMEText
 from email.mime.multipart import MIMEMultipart
+from flask import current_app, has_app_context
 import logging
 
 logger = logging.getLogger(__name__)
 
+# Errors about one message; the connection itself is still usable. Besides
+# refusals these include addresses the server cannot take (SMTPUTF8) and
+# messages smtplib cannot encode or send at all
+MESSAGE_ERRORS = (smtplib.SMTPRecipientsRefused, smtplib.SMTPSenderRefused, smtplib.SMTPDataError,
+                  smtplib.SMTPNotSupportedError, ValueError, UnicodeError)
+
+_mailers = {}
+_mailers_pid = None
+_mailers_lock = threading.Lock()
+
+class SMTPConnectionPool:
+    """
+    Keeps authenticated connections to one SMTP server for reuse.
+
+    The TLS handshake and login happen once per connection instead of once
+    per message. Connections idle for longer than ``idle_timeout`` are
+    checked with NOOP before reuse, since servers drop idle clients.
+    """
+
+    def __init__(self, host, port, username=None, password=None, use_tls=False,
+                 size=4, idle_timeout=60, timeout=30):
+        self.host = host
+        self.port = port
+        self.username = username
+        self.password = password
+        self.use_tls = use_tls
+        self.idle_timeout = idle_timeout
+        self.timeout = timeout
+        self._idle = []
+        self._lock = threading.Lock()
+        # Caps the connections open to the server at any time
+        self._slots = threading.BoundedSemaphore(size)
+
+    @contextmanager
+    def connection(self):
+        """
+        Borrow a connection, opening one if none is idle.
+
+        A connection that raises is closed instead of being returned.
+        """
+        self._slots.acquire()
+        try:
+            connection = self._checkout()
+            try:
+                yield connection
+            except BaseException:
+                self._close(connection)
+                raise
+            with self._lock:
+                self._idle.append((connection, time.monotonic()))
+        finally:
+            self._slots.release()
+
+    def close(self):
+        """Close all idle connections."""
+        with self._lock:
+            idle, self._idle = self._idle, []
+        for connection, _ in idle:
+            self._close(connection)
+
+    def _checkout(self):
+        while True:
+            with self._lock:
+                if not self._idle:
+                    break
+                connection, last_used = self._idle.pop()
+            if time.monotonic() - last_used < self.idle_timeout:
+                return connection
+            try:
+                if connection.noop()[0] == 250:
+                    return connection
+            except (smtplib.SMTPException, OSError):
+                pass
+            self._close(connection)
+        return self._connect()
+
+    def _connect(self):
+        connection = smtplib.SMTP(self.host, self.port, timeout=self.timeout)
+        try:
+            connection.ehlo()
+            if self.use_tls:
+                connection.starttls()
+                connection.ehlo()
+            if self.username and self.password:
+                connection.login(self.username, self.password)
+        except BaseException:
+            self._close(connection)
+            raise
+        return connection
+
+    def _close(self, connection):
+        try:
+            connection.quit()
+        except (smtplib.SMTPException, OSError):
+            connection.close()
+
+class Mailer:
+    """
+    Sends email through a pool of SMTP connections.
+
+    Args:
+        pool (SMTPConnectionPool): Connections to the SMTP server
+        sender (str): Default From address
+        max_reconnects (int, optional): Times a batch may reconnect after
+            losing its connection before the remaining messages fail
+    """
+
+    def __init__(self, pool, sender, max_reconnects=2):
+        self.pool = pool
+        self.sender = sender
+        self.max_reconnects = max_reconnects
+
+    def send(self, message):
+        """
+        Send one message.
+
+        Returns:
+            bool: True if the server accepted the message
+        """
+        return self.send_batch([message])[0]
+
+    def send_batch(self, messages):
+        """
+        Send many messages over one connection.
+
+        If the connection drops, the remaining messages are sent over a new
+        one. A message that is refused or cannot be sent (see
+        MESSAGE_ERRORS) fails on its own.
+
+        Args:
+            messages (list): email.message.Message objects
+
+        Returns:
+            list: One bool per message, True if the server accepted it
+        """
+        results = []
+        pending = deque(messages)
+        reconnects = 0
+        while pending:
+            try:
+                with self.pool.connection() as connection:
+                    while pending:
+                        message = pending[0]
+                        try:
+                            connection.send_message(message)
+                            accepted = True
+                        except MESSAGE_ERRORS as e:
+                            logger.error(f"Could not send email to {message['To']}: {str(e)}")
+                            accepted = False
+                        pending.popleft()
+                        results.append(accepted)
+                        if not accepted:
+                            # The next message starts a clean transaction
+                            connection.rset()
+            except (smtplib.SMTPException, OSError) as e:
+                reconnects += 1
+                if reconnects > self.max_reconnects:
+                    logger.error(f"Giving up on {len(pending)} emails via {self.pool.host}: {str(e)}")
+                    results.extend(False for _ in pending)
+                    break
+                logger.warning(f"SMTP connection to {self.pool.host} failed, reconnecting: {str(e)}")
+        return results
+
+    def message(self, recipient, subject, body, sender=None):
+        """Build an HTML email from this mailer's default sender."""
+        return build_message(recipient, subject, body, sender or self.sender)
+
+def build_message(recipient, subject, body, sender):
+    """
+    Build an email message.
+
+    Args:
+        recipient (str): Email address of the recipient
+        subject (str): Email subject
+        body (str): Email body content (HTML or plain text)
+        sender (str): Email address of the sender
+
+    Returns:
+        MIMEMultipart: The message
+    """
+    msg = MIMEMultipart()
+    msg['From'] = sender
+    msg['To'] = recipient
+    msg['Subject'] = subject
+    msg.attach(MIMEText(body, 'html'))
+    return msg
+
+def get_mailer(sender=None, smtp_server=None, smtp_port=None, username=None, password=None, use_tls=None):
+    """
+    Return the process's mailer for an SMTP server.
+
+    Arguments left out come from the MAIL_* settings of the current app.
+    Mailers (and their connection pools) are shared by all callers in a
+    process; a forked worker starts with its own.
+
+    Returns:
+        Mailer: Mailer for the server
+    """
+    global _mailers, _mailers_pid
+    config = current_app.config if has_app_context() else {}
+    sender = sender or config.get('MAIL_DEFAULT_SENDER') or "automation@example.com"
+    smtp_server = smtp_server or config.get('MAIL_SERVER') or "localhost"
+    smtp_port = smtp_port or config.get('MAIL_PORT') or 25
+    username = username or config.get('MAIL_USERNAME')
+    password = password or config.get('MAIL_PASSWORD')
+    if use_tls is None:
+        use_tls = config.get('MAIL_USE_TLS')
+    if use_tls is None:
+        # Never send credentials in the clear
+        use_tls = bool(username and password)
+
+    key = (smtp_server, smtp_port, username, password, use_tls)
+    with _mailers_lock:
+        if _mailers_pid != os.getpid():
+            _mailers, _mailers_pid = {}, os.getpid()
+        mailer = _mailers.get(key)
+        if mailer is None:
+            pool = SMTPConnectionPool(
+                smtp_server, smtp_port, username, password, use_tls,
+                size=config.get('MAIL_POOL_SIZE') or 4,
+                idle_timeout=config.get('MAIL_IDLE_TIMEOUT') or 60
+            )
+            mailer = _mailers[key] = Mailer(pool, sender)
+    return mailer
+
 def send_email(recipient, subject, body, sender=None, smtp_server=None, smtp_port=None, username=None, password=None):
     """
     Send an email using SMTP.
-    
+
     Args:
         recipient (str): Email address of the recipient
         subject (str): Email subject
@@ -18,36 +249,17 @@ def send_email(recipient, subject, body, sender=None, smtp_server=None, smtp_por
         smtp_port (int, optional): SMTP server port
         username (str, optional): SMTP authentication username
         password (str, optional): SMTP authentication password
-        
+
     Returns:
         bool: True if email was sent successfully, False otherwise
     """
-    # Default values if not provided
-    sender = sender or "automation@example.com"
-    smtp_server = smtp_server or "localhost"
-    smtp_port = smtp_port or 25
-    
     try:
-        # Create message
-        msg = MIMEMultipart()
-        msg['From'] = sender
-        msg['To'] = recipient
-        msg['Subject'] = subject
-        
-        # Attach body
-        msg.attach(MIMEText(body, 'html'))
-        
-        # Connect to server and send
-        with smtplib.SMTP(smtp_server, smtp_port) as server:
-            if username and password:
-                server.starttls()
-                server.login(username, password)
-            
-            server.send_message(msg)
-            
-        logger.info(f"Email sent to {recipient}: {subject}")
-        return True
-        
+        mailer = get_mailer(sender, smtp_server, smtp_port, username, password)
+        if mailer.send(mailer.message(recipient, subject, body, sender)):
+            logger.info(f"Email sent to {recipient}: {subject}")
+            return True
+        logger.error(f"Failed to send email to {recipient}")
+        return False
     except Exception as e:
         logger.error(f"Failed to send email to {recipient}: {str(e)}")
         return False
@@ -0,0 +1,114 @@
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import json
+import threading
+import time
+from collections import namedtuple
+import logging
+
+logger = logging.getLogger(__name__)
+
+ReceivedRequest = namedtuple('ReceivedRequest', 'method path headers body')
+
+class HTTPStub:
+    """
+    Local HTTP/1.1 server with scripted responses, for tests and benchmarks.
+
+    Every request is recorded. Responses come from ``responder``, called
+    with the ReceivedRequest and returning (status, headers, body); by
+    default each request gets ``200 {"ok": true}``. A body that is not bytes
+    is sent as JSON. Connections are kept alive, so ``connections`` shows
+    how well a client reuses them.
+
+    Usage::
+
+        with HTTPStub() as stub:
+            APIClient(stub.url).get('/items')
+            assert stub.requests[0].path == '/items'
+
+    Args:
+        responder (callable, optional): Builds the response to a request
+        host (str, optional): Address to listen on
+        port (int, optional): Port to listen on, 0 picks a free one
+        delay (float, optional): Seconds to wait before each response, to
+            model a remote service's latency
+    """
+
+    def __init__(self, responder=None, host='127.0.0.1', port=0, delay=0):
+        self.responder = responder or (lambda request: (200, {}, {'ok': True}))
+        self.delay = delay
+        self.requests = []
+        self.connections = 0
+        self._lock = threading.Lock()
+        self._server = _StubServer((host, port), _StubHandler)
+        self._server.stub = self
+        self._thread = None
+
+    @property
+    def url(self):
+        host, port = self._server.server_address[:2]
+        return f'http://{host}:{port}'
+
+    def start(self):
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+    def _connected(self):
+        with self._lock:
+            self.connections += 1
+
+    def _received(self, request):
+        with self._lock:
+            self.requests.append(request)
+
+class _StubServer(ThreadingHTTPServer):
+    daemon_threads = True
+    # Room for many clients connecting at once
+    request_queue_size = 128
+
+class _StubHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    # Send headers and body in one write; separate small writes stall on delayed ACKs
+    wbufsize = 64 * 1024
+
+    def setup(self):
+        super().setup()
+        self.server.stub._connected()
+
+    def do_GET(self):
+        self._respond()
+
+    do_POST = do_PUT = do_DELETE = do_PATCH = do_HEAD = do_GET
+
+    def log_message(self, format, *args):
+        logger.debug(format % args)
+
+    def _respond(self):
+        stub = self.server.stub
+        length = int(self.headers.get('Content-Length') or 0)
+        request = ReceivedRequest(self.command, self.path, dict(self.headers), self.rfile.read(length))
+        stub._received(request)
+        if stub.delay:
+            time.sleep(stub.delay)
+
+        status, headers, body = stub.responder(request)
+        if not isinstance(body, bytes):
+            body = json.dumps(body).encode()
+            headers = {'Content-Type': 'application/json', **headers}
+        self.send_response(status)
+        for name, value in headers.items():
+            self.send_header(name, value)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        if self.command != 'HEAD':
+            self.wfile.write(body)
@@ -0,0 +1,312 @@
+from app.models.user import NotificationSettings, OutboxMessage, Task, TaskLog, User
+from app.utils.cache import LRUCache, get_cache
+from app.utils.dialects import insert_new_rows
+from app import db
+from flask import current_app
+from datetime import datetime, time, timedelta
+from sqlalchemy import case, distinct, func, select
+import logging
+import re
+
+logger = logging.getLogger(__name__)
+
+# Per-task events; users with daily_summary get them folded into one digest a day
+TASK_EVENTS = ('task_completed', 'task_failed')
+DIGEST_EVENT = 'daily_summary'
+SETTINGS_FIELDS = ('email_notifications', 'task_completed', 'task_failed', 'daily_summary', 'email')
+SETTINGS_NAMESPACE = 'notification-settings'
+SETTINGS_FLAGS = ('email_notifications', 'task_completed', 'task_failed', 'daily_summary')
+EMAIL_MAX_LENGTH = 120
+EMAIL_PATTERN = re.compile(r'[^@\s]+@[^@\s]+\.[^@\s]+')
+
+class SettingsValidationError(ValueError):
+    """Raised when posted notification settings are invalid."""
+
+    def __init__(self, errors):
+        super().__init__('Invalid notification settings')
+        self.errors = errors
+
+def default_settings(email):
+    """Notification settings of a user who never changed them."""
+    return {
+        'email_notifications': True,
+        'task_completed': True,
+        'task_failed': True,
+        'daily_summary': False,
+        'email': email
+    }
+
+def get_settings(user_id):
+    """
+    Return a user's stored notification settings.
+
+    Reads through two caches: a process-local LRU whose entries live for
+    NOTIFICATION_SETTINGS_CACHE_TTL seconds, then the shared cache backend
+    when it is redis. Users without stored settings are cached too, so
+    repeated checks cost no query either way. Changes made by another
+    process show up here within the local TTL.
+
+    Args:
+        user_id (int): User ID
+
+    Returns:
+        dict: The settings, or None if the user never saved any
+    """
+    local = _local_cache()
+    key = f'{SETTINGS_NAMESPACE}:{user_id}'
+    settings = local.get(key)
+    if settings is None:
+        shared = _shared_cache()
+        settings = shared.get(key) if shared else None
+        if settings is None:
+            row = db.session.get(NotificationSettings, user_id)
+            # An empty dict marks a user without settings
+            settings = row.to_dict() if row else {}
+            if shared:
+                shared.set(key, settings)
+        local.set(key, settings)
+    return dict(settings) if settings else None
+
+def validate_settings(data, default_email):
+    """
+    Validate posted notification settings and fill in the defaults.
+
+    Args:
+        data (dict): Posted settings; missing fields keep their defaults
+        default_email (str): Address used when ``email`` is not posted
+
+    Returns:
+        dict: Complete settings for ``update_settings``
+
+    Raises:
+        SettingsValidationError: With an error message per invalid field
+    """
+    settings = default_settings(default_email)
+    errors = {}
+    for name in SETTINGS_FLAGS:
+        value = data.get(name, settings[name])
+        if isinstance(value, bool):
+            settings[name] = value
+        else:
+            errors[name] = 'Must be true or false'
+
+    email = data.get('email', default_email)
+    if email is not None and not isinstance(email, str):
+        errors['email'] = 'Must be an email address'
+    elif email and len(email) > EMAIL_MAX_LENGTH:
+        errors['email'] = f'Must be at most {EMAIL_MAX_LENGTH} characters'
+    elif email and not EMAIL_PATTERN.fullmatch(email):
+        errors['email'] = 'Must be an email address'
+    else:
+        # An empty address falls back to the account's
+        settings['email'] = email or None
+
+    if errors:
+        raise SettingsValidationError(errors)
+    return settings
+
+def update_settings(user_id, settings):
+    """
+    Store a user's notification settings.
+
+    The row is committed, then written to both caches, so this process sees
+    the change at once and others within NOTIFICATION_SETTINGS_CACHE_TTL.
+
+    Args:
+        user_id (int): User ID
+        settings (dict): Complete settings, see ``default_settings``
+
+    Returns:
+        dict: The stored settings
+    """
+    row = db.session.merge(NotificationSettings(
+        user_id=user_id,
+        **{name: settings[name] for name in SETTINGS_FIELDS}
+    ))
+    db.session.commit()
+
+    stored = row.to_dict()
+    key = f'{SETTINGS_NAMESPACE}:{user_id}'
+    shared = _shared_cache()
+    if shared:
+        shared.set(key, stored)
+    _local_cache().set(key, stored)
+    return dict(stored)
+
+def should_notify(user_id, event_type):
+    """
+    Check if a notification should be sent for a specific user and event type
+
+    Answered from the settings cache, so it is cheap enough to call for
+    every task event.
+
+    Args:
+        user_id (int): User ID
+        event_type (str): Event type (e.g., 'task_completed', 'task_failed')
+
+    Returns:
+        bool: True if notification should be sent, False otherwise
+    """
+    settings = get_settings(user_id)
+    if not settings or not settings.get('email_notifications', True):
+        return False
+    return bool(settings.get(event_type, False))
+
+def send_notification(user_id, subject, message, event_type=None):
+    """
+    Queue a notification email to a user.
+
+    The message is written to the outbox and sent by the drain task. Task
+    events of users with daily_summary enabled are not sent one by one; they
+    are covered by the user's next digest.
+
+    Args:
+        user_id (int): User ID
+        subject (str): Notification subject
+        message (str): Notification message
+        event_type (str, optional): Event type for filtering
+
+    Returns:
+        bool: True if notification was queued or left to the digest, False otherwise
+    """
+    if event_type and not should_notify(user_id, event_type):
+        return False
+    if event_type in TASK_EVENTS and should_notify(user_id, DIGEST_EVENT):
+        return True
+
+    recipient = _recipient(user_id)
+    if not recipient:
+        return False
+    db.session.add(OutboxMessage(
+        user_id=user_id,
+        event_type=event_type,
+        recipient=recipient,
+        subject=subject,
+        body=message
+    ))
+    db.session.commit()
+    return True
+
+def notify_task_event(user_id, task_id, event_type):
+    """
+    Notify a task's owner that it completed or failed.
+
+    Errors are logged rather than raised, so a notification problem never
+    fails the task itself.
+
+    Args:
+        user_id (int): Owner of the task
+        task_id (int): ID of the task
+        event_type (str): 'task_completed' or 'task_failed'
+
+    Returns:
+        bool: True if notification was queued or left to the digest, False otherwise
+    """
+    # Most users have no settings; they cost no query
+    if not should_notify(user_id, event_type):
+        return False
+    try:
+        task_name = db.session.execute(select(Task.name).where(Task.id == task_id)).scalar()
+        outcome = 'completed' if event_type == 'task_completed' else 'failed'
+        return send_notification(
+            user_id,
+            f"Task {outcome}: {task_name}",
+            f"<p>Your task <strong>{task_name}</strong> (#{task_id}) {outcome} at "
+            f"{datetime.utcnow().strftime('%Y-%m-%d %H:%M')} UTC.</p>",
+            event_type
+        )
+    except Exception as e:
+        db.session.rollback()
+        logger.error(f"Failed to queue {event_type} notification for task {task_id}: {str(e)}")
+        return False
+
+def queue_daily_digests(day):
+    """
+    Queue one daily_summary digest per user for a day's task activity.
+
+    Activity of all digest users is counted with one aggregate query over
+    tasks and task_logs. Users without activity get no digest, and a user
+    never gets two digests for the same day, so running this again for a
+    day queues nothing.
+
+    Args:
+        day (date): UTC day to summarise
+
+    Returns:
+        int: Number of digests queued
+    """
+    start = datetime.combine(day, time.min)
+    activity = db.session.execute(
+        select(
+            Task.user_id,
+            func.coalesce(NotificationSettings.email, User.email).label('email'),
+            func.count(distinct(TaskLog.task_id)).label('tasks'),
+            _distinct_tasks('created').label('created'),
+            _distinct_tasks('completed').label('completed'),
+            _distinct_tasks('failed').label('failed'),
+            func.count(TaskLog.id).label('events')
+        )
+        .select_from(TaskLog)
+        .join(Task, Task.id == TaskLog.task_id)
+        .join(User, User.id == Task.user_id)
+        .join(NotificationSettings, NotificationSettings.user_id == Task.user_id)
+        .where(NotificationSettings.email_notifications.is_(True), NotificationSettings.daily_summary.is_(True))
+        .where(TaskLog.timestamp >= start, TaskLog.timestamp < start + timedelta(days=1))
+        .group_by(Task.user_id, NotificationSettings.email, User.email)
+    ).all()
+    if not activity:
+        return 0
+
+    rows = [
+        {
+            'user_id': row.user_id,
+            'event_type': DIGEST_EVENT,
+            'digest_date': day,
+            'recipient': row.email,
+            'subject': f"Daily task summary for {day.isoformat()}",
+            'body': _digest_body(day, row),
+            'status': 'pending',
+            'attempts': 0,
+            'available_at': datetime.utcnow(),
+            'created_at': datetime.utcnow()
+        }
+        for row in activity
+    ]
+    queued = len(insert_new_rows(OutboxMessage, rows, ['user_id', 'digest_date'], [OutboxMessage.id]))
+    db.session.commit()
+    return queued
+
+def _local_cache():
+    cache = current_app.extensions.get(SETTINGS_NAMESPACE)
+    if cache is None:
+        cache = current_app.extensions[SETTINGS_NAMESPACE] = LRUCache(
+            current_app.config['NOTIFICATION_SETTINGS_CACHE_SIZE'],
+            default_ttl=current_app.config['NOTIFICATION_SETTINGS_CACHE_TTL']
+        )
+    return cache
+
+def _shared_cache():
+    # With the memory backend there is nothing shared beyond the local cache
+    cache = get_cache()
+    return None if isinstance(cache, LRUCache) else cache
+
+def _recipient(user_id):
+    settings = get_settings(user_id) or {}
+    return settings.get('email') or db.session.execute(
+        select(User.email).where(User.id == user_id)
+    ).scalar()
+
+def _distinct_tasks(status):
+    # Tasks with at least one event of this status
+    return func.count(distinct(case((TaskLog.status == status, TaskLog.task_id))))
+
+def _digest_body(day, activity):
+    return (
+        f"<p>Your task activity on {day.isoformat()} (UTC):</p>"
+        f"<ul>"
+        f"<li>{activity.created} tasks created</li>"
+        f"<li>{activity.completed} tasks completed</li>"
+        f"<li>{activity.failed} tasks failed</li>"
+        f"</ul>"
+        f"<p>{activity.events} events across {activity.tasks} tasks.</p>"
+    )
@@ -0,0 +1,180 @@
+import hashlib
+import json
+import os
+import threading
+import time
+from app.utils.cache import LRUCache
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Partial files older than this are left over from failed writes
+PARTIAL_FILE_AGE = 3600
+
+class ResponseCache:
+    """
+    Base class of the APIClient response caches.
+
+    Entries are dicts (JSON-serialisable) holding the response data, the
+    time until which it is fresh and the response's ETag/Last-Modified
+    validators. Stale entries are kept until they are evicted, so the
+    client can revalidate them instead of downloading them again.
+    Backends implement ``get``, ``set`` and ``clear``.
+    """
+
+    def __init__(self):
+        self._stats = {'hits': 0, 'misses': 0, 'revalidations': 0}
+        self._stats_lock = threading.Lock()
+
+    def record(self, outcome):
+        """Count a 'hits', 'misses' or 'revalidations' outcome."""
+        with self._stats_lock:
+            self._stats[outcome] += 1
+
+    def stats(self):
+        """
+        Return the cache counters.
+
+        Returns:
+            dict: hits (answered while fresh), misses (downloaded) and
+            revalidations (stale, confirmed unchanged by a 304)
+        """
+        with self._stats_lock:
+            return dict(self._stats)
+
+class MemoryResponseCache(ResponseCache):
+    """
+    Response cache in process memory with least-recently-used eviction.
+
+    Args:
+        max_entries (int, optional): Responses kept
+    """
+
+    def __init__(self, max_entries=1024):
+        super().__init__()
+        self._entries = LRUCache(max_entries)
+
+    def get(self, key):
+        return self._entries.get(key)
+
+    def set(self, key, entry):
+        self._entries.set(key, entry)
+
+    def clear(self):
+        self._entries.clear()
+
+class DiskResponseCache(ResponseCache):
+    """
+    Response cache stored as one JSON file per response in a directory.
+
+    Survives restarts and can be shared by the processes of one machine.
+    Reading an entry updates its file's modification time. Each instance
+    counts the entries it adds; once the count passes ``max_entries`` the
+    directory is scanned and the least recently used files are deleted
+    until about a tenth of ``max_entries`` is free, so a scan happens once
+    per that many new entries rather than on every write. The scan also
+    counts entries added by other processes and removes partial files left
+    by failed writes.
+
+    Args:
+        directory (str): Cache directory, created if missing
+        max_entries (int, optional): Responses kept
+    """
+
+    def __init__(self, directory, max_entries=1024):
+        super().__init__()
+        self.directory = directory
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        # Entries in the directory as of the last scan, plus those added since
+        self._count = None
+        os.makedirs(directory, exist_ok=True)
+
+    def get(self, key):
+        path = self._path(key)
+        try:
+            with open(path, encoding='utf-8') as cache_file:
+                entry = json.load(cache_file)
+            os.utime(path)
+            return entry
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError) as e:
+            logger.warning(f"Unreadable response cache entry {path}: {str(e)}")
+            return None
+
+    def set(self, key, entry):
+        path = self._path(key)
+        partial_path = f'{path}.{os.getpid()}.{threading.get_ident()}.part'
+        try:
+            is_new = not os.path.exists(path)
+            with open(partial_path, 'w', encoding='utf-8') as cache_file:
+                json.dump(entry, cache_file)
+            # Readers only ever see complete entries
+            os.replace(partial_path, path)
+        except OSError as e:
+            logger.warning(f"Response cache write failed: {str(e)}")
+            self._remove(partial_path)
+            return
+        if is_new:
+            with self._lock:
+                if self._count is not None:
+                    self._count += 1
+                if self._count is None or self._count > self.max_entries:
+                    self._evict()
+
+    def clear(self):
+        with self._lock:
+            for name in os.listdir(self.directory):
+                if name.endswith(('.json', '.part')):
+                    self._remove(os.path.join(self.directory, name))
+            self._count = 0
+
+    def _path(self, key):
+        return os.path.join(self.directory, hashlib.sha256(key.encode()).hexdigest() + '.json')
+
+    def _evict(self):
+        # Callers hold the lock
+        entries = []
+        stale_before = time.time() - PARTIAL_FILE_AGE
+        for entry in os.scandir(self.directory):
+            try:
+                if entry.name.endswith('.json'):
+                    entries.append((entry.stat().st_mtime, entry.path))
+                elif entry.name.endswith('.part') and entry.stat().st_mtime < stale_before:
+                    self._remove(entry.path)
+            except FileNotFoundError:
+                pass
+        self._count = len(entries)
+        if self._count <= self.max_entries:
+            return
+        entries.sort()
+        keep = self.max_entries - self.max_entries // 10
+        for _, path in entries[:len(entries) - keep]:
+            self._remove(path)
+        self._count = keep
+
+    def _remove(self, path):
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+def new_entry(data, response, ttl):
+    """
+    Build a cache entry for a response.
+
+    Args:
+        data (dict): Response data as returned by the client
+        response (Response): The response, for its validators
+        ttl (float): Seconds the entry stays fresh
+
+    Returns:
+        dict: The entry
+    """
+    return {
+        'data': data,
+        'etag': response.headers.get('ETag'),
+        'last_modified': response.headers.get('Last-Modified'),
+        'fresh_until': time.time() + ttl
+    }
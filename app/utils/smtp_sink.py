@@ -0,0 +1,141 @@
+import socketserver
+import threading
+import time
+from collections import namedtuple
+import logging
+
+logger = logging.getLogger(__name__)
+
+ReceivedMessage = namedtuple('ReceivedMessage', 'sender recipients data')
+
+class SMTPSink:
+    """
+    Minimal local SMTP server that accepts and keeps every message.
+
+    Stands in for a real server in tests and benchmarks (the standard
+    library's smtpd is gone from recent Python versions). It speaks enough
+    SMTP for smtplib: EHLO/HELO, AUTH PLAIN/LOGIN (any credentials), MAIL,
+    RCPT, DATA, RSET, NOOP and QUIT. STARTTLS is not offered.
+
+    Usage::
+
+        with SMTPSink() as sink:
+            send_email('to@example.com', 'Hi', 'Body', smtp_server='127.0.0.1', smtp_port=sink.port)
+            assert len(sink.messages) == 1
+
+    Args:
+        host (str, optional): Address to listen on
+        port (int, optional): Port to listen on, 0 picks a free one
+        connect_delay (float, optional): Seconds to wait before greeting each
+            new connection, to model the handshake cost of a remote server
+    """
+
+    def __init__(self, host='127.0.0.1', port=0, connect_delay=0):
+        self.connect_delay = connect_delay
+        self.messages = []
+        self.connections = 0
+        self._lock = threading.Lock()
+        self._server = socketserver.ThreadingTCPServer((host, port), _SMTPHandler)
+        self._server.daemon_threads = True
+        self._server.sink = self
+        self._thread = None
+
+    @property
+    def host(self):
+        return self._server.server_address[0]
+
+    @property
+    def port(self):
+        return self._server.server_address[1]
+
+    def start(self):
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+    def _connected(self):
+        with self._lock:
+            self.connections += 1
+
+    def _received(self, message):
+        with self._lock:
+            self.messages.append(message)
+
+class _SMTPHandler(socketserver.StreamRequestHandler):
+    def handle(self):
+        sink = self.server.sink
+        sink._connected()
+        if sink.connect_delay:
+            time.sleep(sink.connect_delay)
+        self._reply('220 smtp-sink ready')
+
+        sender, recipients = None, []
+        while True:
+            line = self.rfile.readline()
+            if not line:
+                return
+            command, _, argument = line.decode('utf-8', 'replace').rstrip('\r\n').partition(' ')
+            command = command.upper()
+
+            if command == 'EHLO':
+                self._reply('250-smtp-sink', '250-AUTH PLAIN LOGIN', '250 8BITMIME')
+            elif command == 'HELO':
+                self._reply('250 smtp-sink')
+            elif command == 'AUTH':
+                self._authenticate(argument)
+            elif command == 'MAIL':
+                sender, recipients = argument.partition(':')[2].strip(), []
+                self._reply('250 OK')
+            elif command == 'RCPT':
+                recipients.append(argument.partition(':')[2].strip())
+                self._reply('250 OK')
+            elif command == 'DATA':
+                self._reply('354 End data with <CR><LF>.<CR><LF>')
+                sink._received(ReceivedMessage(sender, recipients, self._read_data()))
+                sender, recipients = None, []
+                self._reply('250 OK')
+            elif command in ('RSET', 'NOOP'):
+                if command == 'RSET':
+                    sender, recipients = None, []
+                self._reply('250 OK')
+            elif command == 'QUIT':
+                self._reply('221 Bye')
+                return
+            else:
+                self._reply('502 Command not implemented')
+
+    def _authenticate(self, argument):
+        mechanism, _, initial = argument.partition(' ')
+        if mechanism.upper() == 'LOGIN':
+            # Username and password prompts
+            for prompt in ('334 VXNlcm5hbWU6', '334 UGFzc3dvcmQ6'):
+                self._reply(prompt)
+                self.rfile.readline()
+        elif mechanism.upper() == 'PLAIN' and not initial:
+            self._reply('334 ')
+            self.rfile.readline()
+        self._reply('235 Authentication successful')
+
+    def _read_data(self):
+        lines = []
+        while True:
+            line = self.rfile.readline()
+            if not line or line in (b'.\r\n', b'.\n'):
+                break
+            # Undo dot-stuffing
+            lines.append(line[1:] if line.startswith(b'..') else line)
+        return b''.join(lines)
+
+    def _reply(self, *lines):
+        self.wfile.write(''.join(f'{line}\r\n' for line in lines).encode())
+        self.wfile.flush()
@@ -0,0 +1,137 @@
+import csv
+import io
+import json
+import zlib
+from flask import Response, request, stream_with_context
+
+NDJSON_MIMETYPE = 'application/x-ndjson'
+STREAM_BATCH_SIZE = 500
+GZIP_LEVEL = 6
+
+
+def wants_ndjson():
+    """Check whether the current request asked for a streamed NDJSON response."""
+    if request.args.get('stream') in ('1', 'true', 'yes'):
+        return True
+    # Only an explicit NDJSON Accept header counts; */* keeps the JSON default
+    return any(
+        mimetype == NDJSON_MIMETYPE and quality > 0
+        for mimetype, quality in request.accept_mimetypes
+    )
+
+
+def iter_ndjson(query, serialize, batch_size=STREAM_BATCH_SIZE):
+    """
+    Yield one JSON document per line for every row of a query.
+
+    Rows are read through a server-side cursor in batches of ``batch_size``
+    so memory use does not depend on the number of rows.
+
+    Args:
+        query (Query): Query to stream
+        serialize (callable): Function turning a row into a JSON-serializable dict
+        batch_size (int, optional): Number of rows fetched per round trip
+
+    Yields:
+        str: A serialized row followed by a newline
+    """
+    for row in query.yield_per(batch_size):
+        yield json.dumps(serialize(row)) + '\n'
+
+
+def ndjson_response(query, serialize, headers=None):
+    """Build a streaming NDJSON response for a query."""
+    return Response(
+        stream_with_context(iter_ndjson(query, serialize)),
+        mimetype=NDJSON_MIMETYPE,
+        headers=headers
+    )
+
+
+def wants_gzip():
+    """Check whether the current request asked for a gzip-compressed download."""
+    return request.args.get('gzip') in ('1', 'true', 'yes')
+
+
+def iter_csv(query, header, serialize, batch_size=STREAM_BATCH_SIZE):
+    """
+    Yield a CSV document for a query in chunks of ``batch_size`` rows.
+
+    Rows are read through a server-side cursor, so neither the rows nor the
+    CSV text are ever held in memory as a whole. The header is yielded
+    before the query runs, so a download starts right away.
+
+    Args:
+        query (Query): Query to stream
+        header (list): Column names written as the first line
+        serialize (callable): Function turning a row into a list of values
+        batch_size (int, optional): Number of rows per chunk and per round trip
+
+    Yields:
+        str: CSV text for the header, then for each batch of rows
+    """
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+
+    writer.writerow(header)
+    yield _drain(buffer)
+    rows = 0
+    for row in query.yield_per(batch_size):
+        writer.writerow(serialize(row))
+        rows += 1
+        if rows % batch_size == 0:
+            yield _drain(buffer)
+    yield _drain(buffer)
+
+
+def iter_gzip(chunks, level=GZIP_LEVEL):
+    """
+    Compress a stream of text chunks into a gzip stream on the fly.
+
+    Args:
+        chunks (iterable): Text chunks
+        level (int, optional): zlib compression level
+
+    Yields:
+        bytes: gzip-compressed data
+    """
+    compressor = zlib.compressobj(level, zlib.DEFLATED, 31)  # wbits=31: gzip container
+    for chunk in chunks:
+        data = compressor.compress(chunk.encode('utf-8'))
+        if data:
+            yield data
+    yield compressor.flush()
+
+
+def csv_response(query, header, serialize, filename, gzip=False):
+    """
+    Build a streaming CSV download for a query.
+
+    Args:
+        query (Query): Query to stream
+        header (list): Column names
+        serialize (callable): Function turning a row into a list of values
+        filename (str): Download name without extension
+        gzip (bool, optional): Compress the download (``.csv.gz``)
+
+    Returns:
+        Response: Streaming attachment response
+    """
+    chunks = iter_csv(query, header, serialize)
+    if gzip:
+        chunks, mimetype, filename = iter_gzip(chunks), 'application/gzip', f'{filename}.csv.gz'
+    else:
+        mimetype, filename = 'text/csv', f'{filename}.csv'
+
+    return Response(
+        stream_with_context(chunks),
+        mimetype=mimetype,
+        headers={'Content-Disposition': f'attachment; filename={filename}'}
+    )
+
+
+def _drain(buffer):
+    text = buffer.getvalue()
+    buffer.seek(0)
+    buffer.truncate()
+    return text
@@ -0,0 +1,80 @@
+import csv
+import io
+import json
+from app.models.user import Task
+from flask import current_app
+
+EXPORT_FORMATS = ('csv', 'ndjson')
+
+CSV_HEADER = ['ID', 'Name', 'Description', 'Status', 'Type', 'Priority',
+              'Created', 'Updated', 'Completed']
+
+
+def task_csv_row(task):
+    """Serialize a task as a CSV row matching CSV_HEADER."""
+    return [
+        task.id,
+        task.name,
+        task.description,
+        task.status,
+        task.task_type,
+        task.priority,
+        task.created_at.strftime('%Y-%m-%d %H:%M:%S') if task.created_at else '',
+        task.updated_at.strftime('%Y-%m-%d %H:%M:%S') if task.updated_at else '',
+        task.completed_at.strftime('%Y-%m-%d %H:%M:%S') if task.completed_at else ''
+    ]
+
+
+def format_header(export_format):
+    """Return the text that starts an export file (the CSV header line)."""
+    if export_format != 'csv':
+        return ''
+    buffer = io.StringIO()
+    csv.writer(buffer).writerow(CSV_HEADER)
+    return buffer.getvalue()
+
+
+def format_tasks(tasks, export_format):
+    """
+    Serialize a batch of tasks.
+
+    Args:
+        tasks (list): Tasks to serialize
+        export_format (str): 'csv' or 'ndjson'
+
+    Returns:
+        str: CSV rows or one JSON document per line
+    """
+    if export_format == 'ndjson':
+        return ''.join(json.dumps(task.to_dict()) + '\n' for task in tasks)
+
+    buffer = io.StringIO()
+    csv.writer(buffer).writerows(task_csv_row(task) for task in tasks)
+    return buffer.getvalue()
+
+
+def iter_task_batches(user_id, batch_size=None):
+    """
+    Yield a user's tasks in id order, one keyset-paginated batch at a time.
+
+    Each batch is a separate short query, so the caller may commit (e.g. to
+    record progress) between batches without invalidating an open cursor.
+
+    Args:
+        user_id (int): Owner of the tasks
+        batch_size (int, optional): Number of tasks per batch, defaults to
+            EXPORT_BATCH_SIZE
+
+    Yields:
+        list: The next batch of tasks
+    """
+    batch_size = batch_size or current_app.config['EXPORT_BATCH_SIZE']
+    last_id = 0
+    while True:
+        tasks = Task.query.filter(
+            Task.user_id == user_id, Task.id > last_id
+        ).order_by(Task.id).limit(batch_size).all()
+        if not tasks:
+            return
+        yield tasks
+        last_id = tasks[-1].id
@@ -0,0 +1,272 @@
+import codecs
+import csv
+import io
+import json
+import time
+from app.utils.task_insert import insert_tasks
+from app.utils.task_logger import log_task_events
+from app.utils.task_stats import record_status_changes
+from app.utils.task_validation import validate_task_data, TaskValidationError
+from app import db
+import logging
+
+logger = logging.getLogger(__name__)
+
+IMPORT_FORMATS = ('json', 'ndjson', 'csv')
+DEFAULT_TASK_NAME = 'Imported Task'
+READ_SIZE = 64 * 1024
+MAX_DOCUMENT_SIZE = 1024 * 1024
+
+# Export column names (see app.utils.task_export.CSV_HEADER) and their task fields
+CSV_COLUMNS = {'Name': 'name', 'Description': 'description', 'Type': 'task_type', 'Priority': 'priority'}
+
+_decoder = json.JSONDecoder()
+
+
+class TaskImportError(ValueError):
+    """Raised when an import file cannot be parsed any further."""
+
+    def __init__(self, message, row=None):
+        super().__init__(message)
+        self.row = row
+
+
+def detect_format(filename, requested=None):
+    """
+    Pick the import format from an explicit choice or the file extension.
+
+    Returns:
+        str: One of IMPORT_FORMATS, or None if the format is unknown
+    """
+    if requested:
+        return requested if requested in IMPORT_FORMATS else None
+    extension = filename.rsplit('.', 1)[-1].lower() if '.' in filename else ''
+    return {'json': 'json', 'ndjson': 'ndjson', 'jsonl': 'ndjson', 'csv': 'csv'}.get(extension)
+
+
+def iter_records(stream, import_format):
+    """
+    Parse an upload incrementally.
+
+    Args:
+        stream: Binary file object
+        import_format (str): One of IMPORT_FORMATS
+
+    Yields:
+        tuple: (row_number, record) for every task in the file; records that
+        cannot be decoded are yielded as TaskValidationError instances
+    """
+    if import_format == 'csv':
+        return _iter_csv(stream)
+    if import_format == 'ndjson':
+        return _iter_ndjson(stream)
+    return _iter_json(stream)
+
+
+def import_records(records, user_id, chunk_size=1000, max_errors=100, on_chunk=None):
+    """
+    Validate and insert parsed records in chunks.
+
+    Every chunk is inserted with one multi-row INSERT and committed on its
+    own, so a bad row only costs that row, and a failed chunk only that chunk.
+    Rows with an ``external_id`` that already exists are counted as
+    duplicates and not imported again. Rows without a name are imported as
+    DEFAULT_TASK_NAME; rows with a priority or task type the app does not
+    know are reported as errors.
+
+    Args:
+        records (iterable): (row_number, record) tuples from ``iter_records``
+        user_id (int): Owner of the imported tasks
+        chunk_size (int, optional): Tasks per insert and commit
+        max_errors (int, optional): Number of row errors kept for the report
+        on_chunk (callable, optional): Called with the inserted rows of each chunk
+
+    Returns:
+        dict: Counts, row errors and throughput of the import
+    """
+    started = time.monotonic()
+    report = {'imported_count': 0, 'duplicate_count': 0, 'failed_count': 0, 'chunks': 0, 'errors': []}
+
+    def add_error(row_number, message):
+        report['failed_count'] += 1
+        if len(report['errors']) < max_errors:
+            report['errors'].append({'row': row_number, 'error': message})
+
+    chunk = []
+    try:
+        for row_number, record in records:
+            if isinstance(record, TaskValidationError):
+                add_error(row_number, str(record))
+                continue
+            if isinstance(record, dict) and not record.get('name'):
+                record = {**record, 'name': DEFAULT_TASK_NAME}
+            try:
+                values = validate_task_data(record, require_description=False)
+            except TaskValidationError as e:
+                add_error(row_number, str(e))
+                continue
+            values['user_id'] = user_id
+            chunk.append((row_number, values))
+            if len(chunk) >= chunk_size:
+                _insert_chunk(chunk, report, add_error, on_chunk)
+                chunk = []
+    except TaskImportError as e:
+        # The rest of the file is unreadable; keep what was imported so far
+        add_error(e.row, str(e))
+    if chunk:
+        _insert_chunk(chunk, report, add_error, on_chunk)
+
+    elapsed = time.monotonic() - started
+    report['elapsed_seconds'] = round(elapsed, 3)
+    report['rows_per_second'] = round(report['imported_count'] / elapsed, 1) if elapsed else None
+    return report
+
+
+def _insert_chunk(chunk, report, add_error, on_chunk):
+    try:
+        # Rows whose external_id was imported before are skipped by the database
+        inserted = insert_tasks([values for _, values in chunk])
+        created = [task for task, is_new in inserted if is_new]
+        log_task_events([(task.id, 'created', "Task imported from file") for task in created])
+        record_status_changes([(task, None, 'pending', None) for task in created])
+        db.session.commit()
+    except Exception as e:
+        db.session.rollback()
+        logger.error(f"Failed to import chunk of {len(chunk)} tasks: {str(e)}")
+        for row_number, _ in chunk:
+            add_error(row_number, 'Could not be stored')
+        return
+
+    report['imported_count'] += len(created)
+    report['duplicate_count'] += len(inserted) - len(created)
+    report['chunks'] += 1
+    if on_chunk and created:
+        on_chunk(created)
+
+
+def _iter_text(stream):
+    decoder = codecs.getincrementaldecoder('utf-8-sig')()
+    while True:
+        data = stream.read(READ_SIZE)
+        if not data:
+            tail = decoder.decode(b'', final=True)
+            if tail:
+                yield tail
+            return
+        yield decoder.decode(data)
+
+
+def _iter_ndjson(stream):
+    for row_number, line in enumerate(stream, start=1):
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            yield row_number, json.loads(line)
+        except ValueError as e:
+            yield row_number, TaskValidationError(f'Invalid JSON: {str(e)}')
+
+
+def _iter_csv(stream):
+    text = io.TextIOWrapper(stream, encoding='utf-8-sig', newline='')
+    try:
+        for row_number, row in enumerate(csv.DictReader(text), start=1):
+            # Accept both the export layout and plain field names; empty cells use defaults
+            yield row_number, {
+                CSV_COLUMNS.get(column, column): value
+                for column, value in row.items()
+                if column and value not in ('', None)
+            }
+    except (csv.Error, UnicodeDecodeError) as e:
+        raise TaskImportError(f'Invalid CSV: {str(e)}')
+    finally:
+        # Leave the upload open for its owner
+        text.detach()
+
+
+class _JSONReader:
+    """Pull-parser over a text stream that decodes one JSON value at a time."""
+
+    def __init__(self, stream):
+        self.chunks = _iter_text(stream)
+        self.buffer = ''
+        self.position = 0
+        self.eof = False
+
+    def _fill(self):
+        if self.eof:
+            return False
+        try:
+            chunk = next(self.chunks, None)
+        except UnicodeDecodeError as e:
+            raise TaskImportError(f'Invalid UTF-8: {str(e)}')
+        if chunk is None:
+            self.eof = True
+            return False
+        self.buffer = self.buffer[self.position:] + chunk
+        self.position = 0
+        return True
+
+    def peek(self):
+        """Return the next non-whitespace character without consuming it."""
+        while True:
+            while self.position < len(self.buffer) and self.buffer[self.position].isspace():
+                self.position += 1
+            if self.position < len(self.buffer):
+                return self.buffer[self.position]
+            if not self._fill():
+                return ''
+
+    def expect(self, characters):
+        character = self.peek()
+        if not character or character not in characters:
+            raise TaskImportError(f"Invalid JSON: expected one of {characters!r}, found {character or 'end of file'!r}")
+        self.position += 1
+        return character
+
+    def value(self):
+        """Decode the next complete JSON value, reading more input as needed."""
+        self.peek()
+        while True:
+            try:
+                value, end = _decoder.raw_decode(self.buffer, self.position)
+                # A number at the end of the buffer may continue in the next chunk
+                if end < len(self.buffer) or self.eof:
+                    self.position = end
+                    return value
+            except ValueError as e:
+                if self.eof:
+                    raise TaskImportError(f'Invalid JSON: {str(e)}')
+                if len(self.buffer) - self.position > MAX_DOCUMENT_SIZE:
+                    raise TaskImportError('Invalid JSON: task entry is too large')
+            self._fill()
+
+
+def _iter_json(stream):
+    """Yield the elements of a top-level array, or of the object's "tasks" array."""
+    reader = _JSONReader(stream)
+    if reader.expect('[{') == '{':
+        # Skip other members until the "tasks" array
+        while True:
+            if reader.peek() == '}':
+                raise TaskImportError('Invalid JSON format: missing tasks array')
+            key = reader.value()
+            reader.expect(':')
+            if key == 'tasks':
+                reader.expect('[')
+                break
+            reader.value()
+            if reader.expect(',}') == '}':
+                raise TaskImportError('Invalid JSON format: missing tasks array')
+
+    row_number = 0
+    if reader.peek() == ']':
+        return
+    while True:
+        row_number += 1
+        try:
+            yield row_number, reader.value()
+        except TaskImportError as e:
+            raise TaskImportError(str(e), row=row_number)
+        if reader.expect(',]') == ']':
+            return
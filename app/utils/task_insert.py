@@ -0,0 +1,130 @@
+from sqlalchemy import insert
+from app.models.user import Task
+from app.tasks.dispatch import enqueue_tasks
+from app.utils.dialects import insert_new_rows
+from app.utils.task_logger import log_task_events
+from app.utils.task_stats import record_status_changes
+from app.utils.webhooks import trigger_webhook, webhook_batch
+from app import db
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Columns returned for inserted tasks; enough to log, count and dispatch them
+RETURNED_COLUMNS = (Task.id, Task.priority, Task.task_type, Task.user_id, Task.created_at)
+
+
+def insert_tasks(rows):
+    """
+    Insert many tasks, skipping those whose external ID already exists.
+
+    Rows without an ``external_id`` are inserted with one multi-row INSERT.
+    Rows with one go through ``insert_new_rows`` on the (user_id,
+    external_id) unique index, and the ids of the rows that were skipped are
+    then looked up with one query. Replaying a request therefore costs two
+    statements and creates nothing. Nothing is committed.
+
+    Args:
+        rows (list): Column values as returned by ``validate_task_data``,
+            each with a ``user_id``
+
+    Returns:
+        list: One (task, created) tuple per input row, in input order, where
+        ``task`` has the RETURNED_COLUMNS and ``created`` is False for
+        duplicates
+    """
+    results = [None] * len(rows)
+
+    plain = [index for index, row in enumerate(rows) if not row.get('external_id')]
+    if plain:
+        inserted = db.session.execute(
+            insert(Task).returning(*RETURNED_COLUMNS, sort_by_parameter_order=True),
+            [rows[index] for index in plain]
+        ).all()
+        for index, task in zip(plain, inserted):
+            results[index] = (task, True)
+
+    keyed = [index for index, row in enumerate(rows) if row.get('external_id')]
+    if keyed:
+        inserted = {
+            (task.user_id, task.external_id): task
+            for task in insert_new_rows(
+                Task, [rows[index] for index in keyed],
+                ['user_id', 'external_id'], [*RETURNED_COLUMNS, Task.external_id]
+            )
+        }
+
+        missing = []
+        for index in keyed:
+            key = (rows[index]['user_id'], rows[index]['external_id'])
+            task = inserted.pop(key, None)
+            if task is not None:
+                results[index] = (task, True)
+            else:
+                missing.append(index)
+
+        if missing:
+            existing = _find_existing([rows[index] for index in missing])
+            for index in missing:
+                key = (rows[index]['user_id'], rows[index]['external_id'])
+                results[index] = (existing[key], False)
+
+    return results
+
+
+def create_tasks(rows, message):
+    """
+    Create many tasks in one transaction and hand them to the workers.
+
+    The tasks, their creation logs and their stats are committed together,
+    then the new tasks are announced to webhook subscribers and published to
+    the broker in one round trip. Rows with a known external ID create nothing.
+
+    Args:
+        rows (list): Column values as returned by ``validate_task_data``,
+            each with a ``user_id``
+        message (str): Creation log message
+
+    Returns:
+        list: One (task, created) tuple per input row, see ``insert_tasks``
+    """
+    inserted = insert_tasks(rows)
+    created = [(values, task) for values, (task, is_new) in zip(rows, inserted) if is_new]
+    log_task_events([(task.id, 'created', message) for _, task in created])
+    record_status_changes([(task, None, 'pending', None) for _, task in created])
+    db.session.commit()
+    if not created:
+        return inserted
+
+    # Receivers get the new tasks in as few requests as batching allows
+    with webhook_batch():
+        for values, task in created:
+            trigger_webhook(task.user_id, 'task.created', {
+                'task_id': task.id,
+                'task_name': values['name'],
+                'task_status': 'pending',
+                'user_id': task.user_id
+            })
+
+    try:
+        enqueue_tasks([task for _, task in created])
+    except Exception as e:
+        # Tasks stay pending and are picked up by the periodic scheduler
+        logger.error(f"Failed to dispatch {len(created)} new tasks: {str(e)}")
+    return inserted
+
+
+def _find_existing(rows):
+    existing = {}
+    external_ids_by_user = {}
+    for row in rows:
+        external_ids_by_user.setdefault(row['user_id'], set()).add(row['external_id'])
+
+    for user_id, external_ids in external_ids_by_user.items():
+        tasks = db.session.execute(
+            db.select(*RETURNED_COLUMNS, Task.external_id)
+            .where(Task.user_id == user_id, Task.external_id.in_(external_ids))
+        )
+        for task in tasks:
+            existing[(task.user_id, task.external_id)] = task
+    return existing
@@ -1,32 +1,160 @@
 from app.models.user import TaskLog
 from app import db
+from flask import g, has_app_context, current_app
+from contextlib import contextmanager
+from datetime import datetime
+from sqlalchemy import insert
 import logging
 
 logger = logging.getLogger(__name__)
 
-def log_task_event(task_id, status, message):
+# Events with these statuses are written at once even inside a batch, so a
+# failure is recorded even if the worker dies right afterwards
+IMMEDIATE_STATUSES = ('failed',)
+
+class TaskLogBuffer:
+    """
+    Collects task events and writes them with a single multi-row insert.
+    
+    Like ``log_task_event``, a flush writes on its own transaction and
+    leaves the current session alone.
+    """
+    
+    def __init__(self, max_size=100):
+        self.max_size = max_size
+        self.rows = []
+    
+    def add(self, task_id, status, message):
+        """Buffer an event, flushing when the buffer is full."""
+        row = {
+            'task_id': task_id,
+            'status': status,
+            'message': message,
+            'timestamp': datetime.utcnow()
+        }
+        self.rows.append(row)
+        if len(self.rows) >= self.max_size:
+            self.flush()
+        return TaskLog(**row)
+    
+    def flush(self):
+        """
+        Write all buffered events.
+        
+        Returns:
+            int: Number of events written
+        """
+        rows, self.rows = self.rows, []
+        if not rows:
+            return 0
+        try:
+            _write_rows(rows)
+            return len(rows)
+        except Exception as e:
+            logger.error(f"Failed to write {len(rows)} task events: {str(e)}")
+            return 0
+
+@contextmanager
+def task_log_batch(max_size=None):
+    """
+    Buffer every ``log_task_event`` call made inside the block.
+    
+    Buffered events are written when the block exits or when ``max_size``
+    events have accumulated. Nested batches share the outermost buffer.
+    
+    Args:
+        max_size (int, optional): Flush threshold, defaults to TASK_LOG_BUFFER_SIZE
+    """
+    buffer = g.get('_task_log_buffer')
+    if buffer is not None:
+        yield buffer
+        return
+    
+    buffer = TaskLogBuffer(max_size or current_app.config['TASK_LOG_BUFFER_SIZE'])
+    g._task_log_buffer = buffer
+    try:
+        yield buffer
+    finally:
+        g.pop('_task_log_buffer', None)
+        buffer.flush()
+
+def init_app(app):
+    """Buffer the task events logged while handling each request."""
+    @app.before_request
+    def start_task_log_batch():
+        g._task_log_buffer = TaskLogBuffer(app.config['TASK_LOG_BUFFER_SIZE'])
+    
+    @app.teardown_request
+    def flush_task_log_batch(exc=None):
+        buffer = g.pop('_task_log_buffer', None)
+        if buffer is not None:
+            buffer.flush()
+
+def log_task_event(task_id, status, message, immediate=False):
     """
     Log a task event to the database.
     
+    Inside a request or a ``task_log_batch`` block the event is buffered;
+    otherwise (or with ``immediate=True``) it is written straight away.
+    Events are written on a transaction of their own, so whatever is pending
+    in the session is neither committed nor rolled back by logging.
+    
     Args:
         task_id (int): ID of the task
         status (str): Status of the task (e.g., 'pending', 'processing', 'completed', 'failed')
         message (str): Log message
+        immediate (bool, optional): Write now even inside a batch
         
     Returns:
         TaskLog: The created log entry
     """
+    logger.info(f"Task {task_id} - {status}: {message}")
+    
+    buffer = g.get('_task_log_buffer') if has_app_context() else None
+    if buffer is not None and not immediate and status not in IMMEDIATE_STATUSES:
+        return buffer.add(task_id, status, message)
+    
     try:
-        log_entry = TaskLog(
-            task_id=task_id,
-            status=status,
-            message=message
-        )
-        db.session.add(log_entry)
-        db.session.commit()
-        logger.info(f"Task {task_id} - {status}: {message}")
-        return log_entry
+        if buffer is not None:
+            # Keep events in order: anything buffered goes out first
+            buffer.flush()
+        row = {
+            'task_id': task_id,
+            'status': status,
+            'message': message,
+            'timestamp': datetime.utcnow()
+        }
+        _write_rows([row])
+        return TaskLog(**row)
     except Exception as e:
         logger.error(f"Failed to log task event: {str(e)}")
-        db.session.rollback()
         return None
+
+def log_task_events(events):
+    """
+    Add many task events to the current transaction with one multi-row insert.
+
+    Unlike ``log_task_event`` this does not commit; the caller commits the
+    events together with the rows they describe.
+
+    Args:
+        events (list): (task_id, status, message) tuples
+
+    Returns:
+        int: Number of events added
+    """
+    if not events:
+        return 0
+
+    timestamp = datetime.utcnow()
+    db.session.execute(insert(TaskLog), [
+        {'task_id': task_id, 'status': status, 'message': message, 'timestamp': timestamp}
+        for task_id, status, message in events
+    ])
+    logger.info(f"Logged {len(events)} task events")
+    return len(events)
+
+def _write_rows(rows):
+    # A separate connection: never commit what the caller left in the session
+    with db.engine.begin() as connection:
+        connection.execute(insert(TaskLog), rows)
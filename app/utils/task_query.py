@@ -0,0 +1,158 @@
+import base64
+import json
+from datetime import datetime
+from sqlalchemy import and_, or_
+from app.models.user import Task
+
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 1000
+
+
+class TaskQueryError(ValueError):
+    """Raised when task listing arguments cannot be parsed."""
+
+
+def build_task_query(user_id, args):
+    """
+    Build a filtered task query from request arguments.
+
+    Supported filters: ``status``, ``task_type`` and ``priority`` (each may be
+    a comma-separated list) and the ISO-8601 date ranges ``created_after``,
+    ``created_before``, ``completed_after`` and ``completed_before``.
+
+    Args:
+        user_id (int): Owner of the tasks
+        args (Mapping): Request arguments (e.g. ``request.args``)
+
+    Returns:
+        Query: Filtered task query without ordering
+    """
+    query = Task.query.filter(Task.user_id == user_id)
+
+    statuses = _parse_list(args.get('status'))
+    if statuses:
+        query = query.filter(Task.status.in_(statuses))
+
+    task_types = _parse_list(args.get('task_type'))
+    if task_types:
+        query = query.filter(Task.task_type.in_(task_types))
+
+    priorities = _parse_list(args.get('priority'))
+    if priorities:
+        try:
+            query = query.filter(Task.priority.in_([int(p) for p in priorities]))
+        except ValueError:
+            raise TaskQueryError('priority must be an integer')
+
+    for name, column in (('created', Task.created_at), ('completed', Task.completed_at)):
+        after = _parse_datetime(f'{name}_after', args.get(f'{name}_after'))
+        if after is not None:
+            query = query.filter(column >= after)
+        before = _parse_datetime(f'{name}_before', args.get(f'{name}_before'))
+        if before is not None:
+            query = query.filter(column < before)
+
+    return query
+
+
+def paginate_tasks(query, cursor=None, limit=None, order='desc'):
+    """
+    Fetch one page of tasks using keyset pagination on ``(created_at, id)``.
+
+    Args:
+        query (Query): Task query as returned by ``build_task_query``
+        cursor (str, optional): Opaque cursor from a previous page
+        limit (int, optional): Page size, capped at ``MAX_PAGE_SIZE``
+        order (str, optional): ``desc`` (newest first) or ``asc``
+
+    Returns:
+        tuple: (list of tasks, next cursor or None)
+    """
+    limit = _parse_limit(limit)
+    query = order_tasks(query, order, cursor)
+
+    # Fetch one extra row to know whether another page exists
+    tasks = query.limit(limit + 1).all()
+    if len(tasks) <= limit:
+        return tasks, None
+
+    tasks = tasks[:limit]
+    return tasks, encode_cursor(tasks[-1])
+
+
+def order_tasks(query, order='desc', cursor=None):
+    """
+    Apply the ``(created_at, id)`` ordering used for keyset pagination.
+
+    Args:
+        query (Query): Task query
+        order (str, optional): ``desc`` (newest first) or ``asc``
+        cursor (str, optional): Only keep tasks positioned after this cursor
+
+    Returns:
+        Query: Ordered task query
+    """
+    if order not in ('asc', 'desc'):
+        raise TaskQueryError("order must be 'asc' or 'desc'")
+
+    if cursor:
+        query = query.filter(_after_cursor(decode_cursor(cursor), order))
+    if order == 'asc':
+        return query.order_by(Task.created_at.asc(), Task.id.asc())
+    return query.order_by(Task.created_at.desc(), Task.id.desc())
+
+
+def encode_cursor(task):
+    """Encode the position of a task as an opaque cursor string."""
+    payload = json.dumps([task.created_at.isoformat(), task.id])
+    return base64.urlsafe_b64encode(payload.encode('utf-8')).decode('ascii').rstrip('=')
+
+
+def decode_cursor(cursor):
+    """Decode a cursor produced by ``encode_cursor``."""
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        created_at, task_id = json.loads(base64.urlsafe_b64decode(padded.encode('ascii')))
+        return datetime.fromisoformat(created_at), int(task_id)
+    except (ValueError, TypeError, UnicodeError):
+        raise TaskQueryError('Invalid cursor')
+
+
+def _after_cursor(position, order):
+    created_at, task_id = position
+    if order == 'asc':
+        return or_(
+            Task.created_at > created_at,
+            and_(Task.created_at == created_at, Task.id > task_id)
+        )
+    return or_(
+        Task.created_at < created_at,
+        and_(Task.created_at == created_at, Task.id < task_id)
+    )
+
+
+def _parse_limit(limit):
+    if limit in (None, ''):
+        return DEFAULT_PAGE_SIZE
+    try:
+        limit = int(limit)
+    except (TypeError, ValueError):
+        raise TaskQueryError('limit must be an integer')
+    if limit < 1:
+        raise TaskQueryError('limit must be positive')
+    return min(limit, MAX_PAGE_SIZE)
+
+
+def _parse_list(value):
+    if not value:
+        return []
+    return [item.strip() for item in value.split(',') if item.strip()]
+
+
+def _parse_datetime(name, value):
+    if not value:
+        return None
+    try:
+        return datetime.fromisoformat(value)
+    except ValueError:
+        raise TaskQueryError(f'{name} must be an ISO-8601 date')
@@ -0,0 +1,229 @@
+from collections import namedtuple
+from datetime import datetime, timedelta
+from sqlalchemy import delete, func
+from sqlalchemy.dialects import mysql, postgresql, sqlite
+from app.models.user import Task, TaskDailyStats
+from app.utils.cache import invalidate_user_on_commit
+from app import db
+import logging
+
+logger = logging.getLogger(__name__)
+
+PRIORITY_LABELS = {1: 'Low', 2: 'Medium', 3: 'High'}
+TREND_WINDOWS = (7, 30, 90)
+REBUILD_BATCH_SIZE = 5000
+STATS_KEY = ('user_id', 'day', 'status', 'task_type', 'priority')
+
+# The task columns that decide which rollup bucket a task is counted in
+TaskKey = namedtuple('TaskKey', 'user_id created_at completed_at task_type priority')
+
+
+def task_key(task):
+    """
+    Snapshot the rollup-relevant columns of a task.
+
+    Useful when the task object will be expired by a commit (or used from
+    another thread) before its status change is recorded.
+    """
+    return TaskKey(
+        task.user_id, task.created_at, getattr(task, 'completed_at', None),
+        task.task_type, task.priority
+    )
+
+
+def task_breakdown(user_id):
+    """
+    Count a user's tasks by status, type and priority.
+
+    Reads the ``task_daily_stats`` rollup, so the cost depends on the number
+    of distinct buckets rather than the number of tasks.
+
+    Args:
+        user_id (int): Owner of the tasks
+
+    Returns:
+        tuple: (status_data, type_data, priority_data) dictionaries of counts
+    """
+    rows = db.session.query(
+        TaskDailyStats.status, TaskDailyStats.task_type, TaskDailyStats.priority,
+        func.sum(TaskDailyStats.task_count)
+    ).filter(
+        TaskDailyStats.user_id == user_id
+    ).group_by(
+        TaskDailyStats.status, TaskDailyStats.task_type, TaskDailyStats.priority
+    ).all()
+
+    status_data, type_data, priority_data = {}, {}, {}
+    for status, task_type, priority, count in rows:
+        if not count:
+            continue
+        status_data[status] = status_data.get(status, 0) + count
+        type_data[task_type] = type_data.get(task_type, 0) + count
+        label = PRIORITY_LABELS.get(priority, str(priority))
+        priority_data[label] = priority_data.get(label, 0) + count
+
+    return status_data, type_data, priority_data
+
+
+def completion_trend(user_id, days=7):
+    """
+    Count a user's completed tasks per day over the last ``days`` days.
+
+    Reads at most one rollup bucket per day, status, type and priority, so
+    the cost does not depend on how many tasks were completed. Days without
+    completions are filled with zeros.
+
+    Args:
+        user_id (int): Owner of the tasks
+        days (int): Window length, including today
+
+    Returns:
+        dict: ``labels`` (ISO dates, oldest first), ``data`` (counts) and
+        ``average_seconds`` (mean completion latency per day, or None)
+    """
+    today = datetime.utcnow().date()
+    start = today - timedelta(days=days - 1)
+
+    rows = db.session.query(
+        TaskDailyStats.day,
+        func.sum(TaskDailyStats.task_count),
+        func.sum(TaskDailyStats.latency_seconds)
+    ).filter(
+        TaskDailyStats.user_id == user_id,
+        TaskDailyStats.status == 'completed',
+        TaskDailyStats.day >= start
+    ).group_by(TaskDailyStats.day).all()
+
+    totals = {day.isoformat(): (count, latency) for day, count, latency in rows}
+    labels = [(start + timedelta(days=i)).isoformat() for i in range(days)]
+    counts = [totals.get(label, (0, 0))[0] for label in labels]
+
+    return {
+        'labels': labels,
+        'data': counts,
+        'average_seconds': [
+            round(totals[label][1] / count, 1) if count else None
+            for label, count in zip(labels, counts)
+        ]
+    }
+
+
+def record_status_change(task, old_status, new_status, completed_at=None):
+    """
+    Move a task between rollup buckets after a status change.
+
+    Pass ``old_status=None`` for a new task and ``new_status=None`` for a
+    deleted one. The change is added to the current transaction; the caller
+    commits it together with (or right after) the task update.
+
+    Args:
+        task: Task, TaskKey or row with the TaskKey columns
+        old_status (str): Status before the change, or None
+        new_status (str): Status after the change, or None
+        completed_at (datetime, optional): Completion time for 'completed'
+    """
+    record_status_changes([(task, old_status, new_status, completed_at)])
+
+
+def record_status_changes(changes):
+    """
+    Apply many status changes to the rollup with one upsert.
+
+    The owners' cached dashboard responses are invalidated once the
+    transaction commits.
+
+    Args:
+        changes (list): (task, old_status, new_status, completed_at) tuples
+    """
+    deltas = {}
+    for task, old_status, new_status, completed_at in changes:
+        if old_status:
+            _add_delta(deltas, task, old_status, getattr(task, 'completed_at', None), -1)
+        if new_status:
+            _add_delta(deltas, task, new_status, completed_at, 1)
+
+    rows = [row for row in _delta_rows(deltas) if row['task_count'] or row['latency_seconds']]
+    if rows:
+        db.session.execute(_increment_statement(), rows)
+    invalidate_user_on_commit(db.session, {task.user_id for task, *_ in changes})
+
+
+def rebuild_daily_stats(user_id=None):
+    """
+    Recompute the rollup from the ``tasks`` table.
+
+    Repairs any drift in the incrementally maintained counts (e.g. status
+    changes made outside the application). Tasks are streamed in batches and
+    the rollup is replaced in a single transaction.
+
+    Args:
+        user_id (int, optional): Only rebuild this user's rows
+
+    Returns:
+        int: Number of rollup rows written
+    """
+    query = db.session.query(
+        Task.user_id, Task.created_at, Task.completed_at,
+        Task.task_type, Task.priority, Task.status
+    )
+    if user_id is not None:
+        query = query.filter(Task.user_id == user_id)
+
+    deltas = {}
+    for task in query.yield_per(REBUILD_BATCH_SIZE):
+        _add_delta(deltas, task, task.status, task.completed_at, 1)
+
+    clear = delete(TaskDailyStats)
+    if user_id is not None:
+        clear = clear.where(TaskDailyStats.user_id == user_id)
+    db.session.execute(clear)
+    invalidate_user_on_commit(db.session, {key[0] for key in deltas} if user_id is None else {user_id})
+
+    rows = _delta_rows(deltas)
+    if rows:
+        db.session.execute(TaskDailyStats.__table__.insert(), rows)
+    db.session.commit()
+
+    logger.info(f"Rebuilt {len(rows)} task stats rows")
+    return len(rows)
+
+
+def _add_delta(deltas, task, status, completed_at, sign):
+    created_at = task.created_at or datetime.utcnow()
+    if status == 'completed' and completed_at:
+        day = completed_at.date()
+        latency = (completed_at - created_at).total_seconds()
+    else:
+        day = created_at.date()
+        latency = 0.0
+
+    key = (task.user_id, day, status or 'pending', task.task_type or 'general', task.priority or 1)
+    count, total = deltas.get(key, (0, 0.0))
+    deltas[key] = (count + sign, total + sign * latency)
+
+
+def _delta_rows(deltas):
+    return [
+        dict(zip(STATS_KEY, key), task_count=count, latency_seconds=latency)
+        for key, (count, latency) in deltas.items()
+    ]
+
+
+def _increment_statement():
+    # Deltas are added to existing buckets; new buckets are inserted
+    dialect = db.session.get_bind().dialect.name
+    if dialect == 'mysql':
+        statement = mysql.insert(TaskDailyStats)
+        return statement.on_duplicate_key_update(
+            task_count=TaskDailyStats.task_count + statement.inserted.task_count,
+            latency_seconds=TaskDailyStats.latency_seconds + statement.inserted.latency_seconds
+        )
+
+    statement = (postgresql if dialect == 'postgresql' else sqlite).insert(TaskDailyStats)
+    return statement.on_conflict_do_update(
+        index_elements=list(STATS_KEY),
+        set_={
+            'task_count': TaskDailyStats.task_count + statement.excluded.task_count,
+            'latency_seconds': TaskDailyStats.latency_seconds + statement.excluded.latency_seconds
+        }
+    )
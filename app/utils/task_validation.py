@@ -0,0 +1,58 @@
+TASK_TYPES = ('general', 'email', 'file', 'api')
+TASK_PRIORITIES = (1, 2, 3)
+EXTERNAL_ID_MAX_LENGTH = 100
+
+
+class TaskValidationError(ValueError):
+    """Raised when a task payload is invalid."""
+
+
+def validate_task_data(data, require_description=True):
+    """
+    Validate a task payload and return the column values for an insert.
+
+    Args:
+        data (dict): Task payload (name, description, priority, task_type, external_id)
+        require_description (bool, optional): Whether a description is mandatory
+
+    Returns:
+        dict: Values for the ``tasks`` columns (without ``user_id``)
+
+    Raises:
+        TaskValidationError: If the payload is invalid
+    """
+    if not isinstance(data, dict):
+        raise TaskValidationError('Task must be an object')
+
+    name = data.get('name')
+    description = data.get('description')
+    if not name or (require_description and not description):
+        raise TaskValidationError('Name and description are required')
+    if len(str(name)) > 140:
+        raise TaskValidationError('Name must be at most 140 characters')
+
+    try:
+        priority = int(data.get('priority', 1))
+    except (TypeError, ValueError):
+        raise TaskValidationError('Priority must be an integer')
+    if priority not in TASK_PRIORITIES:
+        raise TaskValidationError(f'Priority must be one of {list(TASK_PRIORITIES)}')
+
+    task_type = data.get('task_type', 'general')
+    if task_type not in TASK_TYPES:
+        raise TaskValidationError(f'Task type must be one of {list(TASK_TYPES)}')
+
+    external_id = data.get('external_id')
+    if external_id is not None:
+        external_id = str(external_id)
+        if not external_id or len(external_id) > EXTERNAL_ID_MAX_LENGTH:
+            raise TaskValidationError(f'External ID must be 1 to {EXTERNAL_ID_MAX_LENGTH} characters')
+
+    return {
+        'name': str(name),
+        'description': description or '',
+        'status': 'pending',
+        'priority': priority,
+        'task_type': task_type,
+        'external_id': external_id
+    }
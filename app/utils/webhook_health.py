@@ -0,0 +1,168 @@
+from app.utils.cache import get_cache
+from flask import current_app
+from contextlib import contextmanager
+from datetime import datetime
+from urllib.parse import urlsplit
+import hashlib
+import logging
+import time
+
+logger = logging.getLogger(__name__)
+
+# Circuit and statistics entries outlive quiet periods of a receiver
+STATE_TTL = 7 * 86400
+
+def endpoint_host(url):
+    """Receivers are grouped by host (and port) for circuit breaking and limits."""
+    return urlsplit(url).netloc.lower()
+
+def circuit_check(host):
+    """
+    Decide whether a delivery to a host may be attempted.
+
+    The circuit opens after WEBHOOK_CIRCUIT_FAILURES consecutive failures and
+    then lets nothing through for WEBHOOK_CIRCUIT_RESET_SECONDS. After that it
+    is half-open: one probe delivery goes through, and its outcome closes the
+    circuit or opens it again.
+
+    Args:
+        host (str): Receiver host, see ``endpoint_host``
+
+    Returns:
+        float: 0 if the delivery may proceed, otherwise seconds to wait
+    """
+    cache = get_cache()
+    opened_at = cache.get(_opened_key(host))
+    if opened_at is None:
+        return 0
+
+    config = current_app.config
+    now = time.time()
+    retry_at = opened_at + config['WEBHOOK_CIRCUIT_RESET_SECONDS']
+    if now < retry_at:
+        return retry_at - now
+
+    # The first delivery to claim the probe key is the probe; it has one
+    # timeout to report back before another delivery may try
+    probe_seconds = config['WEBHOOK_TIMEOUT'] + 1
+    # None means the cache is unavailable; the delivery goes ahead then
+    if cache.add(_probe_key(host), now + probe_seconds, ttl=probe_seconds) is not False:
+        return 0
+    probe_until = cache.get(_probe_key(host))
+    return max(probe_until - now, 0.1) if probe_until else probe_seconds
+
+def circuit_state(host):
+    """Return 'closed', 'open' or 'half-open'."""
+    opened_at = get_cache().get(_opened_key(host))
+    if opened_at is None:
+        return 'closed'
+    if time.time() < opened_at + current_app.config['WEBHOOK_CIRCUIT_RESET_SECONDS']:
+        return 'open'
+    return 'half-open'
+
+@contextmanager
+def delivery_slot(host):
+    """
+    Reserve one of the WEBHOOK_HOST_CONCURRENCY in-flight deliveries to a host.
+
+    The counter lives in the cache backend, so with the redis backend the
+    limit holds across all webhook workers. Its TTL is set when it is created
+    and never extended, so a slot leaked by a worker that died is freed even
+    under steady traffic. If the cache is unavailable the delivery proceeds.
+
+    Yields:
+        bool: False if the host already has the maximum number in flight
+    """
+    cache = get_cache()
+    key = f'webhook-inflight:{host}'
+    ttl = 2 * current_app.config['WEBHOOK_TIMEOUT'] + 60
+    count = cache.incr(key, 1, ttl=ttl)
+    if count is not None and count > current_app.config['WEBHOOK_HOST_CONCURRENCY']:
+        cache.incr(key, -1, ttl=ttl)
+        yield False
+        return
+    try:
+        yield True
+    finally:
+        if count is not None:
+            cache.incr(key, -1, ttl=ttl)
+
+def record_delivery(url, latency, error=None, healthy=True):
+    """
+    Record the outcome of a delivery attempt.
+
+    Args:
+        url (str): Receiver URL
+        latency (float): Seconds the attempt took
+        error (str, optional): Why the attempt failed, None on success
+        healthy (bool, optional): Whether the receiver answered properly;
+            False (network errors, 408, 429, 5xx) counts towards its circuit
+    """
+    cache = get_cache()
+    host = endpoint_host(url)
+    if healthy:
+        if error is None:
+            for key in (_opened_key(host), _failures_key(host), _probe_key(host)):
+                cache.delete(key)
+    else:
+        # Concurrent failures are counted atomically
+        failures = cache.incr(_failures_key(host), 1, ttl=STATE_TTL) or 0
+        opened_at = cache.get(_opened_key(host))
+        # A failed probe opens the circuit again straight away
+        if opened_at is not None or failures >= current_app.config['WEBHOOK_CIRCUIT_FAILURES']:
+            if opened_at is None:
+                logger.warning(f"Opening webhook circuit for {host} after {failures} failures")
+            cache.set(_opened_key(host), time.time(), ttl=STATE_TTL)
+            cache.delete(_probe_key(host))
+
+    cache.push(_attempts_key(url), [round(latency * 1000, 1), error is None],
+               current_app.config['WEBHOOK_STATS_WINDOW'], ttl=STATE_TTL)
+    if error is not None:
+        cache.set(_stats_key(url), {
+            'last_error': error[:500],
+            'last_error_at': datetime.utcnow().isoformat()
+        }, ttl=STATE_TTL)
+
+def delivery_stats(url):
+    """
+    Summarise the last WEBHOOK_STATS_WINDOW delivery attempts to a receiver.
+
+    Returns:
+        dict: Attempt count, success rate, p50/p95 latency in milliseconds,
+              last error and circuit state
+    """
+    cache = get_cache()
+    stats = cache.get(_stats_key(url)) or {}
+    attempts = cache.get_list(_attempts_key(url))
+    latencies = sorted(latency for latency, _ in attempts)
+    return {
+        'attempts': len(attempts),
+        'success_rate': round(sum(1 for _, ok in attempts if ok) / len(attempts), 3) if attempts else None,
+        'p50_latency_ms': _percentile(latencies, 50),
+        'p95_latency_ms': _percentile(latencies, 95),
+        'last_error': stats.get('last_error'),
+        'last_error_at': stats.get('last_error_at'),
+        'circuit': circuit_state(endpoint_host(url))
+    }
+
+def _percentile(values, percent):
+    if not values:
+        return None
+    # Nearest-rank percentile of sorted values
+    rank = max(1, -(-percent * len(values) // 100))
+    return values[rank - 1]
+
+def _opened_key(host):
+    return f'webhook-circuit-opened:{host}'
+
+def _failures_key(host):
+    return f'webhook-circuit-failures:{host}'
+
+def _probe_key(host):
+    return f'webhook-circuit-probe:{host}'
+
+def _stats_key(url):
+    return 'webhook-stats:' + hashlib.sha1(url.encode()).hexdigest()
+
+def _attempts_key(url):
+    return 'webhook-attempts:' + hashlib.sha1(url.encode()).hexdigest()
@@ -0,0 +1,229 @@
+from app.tasks.webhook_delivery import queue_delivery
+from app.models.user import Task, WebhookSubscription
+from app.utils.cache import LRUCache, get_cache
+from app import db
+from flask import g, current_app, has_app_context
+from contextlib import contextmanager
+from datetime import datetime
+from itertools import chain
+import hashlib
+import hmac
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+import logging
+import time
+
+logger = logging.getLogger(__name__)
+
+EVENT_TYPES = ('task.created', 'task.completed', 'task.failed')
+# Subscriptions to this event type receive every event
+ALL_EVENTS = 'task.all'
+SUBSCRIPTIONS_NAMESPACE = 'webhook-subscriptions'
+# Inbound requests carry "sha256=" and the hex HMAC-SHA256 of the body
+SIGNATURE_HEADER = 'X-Webhook-Signature'
+
+class SubscriptionCache:
+    """
+    Process-local map of active subscriptions: event type -> user id -> URLs.
+
+    Checking an event for subscribers is a dict lookup. The committing
+    process drops the map at once when subscriptions change; other processes
+    compare the shared cache version at most every ``ttl`` seconds. With the
+    per-process memory cache backend there is no shared version, so the map
+    is simply reloaded after ``ttl`` seconds.
+    """
+
+    def __init__(self, ttl=10):
+        self.ttl = ttl
+        self._entries = {}
+        self._version = None
+        self._checked_at = None
+
+    def get(self, event_type):
+        """Return the URLs subscribed to an event type, by user id."""
+        self._check_version()
+        entry = self._entries.get(event_type)
+        if entry is None:
+            entry = {}
+            rows = db.session.execute(
+                db.select(WebhookSubscription.user_id, WebhookSubscription.url)
+                .where(WebhookSubscription.event_type == event_type, WebhookSubscription.active.is_(True))
+                .order_by(WebhookSubscription.id)
+            )
+            for user_id, url in rows:
+                entry.setdefault(user_id, []).append(url)
+            self._entries[event_type] = entry
+        return entry
+
+    def clear(self):
+        self._entries = {}
+        self._checked_at = None
+
+    def _check_version(self):
+        now = time.monotonic()
+        if self._checked_at is not None and now - self._checked_at < self.ttl:
+            return
+        cache = get_cache()
+        version = cache.get_version(SUBSCRIPTIONS_NAMESPACE)
+        if version is None or version != self._version or isinstance(cache, LRUCache):
+            self._entries = {}
+        self._version = version
+        self._checked_at = now
+
+class WebhookBatch:
+    """
+    Collects outgoing webhook events per endpoint.
+
+    On flush, the events for each endpoint are queued in groups of up to
+    ``max_size``, and each group is posted to the receiver in one request.
+    """
+
+    def __init__(self, max_size=1):
+        self.max_size = max_size
+        self.events = {}
+
+    def add(self, user_id, url, event):
+        self.events.setdefault((user_id, url), []).append(event)
+
+    def flush(self):
+        """
+        Queue all collected events.
+
+        Returns:
+            int: Number of deliveries queued
+        """
+        events, self.events = self.events, {}
+        deliveries = 0
+        for (user_id, url), endpoint_events in events.items():
+            for start in range(0, len(endpoint_events), self.max_size):
+                _queue(user_id, url, endpoint_events[start:start + self.max_size])
+                deliveries += 1
+        return deliveries
+
+@contextmanager
+def webhook_batch(max_size=None):
+    """
+    Collect every webhook event triggered inside the block.
+
+    Events are queued when the block exits, with up to ``max_size`` events
+    for the same endpoint in one delivery. Nested batches share the
+    outermost one.
+
+    Args:
+        max_size (int, optional): Events per POST, defaults to WEBHOOK_BATCH_SIZE
+    """
+    batch = g.get('_webhook_batch')
+    if batch is not None:
+        yield batch
+        return
+
+    batch = WebhookBatch(max_size or current_app.config['WEBHOOK_BATCH_SIZE'])
+    g._webhook_batch = batch
+    try:
+        yield batch
+    finally:
+        g.pop('_webhook_batch', None)
+        batch.flush()
+
+def subscribed_urls(user_id, event_type):
+    """
+    URLs of a user's active webhooks for an event type.
+
+    Answered from the process-local subscription cache, so callers can
+    check every event for subscribers without a query.
+    """
+    subscriptions = _subscription_cache()
+    return subscriptions.get(event_type).get(user_id, []) + subscriptions.get(ALL_EVENTS).get(user_id, [])
+
+def trigger_webhook(user_id, event_type, payload):
+    """
+    Trigger webhooks for a specific user and event type.
+
+    Deliveries are queued for the webhook workers, so the caller never
+    waits for a receiver.
+
+    Args:
+        user_id (int): User ID
+        event_type (str): Event type (e.g., 'task.created', 'task.completed')
+        payload (dict): Event payload
+    """
+    urls = subscribed_urls(user_id, event_type)
+    if not urls:
+        return
+
+    # Add timestamp and event type to payload
+    event = {
+        'event_type': event_type,
+        'timestamp': datetime.utcnow().isoformat(),
+        **payload
+    }
+    batch = g.get('_webhook_batch')
+    for url in urls:
+        if batch is not None:
+            batch.add(user_id, url, event)
+        else:
+            _queue(user_id, url, [event])
+
+def trigger_task_event(user_id, task_id, event_type):
+    """
+    Trigger a task event, loading the task only if someone subscribed to it.
+
+    Args:
+        user_id (int): Owner of the task
+        task_id (int): Task the event is about
+        event_type (str): One of EVENT_TYPES
+    """
+    if not subscribed_urls(user_id, event_type):
+        return
+    task = db.session.get(Task, task_id)
+    if task is not None:
+        trigger_webhook(user_id, event_type, task_payload(task))
+
+def task_payload(task):
+    """Event payload describing a task."""
+    return {
+        'task_id': task.id,
+        'task_name': task.name,
+        'task_status': task.status,
+        'user_id': task.user_id
+    }
+
+def sign_payload(body, secret):
+    """Signature of a request body for the SIGNATURE_HEADER."""
+    return 'sha256=' + hmac.new(secret.encode(), body, hashlib.sha256).hexdigest()
+
+def signature_valid(body, signature, secret):
+    """Check a SIGNATURE_HEADER value in constant time."""
+    return bool(signature) and hmac.compare_digest(sign_payload(body, secret), signature)
+
+def invalidate_subscriptions():
+    """Make every process reload webhook subscriptions."""
+    _subscription_cache().clear()
+    get_cache().bump_version(SUBSCRIPTIONS_NAMESPACE)
+
+def _subscription_cache():
+    extensions = current_app.extensions
+    if 'webhook_subscriptions' not in extensions:
+        extensions['webhook_subscriptions'] = SubscriptionCache(current_app.config['WEBHOOK_SUBSCRIPTION_CACHE_TTL'])
+    return extensions['webhook_subscriptions']
+
+@event.listens_for(Session, 'before_flush')
+def _track_subscription_changes(session, flush_context, instances):
+    if any(isinstance(obj, WebhookSubscription) for obj in chain(session.new, session.dirty, session.deleted)):
+        session.info['webhook_subscriptions_changed'] = True
+
+@event.listens_for(Session, 'after_commit')
+def _invalidate_committed_subscriptions(session):
+    if session.info.pop('webhook_subscriptions_changed', False) and has_app_context():
+        invalidate_subscriptions()
+
+@event.listens_for(Session, 'after_rollback')
+def _discard_subscription_changes(session):
+    session.info.pop('webhook_subscriptions_changed', None)
+
+def _queue(user_id, url, events):
+    try:
+        queue_delivery(user_id, url, events)
+    except Exception as e:
+        # The caller's work has already been done; losing the event is logged
+        logger.error(f"Failed to queue webhook delivery to {url}: {str(e)}")
@@ -0,0 +1,48 @@
+"""
+Compare sequential APIClient calls with concurrent fan-out through
+APIClient.map.
+
+Requests go to a local stub HTTP server that waits --latency seconds
+before answering, standing in for a remote API:
+
+    python benchmarks/api_fanout.py --requests 200 --latency 0.02 --workers 1 8 32
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.utils.api_client import APIClient
+from app.utils.http_stub import HTTPStub
+
+
+def sequential(client, calls):
+    return [client.get(endpoint) for endpoint in calls]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--requests', type=int, default=200)
+    parser.add_argument('--latency', type=float, default=0.02, help='Seconds the stub waits per request')
+    parser.add_argument('--workers', type=int, nargs='+', default=[1, 8, 32])
+    args = parser.parse_args()
+
+    calls = [f'/items/{i}' for i in range(args.requests)]
+    print(f"{'mode':>12} {'requests':>9} {'connections':>12} {'seconds':>9} {'requests/s':>11}")
+    modes = [('sequential', None)] + [(f'map x{workers}', workers) for workers in args.workers]
+    for name, workers in modes:
+        with HTTPStub(delay=args.latency) as stub:
+            client = APIClient(stub.url, pool_size=workers or 1)
+            started = time.perf_counter()
+            results = sequential(client, calls) if workers is None else client.map(calls, max_workers=workers)
+            elapsed = time.perf_counter() - started
+            errors = sum(1 for result in results if 'error' in result)
+            if errors:
+                raise RuntimeError(f'{errors} requests failed')
+            print(f'{name:>12} {len(results):>9} {stub.connections:>12} {elapsed:>9.2f} {len(results) / elapsed:>11.0f}')
+
+
+if __name__ == '__main__':
+    main()
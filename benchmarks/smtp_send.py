@@ -0,0 +1,65 @@
+"""
+Compare sending email over a new SMTP connection per message with sending
+a batch over pooled connections.
+
+Messages go to a local SMTP sink that waits --connect-delay seconds before
+greeting each connection, standing in for the TCP/TLS handshake and login
+of a remote server:
+
+    python benchmarks/smtp_send.py --messages 200 --connect-delay 0.05
+"""
+import argparse
+import os
+import smtplib
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.utils.email_sender import Mailer, SMTPConnectionPool, build_message
+from app.utils.smtp_sink import SMTPSink
+
+SENDER = 'benchmark@example.com'
+
+
+def messages(count):
+    return [build_message(f'user{i}@example.com', f'Benchmark {i}', '<p>Body</p>', SENDER) for i in range(count)]
+
+
+def per_message(sink, batch):
+    started = time.perf_counter()
+    for message in batch:
+        with smtplib.SMTP(sink.host, sink.port) as server:
+            server.login('benchmark', 'secret')
+            server.send_message(message)
+    return time.perf_counter() - started
+
+
+def pooled(sink, batch):
+    pool = SMTPConnectionPool(sink.host, sink.port, 'benchmark', 'secret')
+    mailer = Mailer(pool, SENDER)
+    started = time.perf_counter()
+    results = mailer.send_batch(batch)
+    elapsed = time.perf_counter() - started
+    pool.close()
+    if not all(results):
+        raise RuntimeError('Some messages were not accepted')
+    return elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--messages', type=int, default=200)
+    parser.add_argument('--connect-delay', type=float, default=0.05, help='Seconds per new connection')
+    args = parser.parse_args()
+
+    batch = messages(args.messages)
+    print(f"{'mode':>12} {'messages':>9} {'connections':>12} {'seconds':>9} {'messages/s':>11}")
+    for name, send in (('per message', per_message), ('pooled', pooled)):
+        with SMTPSink(connect_delay=args.connect_delay) as sink:
+            elapsed = send(sink, batch)
+            print(f'{name:>12} {len(sink.messages):>9} {sink.connections:>12} {elapsed:>9.2f} {args.messages / elapsed:>11.0f}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,92 @@
+"""
+Measure sustained inbound webhook throughput with the Flask test client.
+
+Sends signed create_task events to POST /webhook/receive in batches of
+different sizes and reports events per second for each batch size:
+
+    python benchmarks/webhook_ingest.py --events 5000 --batch-sizes 1 10 100 500
+
+The database is a temporary SQLite file. Publishing to the broker is
+skipped unless --with-broker is given (that needs a running broker).
+"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+from unittest.mock import patch
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import create_app, db
+from app.models.user import User
+from app.utils.webhooks import sign_payload, SIGNATURE_HEADER
+from config import Config
+
+SECRET = 'benchmark-secret'
+
+
+def make_app(database_path):
+    class BenchmarkConfig(Config):
+        TESTING = True
+        SQLALCHEMY_DATABASE_URI = 'sqlite:///' + database_path
+        WEBHOOK_SIGNING_SECRET = SECRET
+
+    app = create_app(BenchmarkConfig)
+    with app.app_context():
+        db.create_all()
+        user = User(username='benchmark', email='benchmark@example.com')
+        user.set_password('benchmark')
+        db.session.add(user)
+        db.session.commit()
+        return app, user.id
+
+
+def run(app, user_id, events, batch_size, run_id):
+    client = app.test_client()
+    started = time.perf_counter()
+    accepted = 0
+    for start in range(0, events, batch_size):
+        batch = [
+            {
+                'id': f'{run_id}-{index}',
+                'event_type': 'create_task',
+                'task': {'name': f'Benchmark {index}', 'user_id': user_id}
+            }
+            for index in range(start, min(start + batch_size, events))
+        ]
+        body = json.dumps(batch).encode()
+        response = client.post(
+            '/webhook/receive',
+            data=body,
+            headers={'Content-Type': 'application/json', SIGNATURE_HEADER: sign_payload(body, SECRET)}
+        )
+        if response.status_code != 202:
+            raise RuntimeError(f'Unexpected response {response.status_code}: {response.get_data(as_text=True)}')
+        accepted += response.get_json()['accepted']
+    elapsed = time.perf_counter() - started
+    return accepted, elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--events', type=int, default=2000, help='Events sent per batch size')
+    parser.add_argument('--batch-sizes', type=int, nargs='+', default=[1, 10, 100, 500])
+    parser.add_argument('--with-broker', action='store_true', help='Publish new tasks to the configured broker')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        app, user_id = make_app(os.path.join(directory, 'benchmark.db'))
+        print(f"{'batch size':>10} {'events':>8} {'seconds':>9} {'events/s':>10}")
+        for batch_size in args.batch_sizes:
+            if args.with_broker:
+                accepted, elapsed = run(app, user_id, args.events, batch_size, f'b{batch_size}')
+            else:
+                with patch('app.utils.task_insert.enqueue_tasks'):
+                    accepted, elapsed = run(app, user_id, args.events, batch_size, f'b{batch_size}')
+            print(f'{batch_size:>10} {accepted:>8} {elapsed:>9.2f} {accepted / elapsed:>10.0f}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,7 @@
+from app import create_celery_app
+
+# Worker and beat entry point: celery -A celery_worker.celery worker
+celery = create_celery_app()
+
+# Register every task, the periodic schedule and the worker signal handlers
+from app.tasks import automation_processor, periodic_tasks, routing, webhook_delivery
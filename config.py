@@ -1,5 +1,6 @@
 import os
 from dotenv import load_dotenv
+from kombu import Queue
 
 basedir = os.path.abspath(os.path.dirname(__file__))
 load_dotenv(os.path.join(basedir, '.env'))
@@ -13,6 +14,129 @@ class Config:
     # Celery configuration
     CELERY_BROKER_URL = os.environ.get('CELERY_BROKER_URL') or 'redis://localhost:6379/0'
     CELERY_RESULT_BACKEND = os.environ.get('CELERY_RESULT_BACKEND') or 'redis://localhost:6379/0'
-    
+
+    # Task routing: automation tasks go to one queue per priority unless their
+    # type has a dedicated queue, or their handler's execution model does
+    # (I/O-bound handlers to tasks.io, served with --pool=threads; CPU-bound
+    # ones to tasks.cpu, served by prefork). Workers started with -Q <queue>
+    # use the concurrency configured for that queue.
+    TASK_PRIORITY_QUEUES = {1: 'tasks.low', 2: 'tasks.default', 3: 'tasks.high'}
+    TASK_EXECUTION_QUEUES = {'thread': 'tasks.io', 'process': 'tasks.cpu'}
+    TASK_TYPE_QUEUES = {}
+    # Outbound webhook deliveries wait on other servers, so their workers run
+    # with more concurrency than the automation queues
+    WEBHOOK_QUEUE = 'webhooks'
+    TASK_QUEUE_CONCURRENCY = {
+        'tasks.high': int(os.environ.get('TASK_HIGH_CONCURRENCY') or 8),
+        'tasks.default': int(os.environ.get('TASK_DEFAULT_CONCURRENCY') or 4),
+        'tasks.low': int(os.environ.get('TASK_LOW_CONCURRENCY') or 2),
+        'tasks.io': int(os.environ.get('TASK_IO_CONCURRENCY') or 32),
+        'tasks.cpu': int(os.environ.get('TASK_CPU_CONCURRENCY') or os.cpu_count() or 1),
+        WEBHOOK_QUEUE: int(os.environ.get('WEBHOOK_CONCURRENCY') or 16)
+    }
+    # Maximum acceptable wait (seconds) of the oldest pending task per priority
+    TASK_LATENCY_SLO_SECONDS = {1: 3600, 2: 600, 3: 60}
+    # A worker started without -Q consumes every routed queue plus the default one
+    CELERY_QUEUES = tuple(Queue(name) for name in dict.fromkeys(
+        ['celery', *TASK_PRIORITY_QUEUES.values(), *TASK_EXECUTION_QUEUES.values(),
+         *TASK_TYPE_QUEUES.values(), WEBHOOK_QUEUE]
+    ))
+
     # Redis configuration
     REDIS_URL = os.environ.get('REDIS_URL') or 'redis://localhost:6379/0'
+
+    # Response cache: 'memory' (per process) or 'redis' (shared through REDIS_URL).
+    # Use redis when workers run in other processes, so their task updates
+    # invalidate the web processes' entries.
+    CACHE_BACKEND = os.environ.get('CACHE_BACKEND') or 'memory'
+    CACHE_DEFAULT_TTL = int(os.environ.get('CACHE_DEFAULT_TTL') or 300)
+    CACHE_MAX_ENTRIES = int(os.environ.get('CACHE_MAX_ENTRIES') or 1024)
+
+    # Maximum number of tasks accepted by POST /api/tasks/bulk
+    BULK_TASK_LIMIT = int(os.environ.get('BULK_TASK_LIMIT') or 1000)
+
+    # Task claiming: how long a worker owns a task, and how long a queued
+    # task may wait in the broker before the scheduler dispatches it again
+    TASK_LEASE_SECONDS = int(os.environ.get('TASK_LEASE_SECONDS') or 600)
+    TASK_LOG_BUFFER_SIZE = int(os.environ.get('TASK_LOG_BUFFER_SIZE') or 100)
+    TASK_REQUEUE_SECONDS = int(os.environ.get('TASK_REQUEUE_SECONDS') or 1800)
+
+    # Limits on what automation tasks may touch: API tasks only call URLs
+    # under one of these base URLs (comma-separated; none by default), and
+    # file tasks only read and write below TASK_FILE_ROOT
+    TASK_API_ALLOWED_URLS = [
+        url.strip() for url in (os.environ.get('TASK_API_ALLOWED_URLS') or '').split(',') if url.strip()
+    ]
+    TASK_FILE_ROOT = os.environ.get('TASK_FILE_ROOT') or os.path.join(basedir, 'instance', 'task_files')
+
+    # Background export jobs: artifacts are written to the spool directory and
+    # deleted once they are older than the retention period. Jobs still running
+    # after EXPORT_STALE_SECONDS are assumed to have lost their worker
+    EXPORT_SPOOL_DIR = os.environ.get('EXPORT_SPOOL_DIR') or os.path.join(basedir, 'instance', 'exports')
+    EXPORT_RETENTION_SECONDS = int(os.environ.get('EXPORT_RETENTION_SECONDS') or 86400)
+    EXPORT_BATCH_SIZE = int(os.environ.get('EXPORT_BATCH_SIZE') or 1000)
+    EXPORT_STALE_SECONDS = int(os.environ.get('EXPORT_STALE_SECONDS') or 21600)
+
+    # File imports are stored in chunks of IMPORT_CHUNK_SIZE tasks, each in its
+    # own transaction; at most IMPORT_MAX_ERRORS row errors are reported
+    IMPORT_CHUNK_SIZE = int(os.environ.get('IMPORT_CHUNK_SIZE') or 1000)
+    IMPORT_MAX_ERRORS = int(os.environ.get('IMPORT_MAX_ERRORS') or 100)
+
+    # Webhook deliveries that fail with a network error, 408, 429 or 5xx are
+    # retried after exponential backoff with jitter (WEBHOOK_BACKOFF_BASE
+    # doubling up to WEBHOOK_BACKOFF_MAX seconds) and dead-lettered after
+    # WEBHOOK_MAX_ATTEMPTS. Up to WEBHOOK_BATCH_SIZE events for one endpoint
+    # raised in a webhook_batch() block are sent in a single POST.
+    WEBHOOK_TIMEOUT = int(os.environ.get('WEBHOOK_TIMEOUT') or 5)
+    WEBHOOK_MAX_ATTEMPTS = int(os.environ.get('WEBHOOK_MAX_ATTEMPTS') or 8)
+    WEBHOOK_BACKOFF_BASE = int(os.environ.get('WEBHOOK_BACKOFF_BASE') or 2)
+    WEBHOOK_BACKOFF_MAX = int(os.environ.get('WEBHOOK_BACKOFF_MAX') or 900)
+    WEBHOOK_BATCH_SIZE = int(os.environ.get('WEBHOOK_BATCH_SIZE') or 1)
+    WEBHOOK_POOL_SIZE = int(os.environ.get('WEBHOOK_POOL_SIZE') or 10)
+    # Receivers are tracked per host: after WEBHOOK_CIRCUIT_FAILURES consecutive
+    # failures nothing is sent for WEBHOOK_CIRCUIT_RESET_SECONDS, then a single
+    # probe decides. At most WEBHOOK_HOST_CONCURRENCY deliveries per host are
+    # in flight. Circuits, limits and statistics of the last WEBHOOK_STATS_WINDOW
+    # attempts live in the cache backend (shared between processes with redis).
+    WEBHOOK_CIRCUIT_FAILURES = int(os.environ.get('WEBHOOK_CIRCUIT_FAILURES') or 5)
+    WEBHOOK_CIRCUIT_RESET_SECONDS = int(os.environ.get('WEBHOOK_CIRCUIT_RESET_SECONDS') or 60)
+    WEBHOOK_HOST_CONCURRENCY = int(os.environ.get('WEBHOOK_HOST_CONCURRENCY') or 4)
+    WEBHOOK_STATS_WINDOW = int(os.environ.get('WEBHOOK_STATS_WINDOW') or 100)
+    # Inbound webhooks (POST /webhook/receive) must be signed with this secret
+    # and are refused while it is unset; at most WEBHOOK_RECEIVE_LIMIT events
+    # are accepted per request
+    WEBHOOK_SIGNING_SECRET = os.environ.get('WEBHOOK_SIGNING_SECRET')
+    WEBHOOK_RECEIVE_LIMIT = int(os.environ.get('WEBHOOK_RECEIVE_LIMIT') or 1000)
+    # Each process caches webhook subscriptions and checks the shared cache
+    # version (see CACHE_BACKEND) for other processes' changes this often
+    WEBHOOK_SUBSCRIPTION_CACHE_TTL = int(os.environ.get('WEBHOOK_SUBSCRIPTION_CACHE_TTL') or 10)
+
+    # Outgoing email. Each process keeps up to MAIL_POOL_SIZE authenticated
+    # connections per server and checks ones idle for MAIL_IDLE_TIMEOUT
+    # seconds before reuse. MAIL_USE_TLS defaults to STARTTLS whenever
+    # credentials are set.
+    MAIL_SERVER = os.environ.get('MAIL_SERVER') or 'localhost'
+    MAIL_PORT = int(os.environ.get('MAIL_PORT') or 25)
+    MAIL_USERNAME = os.environ.get('MAIL_USERNAME')
+    MAIL_PASSWORD = os.environ.get('MAIL_PASSWORD')
+    MAIL_USE_TLS = {'true': True, 'false': False}.get((os.environ.get('MAIL_USE_TLS') or '').lower())
+    MAIL_DEFAULT_SENDER = os.environ.get('MAIL_DEFAULT_SENDER') or 'automation@example.com'
+    MAIL_POOL_SIZE = int(os.environ.get('MAIL_POOL_SIZE') or 4)
+    MAIL_IDLE_TIMEOUT = int(os.environ.get('MAIL_IDLE_TIMEOUT') or 60)
+
+    # Notification emails are written to an outbox and sent by a periodic task
+    # every NOTIFICATION_DRAIN_INTERVAL seconds, NOTIFICATION_BATCH_SIZE per
+    # SMTP connection. Rejected messages are retried after
+    # NOTIFICATION_RETRY_SECONDS (doubling) up to NOTIFICATION_MAX_ATTEMPTS;
+    # messages claimed by a worker that died are sent again after
+    # NOTIFICATION_LEASE_SECONDS.
+    NOTIFICATION_DRAIN_INTERVAL = int(os.environ.get('NOTIFICATION_DRAIN_INTERVAL') or 60)
+    NOTIFICATION_BATCH_SIZE = int(os.environ.get('NOTIFICATION_BATCH_SIZE') or 100)
+    NOTIFICATION_MAX_ATTEMPTS = int(os.environ.get('NOTIFICATION_MAX_ATTEMPTS') or 5)
+    NOTIFICATION_RETRY_SECONDS = int(os.environ.get('NOTIFICATION_RETRY_SECONDS') or 60)
+    NOTIFICATION_LEASE_SECONDS = int(os.environ.get('NOTIFICATION_LEASE_SECONDS') or 300)
+    # Notification settings are cached per process for
+    # NOTIFICATION_SETTINGS_CACHE_TTL seconds (and in redis when that is the
+    # cache backend); changes reach other processes within that time
+    NOTIFICATION_SETTINGS_CACHE_TTL = int(os.environ.get('NOTIFICATION_SETTINGS_CACHE_TTL') or 30)
+    NOTIFICATION_SETTINGS_CACHE_SIZE = int(os.environ.get('NOTIFICATION_SETTINGS_CACHE_SIZE') or 10000)
@@ -20,5 +20,23 @@ def create_admin():
         db.session.commit()
         print(f"Admin user '{username}' created successfully!")
 
+@cli.command("rebuild-task-stats")
+def rebuild_task_stats():
+    """Recompute the task_daily_stats rollup from all tasks"""
+    from app.utils.task_stats import rebuild_daily_stats
+    
+    with app.app_context():
+        rows = rebuild_daily_stats()
+        print(f"Rebuilt {rows} task stats rows.")
+
+@cli.command("replay-webhooks")
+def replay_webhooks():
+    """Queue all dead-lettered webhook deliveries again"""
+    from app.tasks.webhook_delivery import replay_dead_letters
+    
+    with app.app_context():
+        count = replay_dead_letters()
+        print(f"Queued {count} webhook deliveries.")
+
 if __name__ == "__main__":
     cli()
@@ -1,6 +1,9 @@
 import unittest
 from app import create_app, db
-from app.models.user import User, Task
+from app.models.user import User, Task, TaskLog
+from app.utils.task_query import build_task_query, order_tasks
+from datetime import datetime
+from sqlalchemy import text
 from config import Config
 import os
 import tempfile
@@ -109,5 +112,49 @@ class TaskModelTestCase(unittest.TestCase):
         self.assertEqual(task_dict['task_type'], 'email')
         self.assertEqual(task_dict['user_id'], self.user.id)
 
+class QueryPlanTestCase(unittest.TestCase):
+    def setUp(self):
+        self.app = create_app(TestConfig)
+        self.app_context = self.app.app_context()
+        self.app_context.push()
+        db.create_all()
+        
+    def tearDown(self):
+        db.session.remove()
+        db.drop_all()
+        self.app_context.pop()
+        
+    def explain(self, query):
+        """Return the SQLite query plan of a query as a single string."""
+        statement = query.statement.compile(db.engine, compile_kwargs={'literal_binds': True})
+        rows = db.session.execute(text(f'EXPLAIN QUERY PLAN {statement}')).all()
+        return ' | '.join(row[-1] for row in rows)
+        
+    def test_task_list_uses_user_created_index(self):
+        query = order_tasks(build_task_query(1, {}), order='desc')
+        plan = self.explain(query)
+        self.assertIn('ix_tasks_user_id_created_at', plan)
+        self.assertNotIn('TEMP B-TREE', plan)
+        
+    def test_status_filter_uses_user_status_index(self):
+        query = Task.query.filter_by(user_id=1, status='completed')
+        self.assertIn('ix_tasks_user_id_status', self.explain(query))
+        
+    def test_completion_range_uses_user_completed_index(self):
+        query = Task.query.filter(Task.user_id == 1, Task.completed_at >= datetime(2024, 1, 1))
+        self.assertIn('ix_tasks_user_id_completed_at', self.explain(query))
+        
+    def test_pending_sweep_uses_status_created_index(self):
+        query = Task.query.filter(Task.status == 'pending').order_by(Task.created_at)
+        plan = self.explain(query)
+        self.assertIn('ix_tasks_status_created_at', plan)
+        self.assertNotIn('TEMP B-TREE', plan)
+        
+    def test_task_logs_use_task_timestamp_index(self):
+        query = TaskLog.query.filter_by(task_id=1).order_by(TaskLog.timestamp)
+        plan = self.explain(query)
+        self.assertIn('ix_task_logs_task_id_timestamp', plan)
+        self.assertNotIn('TEMP B-TREE', plan)
+
 if __name__ == '__main__':
     unittest.main()
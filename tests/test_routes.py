@@ -1,7 +1,21 @@
+import csv
+import gzip
+import io
+import json
+import os
+import shutil
+import tempfile
+import time
 import unittest
+from unittest.mock import patch
+from datetime import datetime, timedelta
+from sqlalchemy import event
 from flask import url_for
 from app import create_app, db
-from app.models.user import User, Task
+from app.models.user import User, Task, TaskLog, ExportJob, WebhookSubscription
+from app.tasks.export_jobs import run_export_job, cleanup_export_jobs
+from app.utils.task_stats import rebuild_daily_stats
+from app.utils.webhooks import sign_payload, SIGNATURE_HEADER
 from config import Config
 
 class TestConfig(Config):
@@ -205,7 +219,203 @@ class APIRoutesTestCase(unittest.TestCase):
             self.assertIn('tasks', json_data)
             self.assertEqual(len(json_data['tasks']), 1)
             self.assertEqual(json_data['tasks'][0]['name'], 'API Test Task')
-            
+            self.assertIsNone(json_data['next_cursor'])
+
+    def test_get_tasks_api_pagination(self):
+        # Create tasks with distinct priorities and types
+        for i in range(5):
+            task = Task(
+                name=f'Paged Task {i}',
+                description='Paged',
+                status='pending',
+                priority=3 if i % 2 else 1,
+                task_type='api',
+                user_id=self.user.id
+            )
+            db.session.add(task)
+        db.session.commit()
+
+        with self.app.test_request_context():
+            seen = []
+            cursor = None
+            while True:
+                response = self.client.get(
+                    url_for('api.get_tasks', limit=2, cursor=cursor)
+                )
+                self.assertEqual(response.status_code, 200)
+                json_data = response.get_json()
+                self.assertLessEqual(len(json_data['tasks']), 2)
+                seen.extend(task['id'] for task in json_data['tasks'])
+                cursor = json_data['next_cursor']
+                if not cursor:
+                    break
+
+            # Every task is returned exactly once, newest first
+            self.assertEqual(len(seen), 5)
+            self.assertEqual(seen, sorted(seen, reverse=True))
+
+            # Filtering happens server-side
+            response = self.client.get(url_for('api.get_tasks', priority=3))
+            self.assertEqual(len(response.get_json()['tasks']), 2)
+
+            # Bad arguments are rejected
+            response = self.client.get(url_for('api.get_tasks', cursor='garbage'))
+            self.assertEqual(response.status_code, 400)
+
+    def test_get_tasks_api_ndjson_stream(self):
+        for i in range(3):
+            db.session.add(Task(
+                name=f'Streamed Task {i}',
+                description='Streamed',
+                user_id=self.user.id
+            ))
+        db.session.commit()
+
+        with self.app.test_request_context():
+            response = self.client.get(
+                url_for('api.get_tasks', order='asc'),
+                headers={'Accept': 'application/x-ndjson'}
+            )
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(response.mimetype, 'application/x-ndjson')
+            lines = response.get_data(as_text=True).splitlines()
+            self.assertEqual(
+                [json.loads(line)['name'] for line in lines],
+                ['Streamed Task 0', 'Streamed Task 1', 'Streamed Task 2']
+            )
+
+            # ?stream=1 selects the same mode
+            response = self.client.get(url_for('export.export_tasks_json', stream=1))
+            self.assertEqual(response.mimetype, 'application/x-ndjson')
+            self.assertEqual(len(response.get_data(as_text=True).splitlines()), 3)
+
+    def test_export_tasks_csv_stream(self):
+        for i in range(3):
+            db.session.add(Task(name=f'CSV Task {i}', description='Line one\nline two', user_id=self.user.id))
+        db.session.commit()
+
+        with self.app.test_request_context():
+            response = self.client.get(url_for('export.export_tasks_csv'))
+            self.assertEqual(response.status_code, 200)
+            self.assertTrue(response.is_streamed)
+            self.assertEqual(response.mimetype, 'text/csv')
+            rows = list(csv.reader(io.StringIO(response.get_data(as_text=True))))
+            self.assertEqual(rows[0][:2], ['ID', 'Name'])
+            self.assertEqual([row[1] for row in rows[1:]], ['CSV Task 0', 'CSV Task 1', 'CSV Task 2'])
+            self.assertEqual(rows[1][2], 'Line one\nline two')
+
+            # The header goes out on its own, before any rows are fetched
+            streamed = self.client.get(url_for('export.export_tasks_csv'))
+            chunks = iter(streamed.response)
+            self.assertEqual(list(csv.reader(io.StringIO(next(chunks).decode()))), [rows[0]])
+            streamed.close()
+
+            # ?gzip=1 compresses the same document on the fly
+            compressed = self.client.get(url_for('export.export_tasks_csv', gzip=1))
+            self.assertEqual(compressed.mimetype, 'application/gzip')
+            self.assertIn('.csv.gz', compressed.headers['Content-Disposition'])
+            self.assertEqual(gzip.decompress(compressed.data), response.data)
+
+    def test_export_job_lifecycle(self):
+        self.app.config['EXPORT_SPOOL_DIR'] = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.app.config['EXPORT_SPOOL_DIR'])
+        for i in range(3):
+            db.session.add(Task(name=f'Job Task {i}', description='Exported', user_id=self.user.id))
+        db.session.commit()
+
+        with self.app.test_request_context(), patch('app.routes.export.run_export_job') as run_job:
+            response = self.client.post(url_for('export.create_export_job'), json={'format': 'ndjson', 'gzip': True})
+            self.assertEqual(response.status_code, 202)
+            job_id = response.get_json()['job']['id']
+            run_job.delay.assert_called_once_with(job_id)
+
+            # Not downloadable until the job has run
+            response = self.client.get(url_for('export.download_export_job', job_id=job_id))
+            self.assertEqual(response.status_code, 409)
+
+            run_export_job(job_id)
+            job = self.client.get(url_for('export.export_job_status', job_id=job_id)).get_json()['job']
+            self.assertEqual(job['status'], 'completed')
+            self.assertEqual(job['rows_written'], 3)
+            self.assertEqual(job['progress'], 100.0)
+
+            response = self.client.get(job['download_url'])
+            self.assertEqual(response.status_code, 200)
+            lines = gzip.decompress(response.data).decode().splitlines()
+            self.assertEqual([json.loads(line)['name'] for line in lines], ['Job Task 0', 'Job Task 1', 'Job Task 2'])
+            response.close()
+
+            # Interrupted downloads resume with a Range request
+            partial = self.client.get(job['download_url'], headers={'Range': 'bytes=10-'})
+            self.assertEqual(partial.status_code, 206)
+            self.assertEqual(partial.data, response.data[10:])
+            partial.close()
+
+            # Unchanged artifacts are revalidated with the ETag
+            cached = self.client.get(job['download_url'], headers={'If-None-Match': response.headers['ETag']})
+            self.assertEqual(cached.status_code, 304)
+
+            # Expired artifacts are removed
+            export_job = db.session.get(ExportJob, job_id)
+            export_job.expires_at = datetime.utcnow() - timedelta(seconds=1)
+            db.session.commit()
+            cleanup_export_jobs()
+            self.assertEqual(os.listdir(self.app.config['EXPORT_SPOOL_DIR']), [])
+            response = self.client.get(job['download_url'])
+            self.assertEqual(response.status_code, 410)
+
+            # Bad formats are rejected
+            response = self.client.post(url_for('export.create_export_job'), json={'format': 'xml'})
+            self.assertEqual(response.status_code, 400)
+
+    def test_cleanup_fails_stale_export_jobs(self):
+        spool = self.app.config['EXPORT_SPOOL_DIR'] = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, spool)
+        started = datetime.utcnow() - timedelta(seconds=self.app.config['EXPORT_STALE_SECONDS'] + 1)
+        stale = ExportJob(user_id=self.user.id, status='running', started_at=started)
+        running = ExportJob(user_id=self.user.id, status='running', started_at=datetime.utcnow())
+        db.session.add_all([stale, running])
+        db.session.commit()
+        for job in (stale, running):
+            open(os.path.join(spool, f'export_{job.id}_0123456789abcdef.part'), 'wb').close()
+
+        cleanup_export_jobs()
+        self.assertEqual(db.session.get(ExportJob, stale.id).status, 'failed')
+        self.assertEqual(db.session.get(ExportJob, running.id).status, 'running')
+        self.assertEqual(os.listdir(spool), [f'export_{running.id}_0123456789abcdef.part'])
+
+    def test_import_exported_csv(self):
+        db.session.add(Task(name='Round Trip', description='Quoted, "multi"\nline', priority=3,
+                            task_type='email', user_id=self.user.id))
+        db.session.commit()
+
+        with self.app.test_request_context(), patch('app.routes.export.enqueue_tasks') as enqueue_tasks:
+            exported = self.client.get(url_for('export.export_tasks_csv')).data
+            response = self.client.post(
+                url_for('export.import_tasks'),
+                data={'file': (io.BytesIO(exported), 'tasks.csv'), 'enqueue': '1'},
+                content_type='multipart/form-data'
+            )
+            self.assertEqual(response.status_code, 200)
+            json_data = response.get_json()
+            self.assertEqual(json_data['imported_count'], 1)
+            self.assertEqual(json_data['failed_count'], 0)
+            self.assertIn('rows_per_second', json_data)
+            enqueue_tasks.assert_called_once()
+
+            tasks = Task.query.filter_by(name='Round Trip').order_by(Task.id).all()
+            self.assertEqual(len(tasks), 2)
+            self.assertEqual(tasks[1].description, 'Quoted, "multi"\nline')
+            self.assertEqual((tasks[1].priority, tasks[1].task_type, tasks[1].status), (3, 'email', 'pending'))
+
+            # Unsupported files are rejected up front
+            response = self.client.post(
+                url_for('export.import_tasks'),
+                data={'file': (io.BytesIO(b'<tasks/>'), 'tasks.xml')},
+                content_type='multipart/form-data'
+            )
+            self.assertEqual(response.status_code, 400)
+
     def test_create_task_api(self):
         with self.app.test_request_context():
             response = self.client.post(
@@ -230,5 +440,232 @@ class APIRoutesTestCase(unittest.TestCase):
             self.assertEqual(task.priority, 3)
             self.assertEqual(task.task_type, 'api')
 
+    def test_create_tasks_bulk_api(self):
+        with self.app.test_request_context(), patch('app.utils.task_insert.enqueue_tasks') as enqueue_tasks:
+            response = self.client.post(
+                url_for('api.create_tasks_bulk'),
+                json=[
+                    {'name': 'Bulk 1', 'description': 'First', 'priority': 3},
+                    {'name': 'Bulk 2'},
+                    {'name': 'Bulk 3', 'description': 'Third', 'task_type': 'email'}
+                ]
+            )
+            self.assertEqual(response.status_code, 201)
+            json_data = response.get_json()
+            self.assertEqual(json_data['created'], 2)
+            self.assertEqual(json_data['failed'], 1)
+            self.assertIn('error', json_data['results'][1])
+
+            # Tasks and their creation logs are stored
+            ids = [json_data['results'][0]['id'], json_data['results'][2]['id']]
+            tasks = Task.query.filter(Task.id.in_(ids)).order_by(Task.id).all()
+            self.assertEqual([t.name for t in tasks], ['Bulk 1', 'Bulk 3'])
+            self.assertEqual(TaskLog.query.filter(TaskLog.task_id.in_(ids)).count(), 2)
+
+            # All tasks are dispatched in a single call
+            enqueue_tasks.assert_called_once()
+            self.assertEqual([t.id for t in enqueue_tasks.call_args[0][0]], ids)
+
+    def test_create_tasks_bulk_api_replay(self):
+        items = [
+            {'name': 'Replay 1', 'description': 'First'},
+            {'name': 'Replay 2', 'description': 'Second', 'external_id': 'order-42'}
+        ]
+        headers = {'Idempotency-Key': 'batch-7'}
+        with self.app.test_request_context(), patch('app.utils.task_insert.enqueue_tasks') as enqueue_tasks:
+            first = self.client.post(url_for('api.create_tasks_bulk'), json=items, headers=headers)
+            self.assertEqual(first.status_code, 201)
+            self.assertEqual(first.get_json()['created'], 2)
+
+            # The same request again creates and dispatches nothing
+            replay = self.client.post(url_for('api.create_tasks_bulk'), json=items, headers=headers)
+            self.assertEqual(replay.status_code, 200)
+            json_data = replay.get_json()
+            self.assertEqual(json_data['created'], 0)
+            self.assertEqual(json_data['duplicates'], 2)
+            self.assertEqual(
+                [result['id'] for result in json_data['results']],
+                [result['id'] for result in first.get_json()['results']]
+            )
+            self.assertTrue(all(result['duplicate'] for result in json_data['results']))
+            self.assertEqual(Task.query.filter(Task.name.like('Replay %')).count(), 2)
+            enqueue_tasks.assert_called_once()
+
+            # An explicit external_id is shared with the single-task endpoint
+            with patch('app.routes.api.enqueue_task') as enqueue_task:
+                response = self.client.post(
+                    url_for('api.create_task'),
+                    json={'name': 'Other', 'description': 'Other', 'external_id': 'order-42'}
+                )
+                self.assertEqual(response.status_code, 200)
+                self.assertEqual(response.get_json()['task']['name'], 'Replay 2')
+                enqueue_task.assert_not_called()
+
+    def test_dashboard_task_stats(self):
+        now = datetime.utcnow()
+        for days_ago, status in [(0, 'completed'), (0, 'completed'), (3, 'completed'), (20, 'completed'), (0, 'pending')]:
+            db.session.add(Task(
+                name=f'Stats {days_ago}',
+                description='Stats',
+                status=status,
+                priority=3 if status == 'pending' else 1,
+                completed_at=now - timedelta(days=days_ago) if status == 'completed' else None,
+                user_id=self.user.id
+            ))
+        db.session.commit()
+        rebuild_daily_stats()
+
+        statements = []
+        def record(conn, cursor, statement, *args):
+            statements.append(statement)
+
+        with self.app.test_request_context():
+            event.listen(db.engine, 'before_cursor_execute', record)
+            try:
+                response = self.client.get(url_for('dashboard.task_stats'))
+            finally:
+                event.remove(db.engine, 'before_cursor_execute', record)
+            self.assertEqual(response.status_code, 200)
+            json_data = response.get_json()
+            self.assertEqual(json_data['status_data'], {'completed': 4, 'pending': 1})
+            self.assertEqual(json_data['priority_data'], {'Low': 4, 'High': 1})
+            self.assertEqual(len(json_data['completion_trend']['labels']), 7)
+            self.assertEqual(json_data['completion_trend']['data'][-1], 2)
+            self.assertEqual(sum(json_data['completion_trend']['data']), 3)
+
+            # One aggregate plus one trend query, both on the rollup
+            self.assertFalse([s for s in statements if 'FROM tasks' in s])
+            self.assertEqual(len([s for s in statements if 'FROM task_daily_stats' in s]), 2)
+
+            # Longer windows cost the same number of queries
+            response = self.client.get(url_for('dashboard.task_stats', days=30))
+            self.assertEqual(len(response.get_json()['completion_trend']['data']), 30)
+            self.assertEqual(sum(response.get_json()['completion_trend']['data']), 4)
+
+            response = self.client.get(url_for('dashboard.task_stats', days=5))
+            self.assertEqual(response.status_code, 400)
+
+    def test_dashboard_conditional_requests(self):
+        task = Task(name='Cached', description='Cached', user_id=self.user.id)
+        db.session.add(task)
+        db.session.commit()
+
+        with self.app.test_request_context():
+            response = self.client.get(url_for('dashboard.recent_tasks'))
+            self.assertEqual(response.status_code, 200)
+            etag = response.headers['ETag']
+
+            # An unchanged poll is answered from the ETag alone
+            response = self.client.get(url_for('dashboard.recent_tasks'), headers={'If-None-Match': etag})
+            self.assertEqual(response.status_code, 304)
+
+            # ETags expire with the cache TTL, even without a version bump
+            later = time.time() + self.app.config['CACHE_DEFAULT_TTL']
+            with patch('time.time', return_value=later):
+                response = self.client.get(url_for('dashboard.recent_tasks'), headers={'If-None-Match': etag})
+            self.assertEqual(response.status_code, 200)
+            self.assertNotEqual(response.headers['ETag'], etag)
+
+            # Deleting a task invalidates the user's cached responses
+            self.client.delete(url_for('api.delete_task', task_id=task.id))
+            response = self.client.get(url_for('dashboard.recent_tasks'), headers={'If-None-Match': etag})
+            self.assertEqual(response.status_code, 200)
+            self.assertNotEqual(response.headers['ETag'], etag)
+            self.assertEqual(response.get_json()['tasks'], [])
+
+    def test_create_tasks_bulk_api_invalid(self):
+        with self.app.test_request_context():
+            response = self.client.post(url_for('api.create_tasks_bulk'), json={'tasks': []})
+            self.assertEqual(response.status_code, 400)
+
+    def test_notification_settings_are_validated(self):
+        with self.app.test_request_context():
+            response = self.client.post(
+                url_for('notification.update_settings'),
+                json={'email_notifications': 'no', 'daily_summary': 1, 'email': 'x' * 110 + '@example.com'}
+            )
+            self.assertEqual(response.status_code, 400)
+            self.assertEqual(
+                sorted(response.get_json()['errors']), ['daily_summary', 'email', 'email_notifications']
+            )
+
+            response = self.client.post(url_for('notification.update_settings'), json={'email': 'not-an-address'})
+            self.assertEqual(response.status_code, 400)
+            self.assertIn('email', response.get_json()['errors'])
+
+            response = self.client.post(
+                url_for('notification.update_settings'),
+                json={'daily_summary': True, 'email': 'alerts@example.com'}
+            )
+            self.assertEqual(response.status_code, 200)
+            settings = response.get_json()['settings']
+            self.assertEqual((settings['daily_summary'], settings['email']), (True, 'alerts@example.com'))
+            self.assertTrue(settings['email_notifications'])
+
+    def test_webhook_subscriptions(self):
+        with self.app.test_request_context():
+            response = self.client.post(
+                url_for('webhook.register_webhook'),
+                json={'url': 'http://receiver.test/hook', 'event_type': 'task.created'}
+            )
+            self.assertEqual(response.status_code, 200)
+            webhook_id = response.get_json()['webhook']['id']
+
+            response = self.client.post(
+                url_for('webhook.register_webhook'),
+                json={'url': 'http://receiver.test/hook', 'event_type': 'task.renamed'}
+            )
+            self.assertEqual(response.status_code, 400)
+
+            response = self.client.get(url_for('webhook.list_webhooks'))
+            self.assertEqual([w['id'] for w in response.get_json()['webhooks']], [webhook_id])
+            self.assertEqual(response.get_json()['webhooks'][0]['delivery']['circuit'], 'closed')
+
+            # New tasks are announced to the subscription without waiting for it
+            with patch('app.utils.webhooks.queue_delivery') as queue_delivery, \
+                    patch('app.utils.task_insert.enqueue_tasks'):
+                self.client.post(url_for('api.create_tasks_bulk'), json=[{'name': 'Hooked', 'description': 'Hook'}])
+            events = queue_delivery.call_args.args[2]
+            self.assertEqual([event['task_name'] for event in events], ['Hooked'])
+
+            response = self.client.delete(url_for('webhook.delete_webhook', webhook_id=webhook_id))
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(WebhookSubscription.query.count(), 0)
+
+    def test_receive_webhook_batch(self):
+        self.app.config['WEBHOOK_SIGNING_SECRET'] = 'shared-secret'
+        events = [
+            {'id': 'evt-1', 'event_type': 'create_task', 'task': {'name': 'Inbound 1', 'user_id': self.user.id}},
+            {'id': 'evt-2', 'event_type': 'create_task', 'task': {'name': 'Inbound 2', 'user_id': self.user.id}},
+            {'id': 'evt-3', 'event_type': 'create_task', 'task': {'name': 'Inbound 3', 'user_id': 999}},
+            {'id': 'evt-4', 'event_type': 'task_viewed'}
+        ]
+        body = json.dumps(events).encode()
+        headers = {'Content-Type': 'application/json', SIGNATURE_HEADER: sign_payload(body, 'shared-secret')}
+
+        with self.app.test_request_context(), patch('app.utils.task_insert.enqueue_tasks') as enqueue_tasks:
+            response = self.client.post(
+                url_for('webhook.receive_webhook'), data=body,
+                headers={'Content-Type': 'application/json', SIGNATURE_HEADER: 'sha256=forged'}
+            )
+            self.assertEqual(response.status_code, 401)
+
+            response = self.client.post(url_for('webhook.receive_webhook'), data=body, headers=headers)
+            self.assertEqual(response.status_code, 202)
+            json_data = response.get_json()
+            self.assertEqual((json_data['accepted'], json_data['ignored'], json_data['failed']), (2, 1, 1))
+            self.assertEqual(json_data['results'][2]['error'], 'Unknown user')
+            tasks = Task.query.filter(Task.name.like('Inbound %')).order_by(Task.id).all()
+            self.assertEqual([task.task_type for task in tasks], ['general', 'general'])
+            self.assertEqual(TaskLog.query.filter(TaskLog.task_id.in_([t.id for t in tasks])).count(), 2)
+            enqueue_tasks.assert_called_once()
+
+            # A redelivered batch is acknowledged without creating anything
+            response = self.client.post(url_for('webhook.receive_webhook'), data=body, headers=headers)
+            self.assertEqual(response.status_code, 202)
+            self.assertEqual(response.get_json()['duplicates'], 2)
+            self.assertEqual(Task.query.filter(Task.name.like('Inbound %')).count(), 2)
+            enqueue_tasks.assert_called_once()
+
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,606 @@
+import json
+import os
+import requests
+import subprocess
+import sys
+import tempfile
+import time
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+from unittest.mock import patch
+from celery import Celery
+from datetime import datetime, timedelta
+from sqlalchemy import event
+from app import create_app, db
+from app.models.user import User, Task, TaskLog, OutboxMessage, WebhookDeadLetter, WebhookSubscription
+from app.tasks.task_claims import (
+    claim_task, release_task, claim_pending_for_dispatch, reclaim_expired_leases
+)
+from app.tasks.handlers import get_handler, api_url_allowed, task_file_path
+from app.tasks.automation_processor import process_automation_task
+from app.tasks.dispatch import enqueue_tasks
+from app.tasks.task_scheduler import queue_pending_tasks
+from app.tasks.routing import queue_for_task, pending_latency_by_priority, configure_worker_concurrency
+from app.tasks.webhook_delivery import deliver_webhook, backoff_delay
+from app.tasks.notifications import drain_outbox
+from app.utils.cache import get_cache
+from app.utils.webhooks import subscribed_urls, trigger_webhook, webhook_batch
+from app.utils.webhook_health import circuit_check, circuit_state, delivery_slot, delivery_stats, record_delivery
+from app.utils.notifications import (
+    default_settings, get_settings, update_settings, should_notify, queue_daily_digests, SETTINGS_NAMESPACE
+)
+from app.utils.smtp_sink import SMTPSink
+from app.utils.http_stub import HTTPStub
+from app.utils.task_stats import (
+    record_status_change, rebuild_daily_stats, task_breakdown, completion_trend
+)
+from config import Config
+
+class TestConfig(Config):
+    TESTING = True
+    SQLALCHEMY_DATABASE_URI = 'sqlite:///:memory:'
+    WTF_CSRF_ENABLED = False
+    SERVER_NAME = 'localhost.localdomain'
+
+class TaskClaimTestCase(unittest.TestCase):
+    def setUp(self):
+        self.app = create_app(TestConfig)
+        self.app_context = self.app.app_context()
+        self.app_context.push()
+        db.create_all()
+
+        # Create test user and task
+        self.user = User(username='testuser', email='test@example.com')
+        self.user.set_password('password123')
+        db.session.add(self.user)
+        db.session.commit()
+
+        self.task = Task(
+            name='Claim Task',
+            description='Claim Description',
+            status='pending',
+            user_id=self.user.id
+        )
+        db.session.add(self.task)
+        db.session.commit()
+
+    def tearDown(self):
+        db.session.remove()
+        db.drop_all()
+        self.app_context.pop()
+
+    def test_claim_is_exclusive(self):
+        self.assertTrue(claim_task(self.task.id, 'worker-1'))
+        self.assertFalse(claim_task(self.task.id, 'worker-2'))
+
+        task = db.session.get(Task, self.task.id)
+        self.assertEqual(task.status, 'processing')
+        self.assertEqual(task.claimed_by, 'worker-1')
+
+        # Only the owner can release the task
+        self.assertFalse(release_task(self.task.id, 'worker-2', 'completed'))
+        self.assertTrue(release_task(self.task.id, 'worker-1', 'completed', completed_at=datetime.utcnow()))
+
+        task = db.session.get(Task, self.task.id)
+        self.assertEqual(task.status, 'completed')
+        self.assertIsNone(task.claimed_by)
+        self.assertFalse(claim_task(self.task.id, 'worker-2'))
+
+    def test_expired_lease_can_be_reclaimed(self):
+        self.assertTrue(claim_task(self.task.id, 'worker-1'))
+        self.task.lease_expires_at = datetime.utcnow() - timedelta(seconds=1)
+        db.session.commit()
+
+        self.assertEqual(reclaim_expired_leases(), 1)
+        self.assertTrue(claim_task(self.task.id, 'worker-2'))
+
+    def test_pending_tasks_are_dispatched_once(self):
+        statements = []
+        event.listen(db.engine, 'before_cursor_execute', lambda *args: statements.append(args[2]))
+        with patch('app.tasks.dispatch.group'):
+            self.assertEqual(queue_pending_tasks(), [self.task.id])
+        # Marked queued with a single UPDATE, after the send
+        self.assertEqual(len([s for s in statements if s.startswith('UPDATE tasks')]), 1)
+
+        # Already queued, so the next sweep leaves it alone
+        self.assertEqual(claim_pending_for_dispatch(), [])
+
+        # Unless the queue entry is older than the requeue threshold
+        self.task.queued_at = datetime.utcnow() - timedelta(seconds=self.app.config['TASK_REQUEUE_SECONDS'] + 1)
+        db.session.commit()
+        self.assertEqual([t.id for t in claim_pending_for_dispatch()], [self.task.id])
+
+        # A failed send leaves the task to the next sweep
+        db.session.rollback()
+        with patch('app.tasks.dispatch.group') as group:
+            group.return_value.apply_async.side_effect = ConnectionError('broker down')
+            with self.assertRaises(ConnectionError):
+                queue_pending_tasks()
+        db.session.rollback()
+        self.assertEqual([t.id for t in claim_pending_for_dispatch()], [self.task.id])
+
+    def test_sweep_dispatches_through_the_automation_processor(self):
+        with patch('app.tasks.dispatch.group') as group:
+            self.assertEqual(queue_pending_tasks(), [self.task.id])
+            signatures = list(group.call_args.args[0])
+        self.assertEqual([signature.task for signature in signatures], [process_automation_task.name])
+        self.assertEqual(signatures[0].args, (self.task.id,))
+
+class TaskRoutingTestCase(unittest.TestCase):
+    def setUp(self):
+        self.app = create_app(TestConfig)
+        self.app_context = self.app.app_context()
+        self.app_context.push()
+        db.create_all()
+
+        # Create test user
+        self.user = User(username='testuser', email='test@example.com')
+        self.user.set_password('password123')
+        db.session.add(self.user)
+        db.session.commit()
+
+    def tearDown(self):
+        db.session.remove()
+        db.drop_all()
+        self.app_context.pop()
+
+    def test_queue_for_task(self):
+        self.assertEqual(queue_for_task(3, 'general'), 'tasks.high')
+        self.assertEqual(queue_for_task(1, 'unknown'), 'tasks.low')
+
+        # I/O- and CPU-bound handlers go to the queue of their execution model
+        self.assertEqual(queue_for_task(2, 'api'), 'tasks.io')
+        self.assertEqual(queue_for_task(1, 'email'), 'tasks.io')
+        self.assertEqual(queue_for_task(3, 'file'), 'tasks.cpu')
+
+        # Task types can be pinned to a dedicated queue
+        self.app.config['TASK_TYPE_QUEUES'] = {'api': 'tasks.partner'}
+        self.assertEqual(queue_for_task(3, 'api'), 'tasks.partner')
+
+    def test_worker_concurrency_follows_its_queues(self):
+        def concurrency(queues, **options):
+            conf = Celery(set_as_current=False).conf
+            conf.update(self.app.config)
+            configure_worker_concurrency(conf=conf, options={'queues': queues, **options})
+            return conf.worker_concurrency
+
+        self.assertEqual(concurrency('tasks.high'), 8)
+        self.assertEqual(concurrency('tasks.default,celery'), 4)
+        self.assertEqual(concurrency(['tasks.low', 'tasks.high']), 8)
+        self.assertEqual(concurrency('tasks.high', concurrency=3), None)
+        self.assertEqual(concurrency('celery'), None)
+
+    def test_worker_entry_point_registers_tasks(self):
+        # A fresh interpreter, like ``celery -A celery_worker.celery worker``
+        output = subprocess.run(
+            [sys.executable, '-c', 'import celery_worker; print(sorted(celery_worker.celery.tasks))'],
+            cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+            capture_output=True, text=True, check=True
+        ).stdout
+        for name in ('process_automation_task', 'run_scheduled_tasks', 'check_pending_tasks',
+                     'drain_outbox', 'deliver_webhook'):
+            self.assertIn(name, output)
+
+    def test_enqueue_tasks_routes_by_priority(self):
+        tasks = [
+            Task(name=f'Routed {priority}', description='Routing', priority=priority, user_id=self.user.id)
+            for priority in (1, 3)
+        ]
+        db.session.add_all(tasks)
+        db.session.commit()
+
+        with patch('app.tasks.dispatch.group') as group:
+            enqueue_tasks(tasks)
+        signatures = list(group.call_args[0][0])
+        self.assertEqual([s.options['queue'] for s in signatures], ['tasks.low', 'tasks.high'])
+        self.assertTrue(all(task.queued_at for task in tasks))
+
+    def test_pending_latency_by_priority(self):
+        db.session.add(Task(
+            name='Waiting', description='Routing', priority=3, user_id=self.user.id,
+            created_at=datetime.utcnow() - timedelta(minutes=5)
+        ))
+        db.session.commit()
+
+        stats = pending_latency_by_priority()
+        self.assertEqual(stats[3]['pending'], 1)
+        self.assertGreaterEqual(stats[3]['oldest_wait_seconds'], 300)
+        self.assertFalse(stats[3]['slo_met'])
+        self.assertTrue(stats[1]['slo_met'])
+
+class AutomationProcessorTestCase(unittest.TestCase):
+    def setUp(self):
+        self.app = create_app(TestConfig)
+        self.app_context = self.app.app_context()
+        self.app_context.push()
+        db.create_all()
+
+        # Create test user
+        self.user = User(username='testuser', email='test@example.com')
+        self.user.set_password('password123')
+        db.session.add(self.user)
+        db.session.commit()
+
+    def tearDown(self):
+        db.session.remove()
+        db.drop_all()
+        self.app_context.pop()
+
+    def _create_task(self, task_type, description='Handler test'):
+        task = Task(name=f'{task_type} task', description=description,
+                    status='pending', task_type=task_type, user_id=self.user.id)
+        db.session.add(task)
+        db.session.commit()
+        return task.id
+
+    def test_handlers_are_registered_per_type(self):
+        self.assertEqual(get_handler('general').execution, 'inline')
+        self.assertEqual(get_handler('email').execution, 'thread')
+        self.assertEqual(get_handler('api').execution, 'thread')
+        self.assertEqual(get_handler('file').execution, 'process')
+        self.assertIs(get_handler('unknown'), get_handler('general'))
+
+    def test_inline_handler_completes_task(self):
+        task_id = self._create_task('general')
+        result = process_automation_task(task_id)
+
+        self.assertIn('processed successfully', result)
+        task = db.session.get(Task, task_id)
+        self.assertEqual(task.status, 'completed')
+        self.assertIsNotNone(task.completed_at)
+
+        # A second delivery of the same message is a no-op
+        self.assertIn('skipped', process_automation_task(task_id))
+
+    def test_processing_maintains_daily_stats(self):
+        task_ids = [self._create_task('general') for _ in range(2)]
+        for task_id in task_ids:
+            record_status_change(db.session.get(Task, task_id), None, 'pending')
+        db.session.commit()
+        self.assertEqual(task_breakdown(self.user.id)[0], {'pending': 2})
+
+        process_automation_task(task_ids[0])
+        status_data, type_data, priority_data = task_breakdown(self.user.id)
+        self.assertEqual(status_data, {'pending': 1, 'completed': 1})
+        self.assertEqual(type_data, {'general': 2})
+        self.assertEqual(completion_trend(self.user.id)['data'][-1], 1)
+
+        # The incremental counts match a full rebuild
+        rebuild_daily_stats()
+        self.assertEqual(task_breakdown(self.user.id)[0], status_data)
+
+    def test_api_handler_calls_the_url(self):
+        with HTTPStub() as stub:
+            self.app.config['TASK_API_ALLOWED_URLS'] = [f'{stub.url}/ping']
+            task_ids = [self._create_task('api', json.dumps({'url': f'{stub.url}/ping/{i}'})) for i in range(3)]
+            for task_id in task_ids:
+                self.assertIn('processed successfully', process_automation_task(task_id))
+        self.assertEqual(len(stub.requests), 3)
+
+        db.session.expire_all()
+        statuses = [db.session.get(Task, task_id).status for task_id in task_ids]
+        self.assertEqual(statuses, ['completed'] * 3)
+        logs = TaskLog.query.filter_by(task_id=task_ids[0], status='completed').count()
+        self.assertEqual(logs, 1)
+
+        # Parameters that are given but incomplete fail the task
+        task_id = self._create_task('api', json.dumps({'method': 'GET'}))
+        self.assertIn('Error processing task', process_automation_task(task_id))
+        self.assertEqual(db.session.get(Task, task_id).status, 'failed')
+
+    def test_plain_description_runs_as_general_task(self):
+        for task_type in ('email', 'api', 'file'):
+            task_id = self._create_task(task_type, 'Created via webhook')
+            self.assertIn('processed successfully', process_automation_task(task_id))
+            self.assertEqual(db.session.get(Task, task_id).status, 'completed')
+
+    def test_handlers_reject_parameters_outside_their_limits(self):
+        self.app.config['TASK_API_ALLOWED_URLS'] = ['https://api.example.com/v1']
+        self.assertTrue(api_url_allowed('https://api.example.com/v1/items?page=2'))
+        for url in ('https://api.example.com/v10', 'http://api.example.com/v1/items',
+                    'https://api.example.com:8443/v1', 'https://user@api.example.com/v1',
+                    'http://169.254.169.254/latest/meta-data', 'file:///etc/passwd'):
+            self.assertFalse(api_url_allowed(url), url)
+
+        with tempfile.TemporaryDirectory() as root:
+            self.app.config['TASK_FILE_ROOT'] = root
+            self.assertEqual(task_file_path('uploads/a.csv'), os.path.join(os.path.realpath(root), 'uploads', 'a.csv'))
+            for path in ('../secret.txt', '/etc/passwd'):
+                with self.assertRaises(ValueError):
+                    task_file_path(path)
+
+            with patch('app.tasks.handlers.send_email', return_value=True) as send_email:
+                task_ids = [
+                    self._create_task('api', json.dumps({'url': 'http://169.254.169.254/'})),
+                    self._create_task('file', json.dumps({'path': '/etc/passwd'})),
+                    self._create_task('email', json.dumps({'to': 'someone@elsewhere.test'})),
+                    self._create_task('email', json.dumps({'to': 'Test@Example.com'}))
+                ]
+                for task_id in task_ids:
+                    process_automation_task(task_id)
+            send_email.assert_called_once()
+
+        db.session.expire_all()
+        statuses = [db.session.get(Task, task_id).status for task_id in task_ids]
+        self.assertEqual(statuses, ['failed', 'failed', 'failed', 'completed'])
+
+class WebhookDeliveryTestCase(unittest.TestCase):
+    def setUp(self):
+        self.app = create_app(TestConfig)
+        self.app.config.update(WEBHOOK_MAX_ATTEMPTS=3, WEBHOOK_BATCH_SIZE=2)
+        self.app_context = self.app.app_context()
+        self.app_context.push()
+        db.create_all()
+
+        self.user = User(username='testuser', email='test@example.com')
+        self.user.set_password('password123')
+        db.session.add(self.user)
+        db.session.commit()
+        db.session.add(WebhookSubscription(
+            user_id=self.user.id, url='http://receiver.test/hook', event_type='task.completed'
+        ))
+        db.session.commit()
+
+    def tearDown(self):
+        db.session.remove()
+        db.drop_all()
+        self.app_context.pop()
+
+    def test_failed_delivery_is_retried_then_dead_lettered(self):
+        with patch('app.tasks.webhook_delivery.http_session') as http_session, \
+                patch('app.tasks.webhook_delivery.backoff_delay', return_value=0):
+            http_session.return_value.post.side_effect = requests.ConnectionError('refused')
+            deliver_webhook.apply(args=(1, 'http://receiver.test/hook', [{'event_type': 'task.completed'}]))
+
+        self.assertEqual(http_session.return_value.post.call_count, 3)
+        letter = WebhookDeadLetter.query.one()
+        self.assertEqual(letter.attempts, 3)
+        self.assertEqual(letter.to_dict()['events'], [{'event_type': 'task.completed'}])
+
+    def test_client_errors_are_not_retried(self):
+        with patch('app.tasks.webhook_delivery.http_session') as http_session:
+            http_session.return_value.post.return_value.status_code = 410
+            deliver_webhook.apply(args=(1, 'http://receiver.test/hook', [{'event_type': 'task.completed'}]))
+
+        http_session.return_value.post.assert_called_once()
+        self.assertEqual(WebhookDeadLetter.query.one().status_code, 410)
+
+    def test_circuit_opens_after_repeated_failures(self):
+        self.app.config.update(WEBHOOK_CIRCUIT_FAILURES=2, WEBHOOK_MAX_ATTEMPTS=1)
+        url = 'http://receiver.test/hook'
+        with patch('app.tasks.webhook_delivery.http_session') as http_session:
+            http_session.return_value.post.side_effect = requests.Timeout('timed out')
+            for _ in range(3):
+                deliver_webhook.apply(args=(self.user.id, url, [{'event_type': 'task.completed'}]))
+
+            # The third delivery is dead-lettered without contacting the receiver
+            self.assertEqual(http_session.return_value.post.call_count, 2)
+            self.assertEqual(circuit_state('receiver.test'), 'open')
+            self.assertIn('Circuit open', WebhookDeadLetter.query.order_by(WebhookDeadLetter.id.desc()).first().error)
+
+            # After the reset period a single probe may go through and closes the circuit
+            self.app.config['WEBHOOK_CIRCUIT_RESET_SECONDS'] = 0
+            http_session.return_value.post.side_effect = None
+            http_session.return_value.post.return_value.status_code = 204
+            deliver_webhook.apply(args=(self.user.id, url, [{'event_type': 'task.completed'}]))
+            self.assertEqual(circuit_state('receiver.test'), 'closed')
+
+        stats = delivery_stats(url)
+        self.assertEqual(stats['attempts'], 3)
+        self.assertEqual(stats['success_rate'], 0.333)
+        self.assertEqual(stats['last_error'], 'timed out')
+        self.assertIsNotNone(stats['p95_latency_ms'])
+
+    def test_half_open_circuit_lets_one_probe_through(self):
+        self.app.config.update(WEBHOOK_CIRCUIT_FAILURES=2, WEBHOOK_CIRCUIT_RESET_SECONDS=0)
+        url = 'http://receiver.test/hook'
+        with ThreadPoolExecutor(max_workers=4) as executor:
+            list(executor.map(lambda _: self._record_failure(url), range(4)))
+        self.assertEqual(circuit_state('receiver.test'), 'half-open')
+
+        # Concurrent deliveries race for the probe; exactly one wins
+        with ThreadPoolExecutor(max_workers=8) as executor:
+            waits = list(executor.map(lambda _: self._circuit_check('receiver.test'), range(8)))
+        self.assertEqual(waits.count(0), 1)
+
+        # A failed probe reopens the circuit and frees the probe for the next period
+        self._record_failure(url)
+        self.assertEqual(self._circuit_check('receiver.test'), 0)
+        self.assertEqual(delivery_stats(url)['attempts'], 5)
+
+    def _record_failure(self, url):
+        with self.app.app_context():
+            record_delivery(url, 0.1, 'timed out', healthy=False)
+
+    def _circuit_check(self, host):
+        with self.app.app_context():
+            return circuit_check(host)
+
+    def test_host_concurrency_is_limited(self):
+        self.app.config['WEBHOOK_HOST_CONCURRENCY'] = 1
+        with delivery_slot('receiver.test') as first:
+            with delivery_slot('receiver.test') as second:
+                self.assertTrue(first)
+                self.assertFalse(second)
+            with delivery_slot('other.test') as other:
+                self.assertTrue(other)
+        with delivery_slot('receiver.test') as again:
+            self.assertTrue(again)
+
+        # The slot counter's TTL runs from its creation, so a leaked slot is
+        # freed even while other deliveries keep using the host
+        ttl = 2 * self.app.config['WEBHOOK_TIMEOUT'] + 60
+        created = time.monotonic()
+        get_cache().incr('webhook-inflight:leaky.test', 1, ttl=ttl)
+        with patch('app.utils.cache.time.monotonic', return_value=created + ttl - 1):
+            with delivery_slot('leaky.test') as blocked:
+                self.assertFalse(blocked)
+        with patch('app.utils.cache.time.monotonic', return_value=created + ttl + 1):
+            with delivery_slot('leaky.test') as freed:
+                self.assertTrue(freed)
+
+    def test_backoff_grows_with_jitter(self):
+        delays = [backoff_delay(retries, 2, 60) for retries in range(8)]
+        self.assertTrue(1 <= delays[0] <= 2)
+        self.assertTrue(8 <= delays[3] <= 16)
+        self.assertTrue(30 <= delays[7] <= 60)
+
+    def test_events_are_batched_per_endpoint(self):
+        with patch('app.utils.webhooks.queue_delivery') as queue_delivery:
+            with webhook_batch():
+                for task_id in range(3):
+                    trigger_webhook(self.user.id, 'task.completed', {'task_id': task_id})
+                trigger_webhook(self.user.id, 'task.failed', {'task_id': 9})
+                queue_delivery.assert_not_called()
+
+        batches = [call.args[2] for call in queue_delivery.call_args_list]
+        self.assertEqual([[event['task_id'] for event in batch] for batch in batches], [[0, 1], [2]])
+
+    def test_subscriptions_are_cached_until_changed(self):
+        self.assertEqual(subscribed_urls(self.user.id, 'task.completed'), ['http://receiver.test/hook'])
+
+        # Further lookups do not query the database
+        statements = []
+        event.listen(db.engine, 'before_cursor_execute', lambda *args: statements.append(args[2]))
+        self.assertEqual(subscribed_urls(self.user.id, 'task.completed'), ['http://receiver.test/hook'])
+        self.assertEqual(subscribed_urls(self.user.id + 1, 'task.completed'), [])
+        self.assertEqual(statements, [])
+
+        # Committing a change invalidates the cache
+        db.session.add(WebhookSubscription(user_id=self.user.id, url='http://all.test/hook', event_type='task.all'))
+        db.session.commit()
+        self.assertEqual(
+            subscribed_urls(self.user.id, 'task.completed'),
+            ['http://receiver.test/hook', 'http://all.test/hook']
+        )
+
+    def test_completed_task_triggers_webhook(self):
+        task = Task(name='Hooked', description='Webhook', task_type='general', user_id=self.user.id)
+        db.session.add(task)
+        db.session.commit()
+
+        with patch('app.utils.webhooks.queue_delivery') as queue_delivery:
+            process_automation_task(task.id)
+
+        queue_delivery.assert_called_once()
+        user_id, url, events = queue_delivery.call_args.args
+        self.assertEqual(url, 'http://receiver.test/hook')
+        self.assertEqual(events[0]['task_id'], task.id)
+        self.assertEqual(events[0]['task_status'], 'completed')
+
+class NotificationOutboxTestCase(unittest.TestCase):
+    def setUp(self):
+        self.app = create_app(TestConfig)
+        self.app.config.update(MAIL_USE_TLS=False, NOTIFICATION_BATCH_SIZE=2, NOTIFICATION_MAX_ATTEMPTS=2)
+        self.app_context = self.app.app_context()
+        self.app_context.push()
+        db.create_all()
+
+        self.user = User(username='testuser', email='test@example.com')
+        self.user.set_password('password123')
+        db.session.add(self.user)
+        db.session.commit()
+        self.settings = update_settings(self.user.id, default_settings(self.user.email))
+
+    def tearDown(self):
+        db.session.remove()
+        db.drop_all()
+        self.app_context.pop()
+
+    def process_tasks(self, count):
+        tasks = [Task(name=f'Task {i}', task_type='general', user_id=self.user.id) for i in range(count)]
+        db.session.add_all(tasks)
+        db.session.commit()
+        for task in tasks:
+            process_automation_task(task.id)
+
+    def test_outbox_is_drained_in_batches(self):
+        self.process_tasks(3)
+        self.assertEqual(OutboxMessage.query.filter_by(status='pending', event_type='task_completed').count(), 3)
+
+        with SMTPSink() as sink:
+            self.app.config.update(MAIL_SERVER=sink.host, MAIL_PORT=sink.port)
+            drain_outbox.apply()
+        self.assertEqual(OutboxMessage.query.filter_by(status='sent').count(), 3)
+        self.assertEqual(len(sink.messages), 3)
+        # Two batches over the same pooled connection
+        self.assertEqual(sink.connections, 1)
+        self.assertEqual(sink.messages[0].recipients, ['<test@example.com>'])
+
+    def test_rejected_messages_are_retried_then_failed(self):
+        self.process_tasks(1)
+        with patch('app.tasks.notifications.get_mailer') as get_mailer:
+            get_mailer.return_value.send_batch.return_value = [False]
+            drain_outbox.apply()
+            message = OutboxMessage.query.one()
+            self.assertEqual((message.status, message.attempts), ('pending', 1))
+            self.assertGreater(message.available_at, datetime.utcnow())
+
+            # Due again: the second attempt is the last one
+            message.available_at = datetime.utcnow()
+            db.session.commit()
+            drain_outbox.apply()
+        self.assertEqual((message.status, message.attempts), ('failed', 2))
+
+    def test_abandoned_sends_count_towards_max_attempts(self):
+        self.process_tasks(1)
+        # Each send takes the worker down before the outcome is recorded
+        with patch('app.tasks.notifications.get_mailer') as get_mailer:
+            get_mailer.return_value.send_batch.side_effect = SystemExit
+            for attempt in range(2):
+                OutboxMessage.query.update({'available_at': datetime.utcnow()})
+                db.session.commit()
+                with self.assertRaises(SystemExit):
+                    drain_outbox.apply(throw=True)
+                db.session.rollback()
+
+            # The lease runs out after the last attempt: the message fails instead of being sent again
+            OutboxMessage.query.update({'available_at': datetime.utcnow()})
+            db.session.commit()
+            drain_outbox.apply()
+            self.assertEqual(get_mailer.return_value.send_batch.call_count, 2)
+        message = OutboxMessage.query.one()
+        self.assertEqual((message.status, message.attempts), ('failed', 2))
+
+    def test_settings_are_read_through_the_cache(self):
+        self.assertTrue(should_notify(self.user.id, 'task_completed'))
+        self.assertFalse(should_notify(self.user.id + 1, 'task_completed'))
+
+        # Known users and users without settings are both answered from the cache
+        statements = []
+        event.listen(db.engine, 'before_cursor_execute', lambda *args: statements.append(args[2]))
+        for _ in range(100):
+            self.assertTrue(should_notify(self.user.id, 'task_completed'))
+            self.assertFalse(should_notify(self.user.id + 1, 'task_completed'))
+        self.assertEqual(statements, [])
+
+        # Settings are stored in the database, so another process (or a
+        # worker) reads the same values once its cache entry expires
+        update_settings(self.user.id, dict(self.settings, task_completed=False))
+        self.app.extensions.pop(SETTINGS_NAMESPACE)
+        self.assertFalse(should_notify(self.user.id, 'task_completed'))
+        self.assertEqual(get_settings(self.user.id)['email'], 'test@example.com')
+
+    def test_daily_summary_folds_events_into_one_digest(self):
+        update_settings(self.user.id, dict(self.settings, daily_summary=True))
+        self.process_tasks(3)
+        failed = Task(name='Broken', task_type='general', user_id=self.user.id, status='failed')
+        db.session.add(failed)
+        db.session.commit()
+        db.session.add(TaskLog(task_id=failed.id, status='failed', message='Broken'))
+        db.session.commit()
+        self.assertEqual(OutboxMessage.query.count(), 0)
+
+        today = datetime.utcnow().date()
+        self.assertEqual(queue_daily_digests(today), 1)
+        self.assertEqual(queue_daily_digests(today), 0)
+        digest = OutboxMessage.query.one()
+        self.assertEqual((digest.event_type, digest.digest_date), ('daily_summary', today))
+        self.assertIn('3 tasks completed', digest.body)
+        self.assertIn('1 tasks failed', digest.body)
+
+        # No activity, no digest
+        self.assertEqual(queue_daily_digests(today - timedelta(days=1)), 0)
+
+if __name__ == '__main__':
+    unittest.main()
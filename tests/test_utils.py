@@ -1,7 +1,21 @@
 import unittest
 from app import create_app, db
 from app.models.user import User, Task, TaskLog
-from app.utils.task_logger import log_task_event
+from app.utils.task_logger import log_task_event, task_log_batch
+from app.utils.cache import LRUCache
+from app.utils import dialects, task_import
+from app.utils.task_import import iter_records, import_records, TaskImportError
+from app.utils.email_sender import get_mailer, send_email
+from app.utils.smtp_sink import SMTPSink
+from app.utils.api_client import APIClient
+from app.utils.http_stub import HTTPStub
+from app.utils.response_cache import MemoryResponseCache, DiskResponseCache
+from concurrent.futures import ThreadPoolExecutor
+from unittest.mock import patch
+import io
+import os
+import tempfile
+import time
 from config import Config
 
 class TestConfig(Config):
@@ -56,6 +70,250 @@ class UtilsTestCase(unittest.TestCase):
         self.assertEqual(log_from_db.status, 'test_status')
         self.assertEqual(log_from_db.message, 'Test message')
         
+    def test_task_logger_leaves_session_alone(self):
+        task_id, user_id = self.task.id, self.user.id
+        # Unrelated changes pending in the session are not committed by logging
+        self.task.name = 'Unsaved name'
+        db.session.add(Task(name='Unsaved task', status='pending', user_id=user_id))
+        log_task_event(task_id, 'info', 'Logged mid-transaction')
+        with task_log_batch():
+            log_task_event(task_id, 'info', 'Logged in a batch')
+        db.session.rollback()
+
+        self.assertEqual(db.session.get(Task, task_id).name, 'Test Task')
+        self.assertEqual(Task.query.filter_by(name='Unsaved task').count(), 0)
+        self.assertEqual(TaskLog.query.filter_by(task_id=task_id).count(), 2)
+
+    def test_task_log_batch(self):
+        # Events are buffered until the batch ends
+        with task_log_batch():
+            log_task_event(self.task.id, 'processing', 'Started')
+            log_task_event(self.task.id, 'info', 'Working')
+            self.assertEqual(TaskLog.query.filter_by(task_id=self.task.id).count(), 0)
+            
+            # Failures are written at once, after everything buffered before them
+            log_task_event(self.task.id, 'failed', 'Broken')
+            self.assertEqual(TaskLog.query.filter_by(task_id=self.task.id).count(), 3)
+            
+            log_task_event(self.task.id, 'retry', 'Retrying')
+            self.assertEqual(TaskLog.query.filter_by(task_id=self.task.id).count(), 3)
+        
+        logs = TaskLog.query.filter_by(task_id=self.task.id).order_by(TaskLog.id).all()
+        self.assertEqual([log.status for log in logs], ['processing', 'info', 'failed', 'retry'])
+        
+        # The buffer is flushed whenever it fills up
+        with task_log_batch(max_size=2):
+            for i in range(3):
+                log_task_event(self.task.id, 'info', f'Step {i}')
+            self.assertEqual(TaskLog.query.filter_by(task_id=self.task.id).count(), 6)
+        self.assertEqual(TaskLog.query.filter_by(task_id=self.task.id).count(), 7)
+        
+    def test_lru_cache(self):
+        cache = LRUCache(max_entries=2)
+        cache.set('a', 1)
+        cache.set('b', 2)
+        self.assertEqual(cache.get('a'), 1)
+        
+        # 'b' is the least recently used entry and is evicted first
+        cache.set('c', 3)
+        self.assertIsNone(cache.get('b'))
+        self.assertEqual(cache.get('a'), 1)
+        
+        # Expired entries are misses
+        cache.set('d', 4, ttl=-1)
+        self.assertIsNone(cache.get('d'))
+        
+        # Bumping a namespace changes its version
+        version = cache.get_version('user:1')
+        cache.bump_version('user:1')
+        self.assertNotEqual(cache.get_version('user:1'), version)
+        
+        # Versions are bounded like entries, and a dropped one never repeats
+        bumped = cache.get_version('user:1')
+        cache.get_version('user:2')
+        cache.get_version('user:3')
+        self.assertEqual(len(cache._versions), 2)
+        self.assertGreater(cache.get_version('user:1'), bumped)
+        
+    def test_json_import_is_parsed_incrementally(self):
+        document = b'{"exported_at": "2024-01-01", "meta": {"tasks": [1]}, "tasks": [{"name": "A", "priority": 12}, {"name": "B \\u00e9", "priority": 3}, {"description": "no name"}]}'
+        
+        # Tiny reads put chunk boundaries inside strings, escapes and numbers
+        with patch.object(task_import, 'READ_SIZE', 5):
+            records = list(iter_records(io.BytesIO(document), 'json'))
+        self.assertEqual([row for row, _ in records], [1, 2, 3])
+        self.assertEqual(records[0][1], {'name': 'A', 'priority': 12})
+        self.assertEqual(records[1][1]['name'], 'B \u00e9')
+        
+        # A bare array works too, and truncated files stop with an error
+        records = iter_records(io.BytesIO(b'[{"name": "A"}, {"name": '), 'json')
+        self.assertEqual(next(records), (1, {'name': 'A'}))
+        with self.assertRaises(TaskImportError):
+            next(records)
+        
+    def test_import_records_in_chunks(self):
+        lines = [b'{"name": "Task %d", "priority": 2}' % i for i in range(5)]
+        lines.insert(2, b'not json')
+        lines.insert(4, b'{"name": "Bad", "task_type": "unknown"}')
+        lines.append(b'{"description": "No name"}')
+        chunks = []
+        
+        report = import_records(
+            iter_records(io.BytesIO(b'\n'.join(lines)), 'ndjson'),
+            self.user.id, chunk_size=2, on_chunk=chunks.append
+        )
+        self.assertEqual(report['imported_count'], 6)
+        self.assertEqual(report['failed_count'], 2)
+        self.assertEqual([error['row'] for error in report['errors']], [3, 5])
+        self.assertIn('Task type', report['errors'][1]['error'])
+        self.assertEqual([len(chunk) for chunk in chunks], [2, 2, 2])
+        self.assertEqual(Task.query.filter(Task.name.like('Task %')).count(), 5)
+        
+        # Unnamed rows keep the importer's placeholder name
+        self.assertEqual(Task.query.filter_by(name='Imported Task').one().description, 'No name')
+
+    def test_import_records_skips_known_external_ids(self):
+        data = b'\n'.join(b'{"name": "Task %d", "external_id": "row-%d"}' % (i, i) for i in range(3))
+
+        first = import_records(iter_records(io.BytesIO(data), 'ndjson'), self.user.id)
+        replay = import_records(iter_records(io.BytesIO(data), 'ndjson'), self.user.id)
+        self.assertEqual((first['imported_count'], first['duplicate_count']), (3, 0))
+        self.assertEqual((replay['imported_count'], replay['duplicate_count']), (0, 3))
+        self.assertEqual(Task.query.filter(Task.external_id.isnot(None)).count(), 3)
+
+        # Databases without ON CONFLICT (e.g. MySQL) look up existing keys first
+        data += b'\n{"name": "Task 3", "external_id": "row-3"}\n{"name": "Again", "external_id": "row-3"}'
+        with patch.dict(dialects.CONFLICT_DIALECTS, clear=True):
+            fallback = import_records(iter_records(io.BytesIO(data), 'ndjson'), self.user.id)
+        self.assertEqual((fallback['imported_count'], fallback['duplicate_count']), (1, 4))
+        self.assertEqual(Task.query.filter_by(external_id='row-3').one().name, 'Task 3')
+
+    def test_mailer_reuses_connections(self):
+        self.app.config['MAIL_USE_TLS'] = False
+        with SMTPSink() as sink:
+            mailer = get_mailer(smtp_server=sink.host, smtp_port=sink.port, username='user', password='secret')
+            messages = [mailer.message(f'user{i}@example.com', f'Subject {i}', 'Body') for i in range(5)]
+            self.assertEqual(mailer.send_batch(messages), [True] * 5)
+            self.assertTrue(send_email('single@example.com', 'Single', 'Body', smtp_server=sink.host,
+                                       smtp_port=sink.port, username='user', password='secret'))
+            self.assertEqual(sink.connections, 1)
+
+            # A connection the server dropped is replaced transparently
+            for connection, _ in mailer.pool._idle:
+                connection.close()
+            self.assertEqual(mailer.send_batch(messages[:2]), [True, True])
+            self.assertEqual(sink.connections, 2)
+            self.assertEqual(len(sink.messages), 8)
+            self.assertEqual(sink.messages[0].recipients, ['<user0@example.com>'])
+
+            # A message the server cannot take fails alone, on the same connection
+            unsendable = mailer.message('us\u00e9r@example.com', 'Unicode', 'Body')
+            self.assertEqual(mailer.send_batch([messages[0], unsendable, messages[1]]), [True, False, True])
+            self.assertEqual(sink.connections, 2)
+            self.assertEqual(len(sink.messages), 10)
+            self.assertFalse(send_email('us\u00e9r@example.com', 'Unicode', 'Body', smtp_server=sink.host,
+                                        smtp_port=sink.port, username='user', password='secret'))
+            mailer.pool.close()
+
+        # Any other error is reported as a failed send, not raised
+        with patch('app.utils.email_sender.get_mailer', side_effect=RuntimeError('no mailer')):
+            self.assertFalse(send_email('single@example.com', 'Single', 'Body'))
+
+    def test_api_client_retries_idempotent_requests(self):
+        responses = {'GET': [503, 429, 200], 'POST': [503, 200]}
+        def responder(request):
+            status = responses[request.method].pop(0)
+            return status, {'Retry-After': '0'} if status != 200 else {}, {'status': status}
+
+        with HTTPStub(responder) as stub:
+            client = APIClient(stub.url, backoff_factor=0)
+            self.assertEqual(client.get('/items'), {'status': 200})
+            # POST is not idempotent and is never retried
+            self.assertEqual(client.post('/items', json={}), {'error': {'status': 503}, 'status_code': 503})
+        self.assertEqual([request.method for request in stub.requests], ['GET', 'GET', 'GET', 'POST'])
+        # Every attempt went over the same kept-alive connection
+        self.assertEqual(stub.connections, 1)
+
+    def test_api_client_rate_limit_is_shared(self):
+        with HTTPStub() as stub:
+            clients = [APIClient(stub.url, rate_limit=20, burst=1) for _ in range(2)]
+            started = time.monotonic()
+            with ThreadPoolExecutor(max_workers=4) as executor:
+                results = list(executor.map(lambda i: clients[i % 2].get(f'/items/{i}'), range(9)))
+            elapsed = time.monotonic() - started
+        self.assertEqual(results, [{'ok': True}] * 9)
+        # One burst token, then 8 more at 20 per second across both clients
+        self.assertGreaterEqual(elapsed, 0.38)
+
+    def test_api_client_map_runs_requests_concurrently(self):
+        def responder(request):
+            # Earlier items answer later
+            index = int(request.path.rsplit('/', 1)[1])
+            time.sleep(0.05 * (4 - index) if index < 5 else 0.5)
+            return 200, {}, {'index': index}
+
+        with HTTPStub(responder) as stub:
+            client = APIClient(stub.url, max_retries=0, pool_size=5)
+            calls = [f'/items/{i}' for i in range(5)]
+            completed = [index for index, _ in client.as_completed(calls)]
+            self.assertEqual(completed, [4, 3, 2, 1, 0])
+
+            started = time.monotonic()
+            results = client.map(calls + [{'endpoint': '/items/5', 'timeout': 0.1}])
+            self.assertLess(time.monotonic() - started, 0.45)
+        self.assertEqual(results[:5], [{'index': i} for i in range(5)])
+        # A request that exceeds its own timeout fails alone
+        self.assertIn('error', results[5])
+
+    def test_api_client_caches_and_revalidates_responses(self):
+        def responder(request):
+            if request.headers.get('If-None-Match') == '"v1"':
+                return 304, {'ETag': '"v1"'}, b''
+            return 200, {'ETag': '"v1"'}, {'path': request.path}
+
+        with HTTPStub(responder) as stub:
+            client = APIClient(stub.url, cache=MemoryResponseCache(), cache_ttl=60)
+            self.assertEqual(client.get('/reference', params={'page': 1}), {'path': '/reference?page=1'})
+            self.assertEqual(client.get('/reference', params={'page': 1}), {'path': '/reference?page=1'})
+            client.get('/reference', params={'page': 2})
+            self.assertEqual(len(stub.requests), 2)
+            self.assertEqual(client.cache_stats(), {'hits': 1, 'misses': 2, 'revalidations': 0})
+
+            # Stale entries are revalidated instead of downloaded again
+            client = APIClient(stub.url, cache=MemoryResponseCache(), cache_ttl=0)
+            client.get('/changing')
+            self.assertEqual(client.get('/changing'), {'path': '/changing'})
+            self.assertEqual(stub.requests[-1].headers['If-None-Match'], '"v1"')
+            self.assertEqual(client.cache_stats(), {'hits': 0, 'misses': 1, 'revalidations': 1})
+
+            with tempfile.TemporaryDirectory() as directory:
+                APIClient(stub.url, cache=DiskResponseCache(directory)).get('/reference')
+                # A new process finds the response on disk
+                client = APIClient(stub.url, cache=DiskResponseCache(directory, max_entries=2))
+                self.assertEqual(client.get('/reference'), {'path': '/reference'})
+                self.assertEqual(client.cache_stats(), {'hits': 1, 'misses': 0, 'revalidations': 0})
+
+                client.get('/other')
+                client.get('/another')
+                self.assertEqual(len([name for name in os.listdir(directory) if name.endswith('.json')]), 2)
+
+                # Writes below the limit do not scan the directory
+                cache = DiskResponseCache(directory, max_entries=20)
+                cache.clear()
+                with patch('app.utils.response_cache.os.scandir', wraps=os.scandir) as scandir:
+                    for i in range(20):
+                        cache.set(f'key-{i}', {'data': i})
+                    self.assertEqual(scandir.call_count, 0)
+                    # Passing the limit frees a tenth of it in one scan
+                    cache.set('key-20', {'data': 20})
+                    self.assertEqual(scandir.call_count, 1)
+                self.assertEqual(len(os.listdir(directory)), 18)
+
+                # Clearing also removes partial files of failed writes
+                open(os.path.join(directory, 'orphan.json.1.2.part'), 'w').close()
+                cache.clear()
+                self.assertEqual(os.listdir(directory), [])
+
     def test_task_relationship_with_logs(self):
         # Create multiple log entries
         log_task_event(self.task.id, 'status1', 'Message 1')